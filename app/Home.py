@@ -1,19 +1,20 @@
 
 
-from pathlib import Path
-
 import os
-import pandas as pd
 import streamlit as st
 
-from utils.data_loader import load_orders_csv
+from utils.data_loader import load_orders_csv, PartitionedOrders
+from utils.topk import HeavyHitters
+from utils.order_store import memory_report
+from utils.session import (
+    load_demo, set_orders_df, set_orders_dataset, has_orders, orders_df, orders_in_memory, orders_profile, orders_store,
+    render_memory_usage, warm_snapshots,
+)
 
 st.write("RUNNING FILE:", __file__)
 st.write("CWD:", os.getcwd())
 
 st.set_page_config(page_title="AI Ecom Analytics Copilot", layout="wide")
-ROOT_DIR = Path(__file__).resolve().parents[1]  # repo 根目录
-DEMO_CSV = ROOT_DIR / "data" / "synthetic_orders.csv"
 
 st.title("AI E-commerce Analytics Copilot")
 st.caption("Milestone 1: Upload + Data Profile (Synthetic data only)")
@@ -29,15 +30,13 @@ st.subheader("Quick start")
 colA, colB = st.columns([1, 2])
 with colA:
     if st.button("Load demo data (synthetic)", use_container_width=True):
-        df = pd.read_csv(DEMO_CSV)
-        df["order_date"] = pd.to_datetime(df["order_date"])
-        st.session_state["orders_df"] = df
+        load_demo()
         st.success("Loaded demo data.")
         st.rerun()
 
 with colB:
     st.info("No setup needed. Click the button to load synthetic data, or upload your own CSV (synthetic only).")
-if "orders_df" in st.session_state:
+if has_orders():
     st.success("Data is ready. You can now open Dashboard / Diagnostics / AI Insights.")
 else:
     st.warning("No data loaded yet.")
@@ -62,9 +61,7 @@ Ops Analytics / E-commerce Analytics (LLM + BI)
 demo_clicked = st.button("Load demo data (synthetic)")
 
 if demo_clicked:
-    df = pd.read_csv(DEMO_CSV)
-    df["order_date"] = pd.to_datetime(df["order_date"])
-    st.session_state["orders_df"] = df
+    load_demo()
     st.success("Loaded demo data.")
 
 # =========================
@@ -74,33 +71,76 @@ uploaded = st.file_uploader("Upload orders CSV", type=["csv"])
 
 if uploaded:
     try:
-        df = load_orders_csv(uploaded)
-        st.session_state["orders_df"] = df
+        hh = HeavyHitters(capacity=1000)
+        df = load_orders_csv(uploaded, heavy_hitters=hh)
+        set_orders_df(df, heavy_hitters=hh)
         st.success(f"Loaded: {df.shape[0]:,} rows × {df.shape[1]} columns")
     except Exception as e:
         st.error(str(e))
 
+# =========================
+# Partitioned dataset directory (one CSV/Parquet file per day)
+# =========================
+part_dir = st.text_input("Or open a date-partitioned dataset directory (one file per day)", "")
+if part_dir and st.button("Open dataset directory"):
+    try:
+        ds = PartitionedOrders(part_dir)
+        set_orders_dataset(ds)
+        lo, hi = ds.date_bounds
+        st.success(f"Opened {len(ds.partitions):,} partitions covering {lo} → {hi}. Pages read only the dates they filter on.")
+    except Exception as e:
+        st.error(str(e))
+
+render_memory_usage()
+
 # =========================
 # Render if df exists
 # =========================
-if "orders_df" in st.session_state:
-    df = st.session_state["orders_df"]
+if "orders_dataset" in st.session_state and not orders_in_memory():
+    ds = st.session_state["orders_dataset"]
+    lo, hi = ds.date_bounds
+    c1, c2 = st.columns(2)
+    c1.metric("Date Range", f"{lo} → {hi}")
+    c2.metric("Partitions", f"{len(ds.partitions):,}")
+    st.info("Partitioned dataset: profiling is skipped here so Dashboard/Diagnostics can read only the days they need.")
+
+elif orders_in_memory():
+    df = orders_df()
+    profile = orders_profile()
 
     c1, c2, c3, c4 = st.columns(4)
     c1.metric(
         "Date Range",
-        f"{df['order_date'].min().date()} → {df['order_date'].max().date()}"
+        f"{profile.date_min.date()} → {profile.date_max.date()}" if profile.date_min is not None else "N/A"
     )
-    c2.metric("Unique Orders", f"{df['order_id'].nunique():,}")
-    c3.metric("Unique SKUs", f"{df['sku'].nunique():,}")
-    c4.metric("Channels", f"{df['channel'].nunique():,}")
+    c2.metric("Unique Orders", f"{profile.n_orders:,}")
+    c3.metric("Unique SKUs", f"{profile.n_skus:,}")
+    c4.metric("Channels", f"{profile.n_channels:,}")
 
     st.subheader("Missing Values (Top 15)")
     st.dataframe(
-        df.isna().sum().sort_values(ascending=False).head(15),
+        profile.missing.head(15),
         width="stretch"
     )
 
+    st.subheader("Data Checks")
+    st.dataframe(profile.checks_table(), width="stretch", hide_index=True)
+    findings = profile.findings()
+    if findings:
+        for f in findings:
+            st.warning(f)
+    else:
+        st.success("No data quality issues found.")
+
+    if "orders_heavy_hitters" in st.session_state:
+        st.subheader("Top SKUs by GMV (streaming heavy-hitter summary)")
+        st.dataframe(st.session_state["orders_heavy_hitters"].top("sales", 10), width="stretch", hide_index=True)
+
+    with st.expander("Memory footprint (DataFrame vs compact OrderStore)"):
+        mem = memory_report(df, orders_store())
+        mem["MB"] = mem["bytes"] / 1e6
+        st.dataframe(mem[["representation", "MB", "bytes_per_row"]], width="stretch", hide_index=True)
+
     st.subheader("Preview")
     st.dataframe(df.head(50), width="stretch")
 
@@ -108,3 +148,11 @@ else:
     st.info("Upload a CSV or click 'Load demo data' to begin.")
 st.markdown("> This demo uses synthetic data only. No real customer data is processed.")
 
+
+# Precompute the Diagnostics default windows (stored as snapshots) while the user is here.
+if has_orders():
+    snap_job = warm_snapshots()
+    if snap_job.status == "failed":
+        st.caption("Diagnostics snapshots could not be precomputed; the page computes them on open.")
+    else:
+        st.caption(f"Diagnostics snapshots: {'ready' if snap_job.done() else 'precomputing in the background…'}")
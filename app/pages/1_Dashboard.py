@@ -1,16 +1,23 @@
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 
 from utils.data_loader import load_orders_csv
 from utils.metrics import kpi_summary, time_series, top_breakdown
+from utils.ops_metrics import PickTimeSketches
+from utils.rollups import TimeRollups, FREQ_LABELS
+from utils.session import (
+    set_orders_df, orders_df, orders_fingerprint, has_orders, orders_date_bounds, orders_in_memory, orders_index,
+    orders_sample, orders_sharded, orders_store, orders_window, render_memory_usage, scan_caption, submit_job,
+)
 
 st.set_page_config(page_title="Dashboard", layout="wide")
 st.title("KPI Dashboard")
 st.caption("Uses session data loaded from Home. Optional upload can override current data.")
 
+# Options shown by the SKU filter (most frequent SKUs, narrowed by the search text).
+SKU_OPTIONS = 200
+
 # -------------------------
 # Optional uploader (override current df)
 # -------------------------
@@ -22,7 +29,7 @@ uploaded = st.file_uploader(
 if uploaded:
     try:
         df_new = load_orders_csv(uploaded)
-        st.session_state["orders_df"] = df_new
+        set_orders_df(df_new)
         st.success(f"Dashboard now using uploaded data: {df_new.shape[0]:,} rows × {df_new.shape[1]} cols")
         st.rerun()
     except Exception as e:
@@ -32,18 +39,16 @@ if uploaded:
 # -------------------------
 # Require data in session_state
 # -------------------------
-if "orders_df" not in st.session_state:
+if not has_orders():
     st.warning("No data found. Go to Home and click 'Load demo data' or upload a CSV first.")
     st.stop()
 
-df = st.session_state["orders_df"].copy()
-df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce")
+render_memory_usage()
 
 # -------------------------
 # Filters
 # -------------------------
-min_d = df["order_date"].min().date()
-max_d = df["order_date"].max().date()
+min_d, max_d = orders_date_bounds()
 
 c1, c2, c3 = st.columns([2, 2, 3])
 with c1:
@@ -54,73 +59,226 @@ with c1:
         max_value=max_d
     )
 with c2:
-    freq = st.selectbox("Time bucket", ["Daily", "Weekly"])
+    freq = st.selectbox("Time bucket", list(FREQ_LABELS), index=1)
+
+start_d, end_d = date_range
+in_memory = orders_in_memory()
+# In-memory data: the date range and every filter resolve through the bitmap index over the
+# whole dataset (no window copy). Partitioned data: the date range is pushed down to the loader
+# (only overlapping partitions are read) and the index covers that window.
+base = orders_df() if in_memory else orders_window(start_d, end_d)
+index = orders_index(start_d, end_d)
+
 with c3:
-    channels = sorted(df["channel"].dropna().unique())
+    channels = index.values("channel")
     channel_filter = st.multiselect("Channel filter", channels, default=channels)
 
-start_d, end_d = date_range
-df_f = df[(df["order_date"].dt.date >= start_d) & (df["order_date"].dt.date <= end_d)].copy()
-df_f = df_f[df_f["channel"].isin(channel_filter)].copy()
+filters = {"channel": channel_filter}
+f1, f2, f3 = st.columns([2, 2, 3])
+if "fulfillment_type" in index.labels:
+    with f1:
+        types = index.values("fulfillment_type")
+        filters["fulfillment_type"] = st.multiselect("Fulfillment filter", types, default=types)
+if "warehouse_zone" in index.labels:
+    with f2:
+        zones_all = index.values("warehouse_zone")
+        filters["warehouse_zone"] = st.multiselect("Warehouse zone filter", zones_all, default=zones_all)
+with f3:
+    # Catalogues can have millions of SKUs: the options are the most frequent ones (matching the
+    # search text, if any) plus the current selection, never the whole catalogue.
+    sku_text = st.text_input("Find SKUs", placeholder=f"{len(index.labels['sku']):,} SKUs · type part of a code")
+    picked = st.session_state.get("sku_filter", [])
+    if picked:
+        known = set(index.labels["sku"])  # drops SKUs the current data (e.g. a new upload) lacks
+        picked = [v for v in picked if v in known]
+    # Writing the key back carries the selection over when a new search rebuilds the widget.
+    st.session_state["sku_filter"] = picked
+    sku_options = list(dict.fromkeys([*picked, *index.top_values("sku", SKU_OPTIONS, sku_text)]))
+    filters["sku"] = st.multiselect("SKU filter (empty = all SKUs)", sku_options, key="sku_filter") or None
+
+sel = index.select(start_d, end_d, filters) if in_memory else index.select(filters=filters)
+filter_key = tuple((k, tuple(v)) for k, v in filters.items() if v is not None)
+# KPI and top-N aggregations use the compact store for in-memory data.
+store = orders_store()
+agg_f = sel.apply(store if store is not None else base)
+# Large datasets on multi-core hosts: with only the date range filtered, the top-N group-bys
+# are sharded across worker processes.
+sharded = orders_sharded() if in_memory else None
+dims_filtered = any(v is not None and len(set(v)) < len(index.labels[k]) for k, v in filters.items())
+top_f = sharded.slice_days(start_d, end_d) if sharded is not None and not dims_filtered else agg_f
+
+if scan_caption():
+    st.caption(scan_caption())
+
+# -------------------------
+# Approximate mode
+# -------------------------
+# (by, metric, with_other) of the Top Contributors tables.
+TOP_TABLES = [("sku", "sales", True), ("sku", "gross_profit", False), ("channel", "sales", False), ("channel", "orders", False)]
+
+
+def _exact_job(ctx, store, df, sel, freq):
+    # Everything the page shows in approximate mode, computed exactly from the full data.
+    agg = sel.apply(store)
+    ctx.report(0.1, "KPIs")
+    kpi = kpi_summary(agg)
+    ctx.report(0.3, "trends")
+    ts = TimeRollups(sel.apply(df)).series(freq)
+    tops = {}
+    for i, (by, metric, with_other) in enumerate(TOP_TABLES):
+        ctx.report(0.6 + 0.1 * i, "top contributors")
+        tops[(by, metric)] = top_breakdown(agg, by=by, metric=metric, n=10, with_other=with_other)
+    return {"kpi": kpi, "ts": ts, "tops": tops}
+
+
+@st.fragment(run_every=1.0)
+def _exact_progress(job):
+    # Polls the background job; the full page reruns with the exact values once it is done.
+    if job.done():
+        st.rerun()
+    st.progress(job.progress, text=f"Computing exact values… {job.message}")
+
+
+approximate = st.toggle(
+    "Approximate mode (stratified sample)",
+    value=False,
+    disabled=store is None,
+    help="Estimates from a sample stratified by channel and SKU tier, with 95% confidence intervals. "
+    "Not available for partitioned datasets.",
+)
+exact = None
+view = None
+if approximate:
+    sample = orders_sample()
+    view = sample.select(start_d, end_d, filters)
+    exact_key = (orders_fingerprint(), start_d, end_d, filter_key, freq)
+    job = None
+    if st.session_state.get("dashboard_exact_key") == exact_key:
+        job = submit_job("dashboard_exact", exact_key, _exact_job, store, base, sel, FREQ_LABELS[freq])
+        if job.done():
+            exact = job.result()
+    if exact is not None:
+        st.success("Exact values, recomputed in the background.")
+    else:
+        st.info(
+            f"Approximate values: estimated from {view.n_rows:,} sampled lines in this selection "
+            f"({sample.fraction:.1%} of the dataset, stratified by channel and SKU tier), with 95% confidence intervals."
+        )
+        if job is not None:
+            _exact_progress(job)
+        elif st.button("Compute exact values in the background"):
+            st.session_state["dashboard_exact_key"] = exact_key
+            st.rerun()
+        with st.expander("Sample strata"):
+            st.dataframe(sample.strata(), width="stretch", hide_index=True)
+# Estimates (with intervals) are shown until exact values are available.
+approx = approximate and exact is None
 
 st.divider()
 
 # -------------------------
 # KPI summary
 # -------------------------
-kpi = kpi_summary(df_f)
+kpi = exact["kpi"] if exact is not None else kpi_summary(view if approx else agg_f)
+
+
+def _money(v):
+    return f"${v:,.2f}"
+
+
+def _count(v):
+    return f"{v:,.0f}"
+
+
+def _pct(v):
+    return f"{v*100:.1f}%"
+
+
+def _kpi_metric(col, label, key, fmt):
+    if not approx:
+        col.metric(label, fmt(kpi[key]))
+        return
+    lo, hi = kpi["ci"][key]
+    col.metric(label, f"≈ {fmt(kpi[key])}", help=f"95% confidence interval: {fmt(lo)} – {fmt(hi)}")
+
+
+def _kpi_text(key, fmt):
+    if not approx:
+        return fmt(kpi[key])
+    lo, hi = kpi["ci"][key]
+    return f"≈ {fmt(kpi[key])} (95% CI {fmt(lo)} – {fmt(hi)})"
+
 
 k1, k2, k3, k4, k5 = st.columns(5)
-k1.metric("GMV", f"${kpi['gmv']:,.2f}")
-k2.metric("Orders", f"{kpi['orders']:,}")
-k3.metric("Units", f"{kpi['units']:,}")
+_kpi_metric(k1, "GMV", "gmv", _money)
+_kpi_metric(k2, "Orders", "orders", _count)
+_kpi_metric(k3, "Units", "units", _count)
 
 if kpi["gross_profit"] is None:
     k4.metric("Gross Profit", "N/A")
     k5.metric("Gross Margin", "N/A")
 else:
-    k4.metric("Gross Profit", f"${kpi['gross_profit']:,.2f}")
-    k5.metric("Gross Margin", f"{kpi['gross_margin']*100:.1f}%")
+    _kpi_metric(k4, "Gross Profit", "gross_profit", _money)
+    if kpi["gross_margin"] is None:
+        k5.metric("Gross Margin", "N/A")
+    else:
+        _kpi_metric(k5, "Gross Margin", "gross_margin", _pct)
 
 if kpi.get("return_rate") is not None:
-    st.caption(f"Return rate: {kpi['return_rate']*100:.1f}%")
+    st.caption(
+        f"Return rate: {_kpi_text('return_rate', _pct)} · Returned GMV: {_kpi_text('returned_gmv', _money)} · "
+        f"Net of returns: {_kpi_text('net_gmv', _money)}"
+    )
 
 st.divider()
 
 # -------------------------
 # Time series
 # -------------------------
-freq_code = "D" if freq == "Daily" else "W"
-ts = time_series(df_f, freq=freq_code)
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _rollups(fp, start, end, filter_key, _df, _sel):
+    # One rollup set per dataset + filter; bucket switches reuse its cached levels.
+    return TimeRollups(_sel.apply(_df))
+
 
 st.subheader("Trends")
 
+bucket = FREQ_LABELS[freq]
+if exact is not None:
+    ts = exact["ts"]
+elif approx and bucket != "H":
+    ts = time_series(view, bucket)
+    st.caption("Estimates are charted with their 95% interval bounds (`_low` / `_high`).")
+else:
+    if approx:
+        st.caption("Hourly trends are exact: the sample keeps order days, not hours.")
+    rollups = _rollups(orders_fingerprint(), start_d, end_d, filter_key, base, sel)
+    ts = rollups.series(bucket)
+
+# Client-side charts: rendering these as matplotlib PNGs on the server dominated the
+# page's first render (~0.3s per figure) and pulled matplotlib into the cold start.
+trend = ts.set_index("order_date")
+
+
+def _trend(col):
+    # Approximate series carry <col>_low / <col>_high interval columns.
+    bounds = [f"{col}_low", f"{col}_high"]
+    return trend[[col, *bounds]] if all(b in trend.columns for b in bounds) else trend[col]
+
+
 colA, colB = st.columns(2)
 
 with colA:
-    fig = plt.figure()
-    plt.plot(ts["order_date"], ts["sales"])
-    plt.xticks(rotation=30)
-    plt.xlabel("Date")
-    plt.ylabel("GMV (Sales)")
-    st.pyplot(fig, clear_figure=True)
+    st.markdown("**GMV (Sales)**")
+    st.line_chart(_trend("sales"))
 
 with colB:
-    fig = plt.figure()
-    plt.plot(ts["order_date"], ts["orders"])
-    plt.xticks(rotation=30)
-    plt.xlabel("Date")
-    plt.ylabel("Orders")
-    st.pyplot(fig, clear_figure=True)
+    st.markdown("**Orders**")
+    st.line_chart(_trend("orders"))
 
 if "gross_profit" in ts.columns:
     st.subheader("Profit Trend")
-    fig = plt.figure()
-    plt.plot(ts["order_date"], ts["gross_profit"])
-    plt.xticks(rotation=30)
-    plt.xlabel("Date")
-    plt.ylabel("Gross Profit")
-    st.pyplot(fig, clear_figure=True)
+    st.line_chart(_trend("gross_profit"))
 
 st.divider()
 
@@ -128,24 +286,74 @@ st.divider()
 # Top breakdowns
 # -------------------------
 st.subheader("Top Contributors")
+if approx:
+    st.caption("Estimated totals; `ci_low` / `ci_high` bound the 95% confidence interval.")
+
+
+def _top(by, metric, with_other=False):
+    if exact is not None:
+        return exact["tops"][(by, metric)]
+    return top_breakdown(view if approx else top_f, by=by, metric=metric, n=10, with_other=with_other)
+
 
 c1, c2 = st.columns(2)
 
 with c1:
     st.markdown("**Top SKUs by GMV**")
-    top_sku_sales = top_breakdown(df_f, by="sku", metric="sales", n=10)
+    top_sku_sales = _top("sku", "sales", with_other=True)
     st.dataframe(top_sku_sales, use_container_width=True)
 
     st.markdown("**Top SKUs by Gross Profit**")
-    top_sku_profit = top_breakdown(df_f, by="sku", metric="gross_profit", n=10)
+    top_sku_profit = _top("sku", "gross_profit")
     st.dataframe(top_sku_profit, use_container_width=True)
 
 with c2:
     st.markdown("**Top Channels by GMV**")
-    top_ch_sales = top_breakdown(df_f, by="channel", metric="sales", n=10)
+    top_ch_sales = _top("channel", "sales")
     st.dataframe(top_ch_sales, use_container_width=True)
 
     st.markdown("**Top Channels by Orders**")
-    top_ch_orders = top_breakdown(df_f, by="channel", metric="orders", n=10)
+    top_ch_orders = _top("channel", "orders")
     st.dataframe(top_ch_orders, use_container_width=True)
 
+
+st.divider()
+
+# -------------------------
+# Warehouse operations (pick time percentiles)
+# -------------------------
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _pick_sketches(fp, start, end, _df):
+    # Built once per dataset (per loaded window for partitioned data); every
+    # date/channel/zone query below merges stored sketch cells instead of rescanning rows.
+    return PickTimeSketches(_df)
+
+
+if "pick_time_sec" in base.columns:
+    st.subheader("Warehouse Operations: Pick Time")
+
+    if in_memory:
+        sketches = _pick_sketches(orders_fingerprint(), None, None, base)
+    else:
+        sketches = _pick_sketches(orders_fingerprint(), start_d, end_d, base)
+
+    o1, o2 = st.columns([1, 3])
+    with o1:
+        ops_by = st.selectbox("Group pick time by", ["warehouse_zone", "fulfillment_type", "channel"])
+    if filters["sku"] is not None:
+        with o2:
+            st.caption("Pick-time sketches are kept per zone/fulfillment/channel; the SKU filter does not apply here.")
+
+    ops_filters = {k: v for k, v in filters.items() if k in sketches.dims}
+
+    st.markdown("**Pick time (sec) p50 / p95 / p99**")
+    st.dataframe(
+        sketches.quantiles(ops_by, start=start_d, end=end_d, filters=ops_filters),
+        width="stretch",
+        hide_index=True,
+    )
+
+    daily = sketches.quantiles("order_date", start=start_d, end=end_d, filters=ops_filters)
+    if len(daily) > 0:
+        st.markdown("**Daily pick time percentiles (sec)**")
+        st.line_chart(daily.set_index("order_date")[["p50", "p95", "p99"]])
@@ -1,39 +1,54 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 
 from datetime import timedelta
-from utils.diagnostics import slice_by_date, compute_kpis, kpi_delta, drivers, price_volume_mix
+from utils.diagnostics import decomp_table, kpi_delta
+from utils.forecasting import DEFAULT_HISTORY_DAYS, residual_by
+from utils.reports import (
+    DEFAULT_METHOD, baseline_job, default_windows, drivers_job, narrative_inputs, narrative_job, returns_job, snapshot_keys,
+    window_job,
+)
+from utils.returns import RETURN_DIMENSIONS
+from utils.root_cause import root_cause_search
+from utils.scenarios import rollback_price_change, simulate_price_change
+from utils.session import (
+    orders_profile, has_orders, orders_date_bounds, orders_fingerprint, orders_in_memory, orders_sharded, orders_store,
+    orders_window, render_memory_usage, run_job, run_snapshot_job, scan_caption,
+)
+
+# -------------------------
+# Background jobs (run off the script thread; superseded when the windows/controls change).
+# The window / baseline / driver / narrative jobs live in utils.reports and are persisted as
+# snapshots per dataset, so a fresh session on unchanged data reads them instead of computing.
+# -------------------------
+def _scenario_job(ctx, pvm_agg, price_change, **params):
+    ctx.report(0.0, "simulating")
+    return simulate_price_change(pvm_agg, price_change, **params)
+
+
+def _root_cause_job(ctx, agg_curr, agg_prev, **params):
+    return root_cause_search(agg_curr, agg_prev, progress=ctx.report, **params)
+
 
 st.set_page_config(page_title="Diagnostics", layout="wide")
 st.title("Diagnostics: What changed and why?")
 
-if "orders_df" not in st.session_state:
+if not has_orders():
     st.warning("No dataset found. Please go to Home page and upload a CSV first.")
     st.stop()
 
-df = st.session_state["orders_df"]
+render_memory_usage()
 
-min_d = df["order_date"].min().date()
-max_d = df["order_date"].max().date()
+min_d, max_d = orders_date_bounds()
 
 st.subheader("Compare two time windows")
 
 
 
 
-# choose a default window length (up to 7 days)
-total_days = (max_d - min_d).days + 1
-win = min(7, max(1, total_days // 2))
-
-curr_end_default = max_d
-curr_start_default = max_d - timedelta(days=win - 1)
-
-prev_end_default = curr_start_default - timedelta(days=1)
-prev_start_default = prev_end_default - timedelta(days=win - 1)
-
-# clamp to min_d
-if prev_start_default < min_d:
-    prev_start_default = min_d
+# default: last (up to) 7 days vs the days before them
+curr_start_default, curr_end_default, prev_start_default, prev_end_default = default_windows(min_d, max_d)
 
 curr_range = st.date_input(
     "Current window",
@@ -54,74 +69,218 @@ curr_start, curr_end = curr_range
 prev_start, prev_end = prev_range
 
 
-df_curr = slice_by_date(df, curr_start, curr_end)
-df_prev = slice_by_date(df, prev_start, prev_end)
-
-curr = compute_kpis(df_curr)
-prev = compute_kpis(df_prev)
+# Only the two windows are loaded (partitioned datasets skip every other file).
+df_curr = orders_window(curr_start, curr_end)
+curr_scan = scan_caption("Current window")
+df_prev = orders_window(prev_start, prev_end)
+prev_scan = scan_caption("Previous window")
+for cap in (curr_scan, prev_scan):
+    if cap:
+        st.caption(cap)
+
+# KPI / driver / PVM aggregations run on the compact store when the data is in memory.
+store = orders_store()
+agg_curr = store.slice_days(curr_start, curr_end) if store is not None else df_curr
+agg_prev = store.slice_days(prev_start, prev_end) if store is not None else df_prev
+
+fp = orders_fingerprint()
+method = st.session_state.get("baseline_method", DEFAULT_METHOD)
+keys = snapshot_keys(fp, (curr_start, curr_end, prev_start, prev_end), method)
+windows = keys["window"]
+window_report = run_snapshot_job("window", windows, window_job, agg_curr, agg_prev, label="Comparing windows…")
+curr, prev, pvm_agg, decomposition = window_report
+decomp = decomp_table(decomposition, "GMV")
+profit_decomp = decomp_table(decomposition, "GROSS_PROFIT")
 
 st.subheader("KPI change summary")
 st.dataframe(kpi_delta(curr, prev), width="stretch")
 
 st.divider()
 
-st.subheader("GMV decomposition (Price / Volume / Mix)")
-decomp = price_volume_mix(df_curr, df_prev, by="sku")
-st.dataframe(decomp, width="stretch")
-
-fig = plt.figure()
-plt.bar(decomp["component"], decomp["value"])
-plt.xticks(rotation=30, ha="right")
-plt.ylabel("Value")
+st.subheader("GMV and gross profit decomposition (Volume / Price / Unit cost / Mix)")
+d1, d2 = st.columns(2)
+with d1:
+    st.markdown("**GMV**")
+    st.dataframe(decomp, width="stretch")
+with d2:
+    st.markdown("**Gross profit**")
+    if profit_decomp is None:
+        st.info("No unit_cost data: gross profit cannot be decomposed.")
+    else:
+        st.dataframe(profit_decomp, width="stretch")
+
+import matplotlib.pyplot as plt  # noqa: E402  (deferred until there is a chart to draw)
+
+effects = ["Volume_effect", "Price_effect", "Cost_effect", "Mix_effect"]
+chart = decomposition[decomposition["component"].isin(effects)].pivot(index="component", columns="measure", values="value")
+chart = chart.reindex([e for e in effects if e in chart.index])
+fig, ax = plt.subplots()
+chart.plot.bar(ax=ax, rot=30)
+ax.set_xlabel("")
+ax.set_ylabel("Value")
 st.pyplot(fig, clear_figure=True)
 
 st.divider()
 
+st.subheader("What-if pricing (Monte Carlo)")
+st.caption("Reuses the per-SKU units/price aggregates above; thousands of elasticity draws run as one batched array computation.")
+
+w1, w2, w3 = st.columns(3)
+with w1:
+    target = st.radio("Apply to", ["SKUs whose price fell", "All SKUs", "Selected SKUs"])
+    change_mode = st.radio("Price change", ["Roll back to previous-window price", "Fixed % change"])
+    pct = st.slider("Fixed price change (%)", -50, 50, 5, disabled=change_mode != "Fixed % change")
+with w2:
+    elasticity = st.number_input("Price elasticity (mean)", value=-1.5, step=0.1)
+    elasticity_sd = st.number_input("Elasticity uncertainty (sd, market-wide)", value=0.3, min_value=0.0, step=0.1)
+    sku_sd = st.number_input("Per-SKU elasticity noise (sd)", value=0.0, min_value=0.0, step=0.1)
+with w3:
+    n_draws = st.select_slider("Monte Carlo draws", [500, 1000, 2000, 5000, 10000], value=2000)
+    picked = []
+    if target == "Selected SKUs":
+        picked = st.multiselect("SKUs", pvm_agg["sku"].tolist())
+
+if target == "SKUs whose price fell":
+    apply_mask = ((pvm_agg["price_p"] > pvm_agg["price_c"]) & (pvm_agg["price_c"] > 0)).to_numpy()
+elif target == "All SKUs":
+    apply_mask = np.ones(len(pvm_agg), dtype=bool)
+else:
+    apply_mask = pvm_agg["sku"].isin(picked).to_numpy()
+
+base_change = rollback_price_change(pvm_agg) if change_mode.startswith("Roll back") else np.full(len(pvm_agg), pct / 100.0)
+scenario_params = dict(elasticity=elasticity, elasticity_sd=elasticity_sd, sku_elasticity_sd=sku_sd, n_draws=n_draws)
+scenario = run_job(
+    "scenario",
+    (windows, target, change_mode, pct, tuple(picked), tuple(sorted(scenario_params.items()))),
+    _scenario_job,
+    pvm_agg,
+    np.where(apply_mask, base_change, 0.0),
+    label="Simulating…",
+    **scenario_params,
+)
+st.write(f"{int(apply_mask.sum()):,} SKU(s) repriced.")
+st.dataframe(scenario.summary(), width="stretch", hide_index=True)
+
+counts, edges = np.histogram(scenario.gmv, bins=40)
+st.bar_chart(pd.DataFrame({"draws": counts}, index=np.round((edges[:-1] + edges[1:]) / 2, 0)))
+
+st.divider()
+
+st.subheader("Expected vs actual (trend + weekly seasonality)")
+
+# Its value is read near the top of the page (`method`), so the snapshot keys are known up front.
+st.selectbox(
+    "Baseline", ["holt_seasonal", "seasonal_naive"], key="baseline_method",
+    help="Fitted per (sku, channel) series on the weeks before the current window.",
+)
+# History before the current window feeds the baseline; partitioned datasets read only these days.
+df_hist = orders_window(curr_start - timedelta(days=DEFAULT_HISTORY_DAYS), curr_end)
+baseline = run_snapshot_job(
+    "baseline", keys["baseline"], baseline_job, df_hist, curr_start, curr_end, method, label="Fitting baselines…",
+)
+
+e1, e2 = st.columns(2)
+with e1:
+    st.markdown("**By channel (GMV)**")
+    st.dataframe(residual_by(baseline, "channel"), width="stretch", hide_index=True)
+with e2:
+    st.markdown("**Largest shortfalls vs expected (sku × channel)**")
+    st.dataframe(baseline.nsmallest(10, "residual"), width="stretch", hide_index=True)
+
+st.divider()
+
 st.subheader("Top drivers (who moved the metric)")
+# Large datasets on multi-core hosts: the driver group-bys are sharded across worker processes.
+sharded = orders_sharded()
+drv_curr = sharded.slice_days(curr_start, curr_end) if sharded is not None else agg_curr
+drv_prev = sharded.slice_days(prev_start, prev_end) if sharded is not None else agg_prev
+driver_tables = run_snapshot_job("drivers", keys["drivers"], drivers_job, drv_curr, drv_prev, baseline, label="Ranking drivers…")
 
 a, b = st.columns(2)
 with a:
     st.markdown("**Top SKU drivers (GMV delta)**")
-    st.dataframe(drivers(df_curr, df_prev, by="sku", metric="sales", top_n=10), width="stretch")
+    st.dataframe(driver_tables[("sku", "sales")], width="stretch")
 
     st.markdown("**Top SKU drivers (Units delta)**")
-    st.dataframe(drivers(df_curr, df_prev, by="sku", metric="units", top_n=10), width="stretch")
+    st.dataframe(driver_tables[("sku", "units")], width="stretch")
 
 with b:
     st.markdown("**Top Channel drivers (GMV delta)**")
-    st.dataframe(drivers(df_curr, df_prev, by="channel", metric="sales", top_n=10), width="stretch")
+    st.dataframe(driver_tables[("channel", "sales")], width="stretch")
 
     st.markdown("**Top Channel drivers (Orders delta)**")
-    st.dataframe(drivers(df_curr, df_prev, by="channel", metric="orders", top_n=10), width="stretch")
+    st.dataframe(driver_tables[("channel", "orders")], width="stretch")
+st.divider()
+
+st.subheader("Returns (rate and returned GMV by segment)")
+returns = run_snapshot_job("returns", keys["returns"], returns_job, agg_curr, agg_prev, label="Attributing returns…")
+if not returns:
+    st.info("No is_returned data: returns cannot be attributed.")
+else:
+    st.dataframe(returns["total"], width="stretch", hide_index=True)
+    ret_by = st.selectbox("Segment by", [d for d in RETURN_DIMENSIONS if d in returns], key="returns_by")
+    st.caption(
+        "contribution: the segment's share of the overall return-rate change (sums to it) = rate_effect "
+        "(its own return rate moved) + mix_effect (lines shifted toward / away from it). Largest rise first."
+    )
+    st.dataframe(returns[ret_by].head(10), width="stretch", hide_index=True)
+st.divider()
+
+st.subheader("Root-cause explorer (dimension combinations)")
+st.caption(
+    "Searches channel × sku × fulfillment_type × warehouse_zone combinations level by level, "
+    "pruning segments below the support / explanatory-power bounds instead of grouping every combination."
+)
+
+r1, r2, r3 = st.columns(3)
+with r1:
+    rc_metric = st.selectbox("Metric", ["sales", "units", "gross_profit"], format_func={"sales": "GMV", "units": "Units", "gross_profit": "Gross profit"}.get)
+with r2:
+    rc_direction = st.radio("Explain", ["auto", "down", "up"], horizontal=True, format_func={"auto": "Total move", "down": "Drops", "up": "Gains"}.get)
+with r3:
+    rc_support = st.slider("Min segment support (% of volume)", 0.1, 5.0, 0.5, 0.1)
+
+rc_params = dict(metric=rc_metric, direction=rc_direction, min_support=rc_support / 100.0)
+rc = run_job(
+    "root_cause", (windows, tuple(sorted(rc_params.items()))), _root_cause_job, agg_curr, agg_prev,
+    label="Searching segments…", **rc_params,
+)
+st.caption(
+    f"Total {rc_metric} delta: {rc.delta:,.2f} · {rc.cells_evaluated:,} segments aggregated "
+    f"(brute force: {rc.cells_possible:,}) · {len(rc.candidates):,} passed pruning"
+)
+if rc.segments.empty:
+    st.info("No segment passes the support / explanatory-power thresholds.")
+else:
+    st.dataframe(
+        rc.segments[["segment", "prev", "curr", "delta", "ep", "support", "surprise"]],
+        width="stretch",
+        hide_index=True,
+    )
+
 # =========================
 # AI Copilot: Narrative Summary
 # =========================
 from utils.ai_narrative import (
-    NarrativeInputs,
-    generate_rule_based_summary,
     generate_ai_summary_with_openai,
+    llm_request_stats,
 )
 
 st.divider()
 st.subheader("AI Copilot: Narrative Summary")
 
-# Prepare driver tables for narrative (recompute here to avoid refactoring)
-top_sku_sales = drivers(df_curr, df_prev, by="sku", metric="sales", top_n=10)
-top_channel_sales = drivers(df_curr, df_prev, by="channel", metric="sales", top_n=10)
-
-inp = NarrativeInputs(
-    kpi_delta=kpi_delta(curr, prev),
-    decomp=decomp,
-    top_sku_sales=top_sku_sales,
-    top_channel_sales=top_channel_sales,
-)
-
-rule_text = generate_rule_based_summary(inp)
+inp = narrative_inputs(window_report, driver_tables, baseline, orders_profile() if orders_in_memory() else None, returns)
+rule_text = run_snapshot_job("narrative", keys["narrative"], narrative_job, inp, label="Summarizing…")
 
 if st.button("Generate Summary"):
-    final_text = generate_ai_summary_with_openai(rule_text, context={})
+    final_text = run_job(
+        "ai_summary", rule_text, lambda ctx, text: generate_ai_summary_with_openai(text, context={}), rule_text,
+        label="Writing summary…",
+    )
     st.session_state["ai_summary"] = final_text
 
 if "ai_summary" in st.session_state:
+    llm = llm_request_stats()
+    st.caption(f"LLM calls (all sessions): {llm['calls']:,} · HTTP requests sent: {llm['requests']:,} · coalesced: {llm['coalesced']:,}")
     st.markdown(st.session_state["ai_summary"])
     st.code(st.session_state["ai_summary"], language="markdown")
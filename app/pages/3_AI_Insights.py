@@ -2,27 +2,26 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 
+from datetime import timedelta
+
+from utils.forecasting import expected_vs_actual
+from utils.session import load_demo, has_orders, orders_df, render_memory_usage
+
 st.set_page_config(page_title="AI Insights", layout="wide")
 st.title("AI Insights")
 
 st.caption("Rule-based executive summary (synthetic data only). Replace with LLM later.")
 
-from pathlib import Path
-
-ROOT_DIR = Path(__file__).resolve().parents[2]
-DEMO_CSV = ROOT_DIR / "data" / "synthetic_orders.csv"
-
-if "orders_df" not in st.session_state:
+if not has_orders():
     st.warning("No data found. Load demo data or go to Home to upload a CSV.")
     if st.button("Load demo data (synthetic)", use_container_width=True):
-        df_demo = pd.read_csv(DEMO_CSV)
-        if "order_date" in df_demo.columns:
-            df_demo["order_date"] = pd.to_datetime(df_demo["order_date"], errors="coerce")
-        st.session_state["orders_df"] = df_demo
+        load_demo()
         st.rerun()
     st.stop()
 
-df = st.session_state["orders_df"]
+# Shallow copy: this page adds helper columns and must not touch the shared (possibly cached) frame.
+df = orders_df().copy(deep=False)
+render_memory_usage()
 
 
 
@@ -200,6 +199,18 @@ if rev_by_day is not None and len(rev_by_day) >= 5:
         anomaly_day = max_day
         anomaly_ratio = max_val / med_val
 
+# Forecast-based anomaly: last 7 days vs. the per (sku, channel) trend + weekday baseline
+baseline = None
+if (
+    ORDER_DATE == "order_date"
+    and all(c in df.columns for c in ("sku", "channel", "quantity", "unit_price"))
+    and pd.notna(date_min) and pd.notna(date_max)
+):
+    bl_end = date_max.date()
+    bl_start = bl_end - timedelta(days=6)
+    if bl_start > date_min.date():
+        baseline = expected_vs_actual(df, bl_start, bl_end)
+
 # -------------------------
 # Executive Summary (rule-based)
 # -------------------------
@@ -257,6 +268,14 @@ if anomaly_day is not None and not np.isnan(anomaly_ratio) and anomaly_ratio >=
         "This may indicate promotions, bulk orders, or a data integrity issue."
     )
 
+if baseline is not None:
+    bl_actual, bl_expected = float(baseline["actual"].sum()), float(baseline["expected"].sum())
+    if bl_expected > 0 and abs(bl_actual / bl_expected - 1) >= 0.10:
+        summary_lines.append(
+            f"Last 7 days revenue is **{format_money(bl_actual)}** vs **{format_money(bl_expected)}** expected "
+            f"from trend and weekly seasonality ({format_pct(bl_actual / bl_expected - 1)})."
+        )
+
 # Always end with "next actions"
 summary_lines.append(
     "Next actions: validate high-impact channels/SKUs, investigate outlier dates, and add automated checks for missing values and schema drift."
@@ -295,6 +314,14 @@ with right:
     else:
         st.info("SKU column not found.")
 
+if baseline is not None:
+    st.subheader("Deviations from expected (last 7 days)")
+    st.dataframe(
+        baseline.reindex(baseline["residual"].abs().sort_values(ascending=False).index).head(10),
+        width="stretch",
+        hide_index=True,
+    )
+
 st.subheader("Trend")
 if rev_by_day is not None and len(rev_by_day) > 0:
     st.line_chart(rev_by_day.rename("revenue"))
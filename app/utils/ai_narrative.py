@@ -1,20 +1,161 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except Exception:
-    pass
+from typing import Optional, Dict, Any, Callable, Hashable, List
+import hashlib
+import json
 import os
+import threading
 import pandas as pd
 
+from .profiler import DataProfile
+
+_ENV_LOADED = False
+
+
+def _api_key() -> Optional[str]:
+    """OPENAI_API_KEY, loading `.env` on first use (keeps dotenv off the page import path)."""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        _ENV_LOADED = True
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except Exception:
+            pass
+    return os.getenv("OPENAI_API_KEY")
+
+
+def _responses_url() -> str:
+    """Responses API endpoint; OPENAI_BASE_URL points it at a proxy or a local stub server."""
+    return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/") + "/responses"
+
+
+# -------------------------
+# Single-flight LLM requests
+# -------------------------
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first caller runs `fn`, the rest
+    wait and receive its result (or exception). Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "requests": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
+
+_llm_flight = SingleFlight()
+
+
+def llm_request_stats() -> Dict[str, int]:
+    """Process-wide counts: LLM calls made, HTTP requests actually sent, and calls coalesced."""
+    return _llm_flight.stats()
+
+
+@dataclass
+class _HTTPResult:
+    status_code: int
+    data: Optional[dict]
+    text: str
+
+
+def _post_responses(api_key: str, payload: Dict[str, Any], timeout: float) -> _HTTPResult:
+    """
+    POST to the Responses API, coalescing identical in-flight requests (same endpoint, key and
+    payload: model, prompt, temperature) across sessions into one HTTP call.
+    """
+    import requests
+
+    url = _responses_url()
+    fingerprint = hashlib.sha256(
+        json.dumps(
+            {"url": url, "key": hashlib.sha256(api_key.encode()).hexdigest(), "payload": payload},
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()
+
+    def _send() -> _HTTPResult:
+        r = requests.post(
+            url,
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            json=payload,
+            timeout=timeout,
+        )
+        try:
+            data = r.json()
+        except Exception:
+            data = None
+        return _HTTPResult(r.status_code, data, r.text or "")
+
+    return _llm_flight.do(fingerprint, _send)
+
+
+def _output_text(data: Optional[dict]) -> str:
+    txt = ""
+    for item in (data or {}).get("output", []):
+        for c in item.get("content", []):
+            if c.get("type") == "output_text":
+                txt += c.get("text", "")
+    return txt
+
+
 @dataclass
 class NarrativeInputs:
     kpi_delta: pd.DataFrame
-    decomp: pd.DataFrame
+    decomp: pd.DataFrame  # GMV: diagnostics.decomp_table(decompose(...), "GMV")
     top_sku_sales: pd.DataFrame
     top_channel_sales: pd.DataFrame
+    data_profile: Optional[DataProfile] = None
+    baseline: Optional[pd.DataFrame] = None  # forecasting.expected_vs_actual for GMV
+    profit_decomp: Optional[pd.DataFrame] = None  # same layout for GROSS_PROFIT, with Cost_effect
+    returns: Optional[Dict[str, pd.DataFrame]] = None  # returns.returns_report
 
 def _fmt_money(x: float) -> str:
     return f"${x:,.2f}"
@@ -59,7 +200,16 @@ def generate_rule_based_summary(inp: NarrativeInputs) -> str:
     lines.append("## Why it changed (Price / Volume / Mix)")
     lines.append(f"- Volume effect: {_fmt_money(vol)}")
     lines.append(f"- Price effect: {_fmt_money(price)}")
-    lines.append(f"- Mix effect: {_fmt_money(mix)} (residual, driven by SKU/channel composition)")
+    lines.append(f"- Mix effect: {_fmt_money(mix)} (shift in SKU/channel composition)")
+
+    if inp.profit_decomp is not None and len(inp.profit_decomp) > 0:
+        pe = inp.profit_decomp.set_index("component")["value"].to_dict()
+        lines.append("")
+        lines.append("## Gross profit drivers (Volume / Price / Unit cost / Mix)")
+        lines.append(f"- Volume effect: {_fmt_money(float(pe.get('Volume_effect', 0.0)))}")
+        lines.append(f"- Price effect: {_fmt_money(float(pe.get('Price_effect', 0.0)))}")
+        lines.append(f"- Unit cost effect: {_fmt_money(float(pe.get('Cost_effect', 0.0)))} (negative when unit costs rose)")
+        lines.append(f"- Mix effect: {_fmt_money(float(pe.get('Mix_effect', 0.0)))} (shift toward lower/higher-margin SKUs)")
 
     lines.append("")
     lines.append("## Top Drivers")
@@ -68,6 +218,40 @@ def generate_rule_based_summary(inp: NarrativeInputs) -> str:
     if ch_driver:
         lines.append(f"- Top Channel driver by GMV delta: **{ch_driver[0]}** ({_fmt_money(ch_driver[1])})")
 
+    if inp.baseline is not None and len(inp.baseline) > 0:
+        b = inp.baseline
+        actual, expected = float(b["actual"].sum()), float(b["expected"].sum())
+        lines.append("")
+        lines.append("## Expected vs Actual (trend + weekly seasonality baseline)")
+        lines.append(f"- Current-window GMV {_fmt_money(actual)} vs expected {_fmt_money(expected)} ({_fmt_money(actual - expected)} unexplained by trend/seasonality).")
+        worst = b.nsmallest(3, "residual")
+        worst = worst[worst["residual"] < 0]
+        keys = [c for c in b.columns if c not in ("actual", "expected", "residual")]
+        for _, r in worst.iterrows():
+            label = " × ".join(str(r[k]) for k in keys)
+            lines.append(f"- Below expectation: **{label}** ({_fmt_money(float(r['residual']))} vs baseline)")
+
+    if inp.returns:
+        t = inp.returns["total"].set_index("metric")
+        rate_delta = float(t.loc["RETURN_RATE", "delta"])
+        lines.append("")
+        lines.append("## Returns")
+        lines.append(
+            f"- Return rate {_fmt_pct(float(t.loc['RETURN_RATE', 'prev']))} → {_fmt_pct(float(t.loc['RETURN_RATE', 'curr']))} "
+            f"({rate_delta * 100:+.2f} pp); returned GMV changed by {_fmt_money(float(t.loc['RETURNED_GMV', 'delta']))}, "
+            f"net-of-returns GMV by {_fmt_money(float(t.loc['NET_GMV', 'delta']))}."
+        )
+        if rate_delta > 0:
+            for dim in ("channel", "fulfillment_type", "sku"):
+                seg = inp.returns.get(dim)
+                if seg is None or seg.empty or float(seg["contribution"].iloc[0]) <= 0:
+                    continue
+                r = seg.iloc[0]
+                lines.append(
+                    f"- Largest contributor to the rise by {dim}: **{r[dim]}** ({float(r['contribution']) * 100:+.2f} pp; "
+                    f"own rate {float(r['rate_effect']) * 100:+.2f} pp, mix {float(r['mix_effect']) * 100:+.2f} pp)"
+                )
+
     lines.append("")
     lines.append("## Recommended Actions (next 7 days)")
     lines.append("- Validate whether the change is driven by a few SKUs (stockouts, price changes, promo ending).")
@@ -77,9 +261,18 @@ def generate_rule_based_summary(inp: NarrativeInputs) -> str:
 
     lines.append("")
     lines.append("## Data Checks")
-    lines.append("- Confirm order_date completeness and no missing days in the current window.")
-    lines.append("- Verify SKU mapping consistency (no duplicate/renamed SKUs).")
-    lines.append("- Validate unit_cost coverage if Gross Profit is used.")
+    if inp.data_profile is None:
+        lines.append("- Confirm order_date completeness and no missing days in the current window.")
+        lines.append("- Verify SKU mapping consistency (no duplicate/renamed SKUs).")
+        lines.append("- Validate unit_cost coverage if Gross Profit is used.")
+    else:
+        findings = inp.data_profile.findings()
+        # The profile is computed once per dataset, so these describe all of it, not only the two windows.
+        lines.append("- Checks cover the whole dataset, not only the compared windows.")
+        for f in findings:
+            lines.append(f"- {f}")
+        if not findings:
+            lines.append("- No data quality issues found (dates complete, SKUs consistent, unit_cost fully covered).")
 
     return "\n".join(lines)
 
@@ -89,16 +282,10 @@ def generate_ai_summary_with_openai(rule_summary: str, context: Dict[str, Any])
     Optional enhancement. Only runs if OPENAI_API_KEY is set.
     Keeps your app runnable without any key.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
+    api_key = _api_key()
     if not api_key:
         return rule_summary
 
-    # Minimal, safe dependency: use requests (already common). If missing, fall back.
-    try:
-        import requests
-    except Exception:
-        return rule_summary
-
     prompt = f"""
 You are an analytics copilot. Rewrite the following rule-based diagnosis into a concise, interview-ready narrative.
 - Keep it factual and consistent with the numbers.
@@ -112,10 +299,9 @@ RULE SUMMARY:
     # Use OpenAI Responses API style via HTTP (kept generic; you can swap later).
     # If this fails for any reason, we fall back to rule_summary.
     try:
-        r = requests.post(
-            "https://api.openai.com/v1/responses",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={
+        r = _post_responses(
+            api_key,
+            {
                 "model": "gpt-4.1-mini",
                 "input": prompt,
                 "temperature": 0.2,
@@ -124,35 +310,22 @@ RULE SUMMARY:
         )
         if r.status_code != 200:
             return rule_summary
-        data = r.json()
         # Responses API: extract output text if available
-        # Robust extraction:
-        txt = ""
-        for item in data.get("output", []):
-            for c in item.get("content", []):
-                if c.get("type") == "output_text":
-                    txt += c.get("text", "")
-        return txt.strip() or rule_summary
+        return _output_text(r.data).strip() or rule_summary
     except Exception:
         return rule_summary
 def call_openai_text(prompt: str, model: str = "gpt-4.1-mini", temperature: float = 0.2) -> str:
     """
     Generic LLM call. Returns "" if no key or request fails.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
+    api_key = _api_key()
     if not api_key:
         return ""
 
     try:
-        import requests
-    except Exception:
-        return ""
-
-    try:
-        r = requests.post(
-            "https://api.openai.com/v1/responses",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={
+        r = _post_responses(
+            api_key,
+            {
                 "model": model,
                 "input": prompt,
                 "temperature": temperature,
@@ -161,14 +334,7 @@ def call_openai_text(prompt: str, model: str = "gpt-4.1-mini", temperature: floa
         )
         if r.status_code != 200:
             return ""
-
-        data = r.json()
-        txt = ""
-        for item in data.get("output", []):
-            for c in item.get("content", []):
-                if c.get("type") == "output_text":
-                    txt += c.get("text", "")
-        return txt.strip()
+        return _output_text(r.data).strip()
     except Exception:
         return ""
 def call_openai_text(prompt: str, model: str = "gpt-4.1-mini", temperature: float = 0.2):
@@ -177,7 +343,7 @@ def call_openai_text(prompt: str, model: str = "gpt-4.1-mini", temperature: floa
     """
     import os
 
-    api_key = os.getenv("OPENAI_API_KEY")
+    api_key = _api_key()
     if not api_key:
         return "", "OPENAI_API_KEY is missing (env not loaded)."
 
@@ -187,10 +353,9 @@ def call_openai_text(prompt: str, model: str = "gpt-4.1-mini", temperature: floa
         return "", f"requests not available: {e}"
 
     try:
-        r = requests.post(
-            "https://api.openai.com/v1/responses",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json={
+        r = _post_responses(
+            api_key,
+            {
                 "model": model,
                 "input": prompt,
                 "temperature": temperature,
@@ -201,19 +366,12 @@ def call_openai_text(prompt: str, model: str = "gpt-4.1-mini", temperature: floa
         if r.status_code != 200:
             # show a short server message
             try:
-                j = r.json()
-                msg = j.get("error", {}).get("message", str(j))[:400]
+                msg = r.data.get("error", {}).get("message", str(r.data))[:400]
             except Exception:
-                msg = (r.text or "")[:400]
+                msg = r.text[:400]
             return "", f"HTTP {r.status_code}: {msg}"
 
-        data = r.json()
-        txt = ""
-        for item in data.get("output", []):
-            for c in item.get("content", []):
-                if c.get("type") == "output_text":
-                    txt += c.get("text", "")
-        txt = txt.strip()
+        txt = _output_text(r.data).strip()
         if not txt:
             return "", "Response OK but empty output_text."
         return txt, "OK"
@@ -0,0 +1,218 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional, Tuple, TypeVar
+
+import numpy as np
+import pandas as pd
+
+from .order_store import OrderStore
+from .topk import top_k_indices
+
+INDEX_DIMENSIONS = ["channel", "fulfillment_type", "warehouse_zone", "sku"]
+# Dimensions with at most this many values get one bitmap per value; larger ones
+# (typically sku) get sorted row-id postings instead, which cost 4 bytes per row in total.
+MAX_BITMAP_VALUES = 64
+MISSING = "(missing)"
+_EPOCH = np.datetime64("1970-01-01", "D")
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+Data = TypeVar("Data", pd.DataFrame, OrderStore)
+
+
+@dataclass(frozen=True)
+class Selection:
+    """A set of rows of one indexed dataset, as a packed bitmap (1 bit per row)."""
+
+    bits: np.ndarray
+    n_rows: int
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "Selection":
+        return cls(np.packbits(mask), len(mask))
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray, n_rows: int) -> "Selection":
+        mask = np.zeros(n_rows, dtype=bool)
+        mask[rows] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def full(cls, n_rows: int) -> "Selection":
+        return cls.from_mask(np.ones(n_rows, dtype=bool))
+
+    @classmethod
+    def empty(cls, n_rows: int) -> "Selection":
+        return cls(np.zeros((n_rows + 7) // 8, dtype=np.uint8), n_rows)
+
+    def _check(self, other: "Selection") -> None:
+        if other.n_rows != self.n_rows:
+            raise ValueError("Selections are over different datasets")
+
+    def __and__(self, other: "Selection") -> "Selection":
+        self._check(other)
+        return Selection(self.bits & other.bits, self.n_rows)
+
+    def __or__(self, other: "Selection") -> "Selection":
+        self._check(other)
+        return Selection(self.bits | other.bits, self.n_rows)
+
+    def __invert__(self) -> "Selection":
+        bits = ~self.bits
+        if self.n_rows % 8 and len(bits):
+            bits[-1] &= np.uint8(0xFF << (8 - self.n_rows % 8) & 0xFF)  # keep padding bits clear
+        return Selection(bits, self.n_rows)
+
+    def count(self) -> int:
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def is_full(self) -> bool:
+        return self.count() == self.n_rows
+
+    def mask(self) -> np.ndarray:
+        return np.unpackbits(self.bits, count=self.n_rows).astype(bool)
+
+    def rows(self) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.n_rows))
+
+    def apply(self, data: Data) -> Data:
+        """The selected rows of `data` (the frame or store the index was built on); no copy when all rows are selected."""
+        if not isinstance(data, (OrderStore, pd.DataFrame)):
+            raise ValueError("Selections apply to a DataFrame or an OrderStore")
+        n = data.n_rows if isinstance(data, OrderStore) else len(data)
+        if n != self.n_rows:
+            raise ValueError("Selection does not match the data")
+        if self.is_full():
+            return data
+        rows = self.rows()
+        return data.take(rows) if isinstance(data, OrderStore) else data.iloc[rows]
+
+
+def apply_selection(data: Data, selection: Optional[Selection]) -> Data:
+    return data if selection is None else selection.apply(data)
+
+
+class BitmapIndex:
+    """
+    Per-value row indexes for the filter dimensions and the order date, built once per dataset.
+
+    - low-cardinality dimensions: one packed bitmap per value, so `isin` is an OR of bitmaps
+    - high-cardinality dimensions (sku): row ids sorted by code with per-code offsets
+    - order_date: row ids sorted by day, so a date range is one `searchsorted` slice
+    Filters on several dimensions are ANDed as bitmaps; no data column is scanned.
+    Row positions match the frame / OrderStore the index was built from.
+    """
+
+    def __init__(
+        self,
+        n_rows: int,
+        labels: Dict[str, np.ndarray],
+        bitmaps: Dict[str, np.ndarray],
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        day_order: np.ndarray,
+        day_sorted: np.ndarray,
+    ):
+        self.n_rows = n_rows
+        self.labels = labels
+        self._bitmaps = bitmaps
+        self._postings = postings
+        self._day_order = day_order
+        self._day_sorted = day_sorted
+
+    @classmethod
+    def from_codes(cls, codes: Dict[str, np.ndarray], labels: Dict[str, np.ndarray], day: np.ndarray) -> "BitmapIndex":
+        n = len(day)
+        bitmaps, postings = {}, {}
+        for dim, cc in codes.items():
+            k = len(labels[dim])
+            if k <= MAX_BITMAP_VALUES:
+                bm = np.empty((k, (n + 7) // 8), dtype=np.uint8)
+                for v in range(k):
+                    bm[v] = np.packbits(cc == v)
+                bitmaps[dim] = bm
+            else:
+                order = np.argsort(cc, kind="stable").astype(np.int32)
+                offsets = np.concatenate([[0], np.cumsum(np.bincount(cc, minlength=k))])
+                postings[dim] = (order, offsets)
+        day_order = np.argsort(day, kind="stable").astype(np.int32)
+        return cls(n, {d: labels[d] for d in codes}, bitmaps, postings, day_order, day[day_order])
+
+    @classmethod
+    def from_store(cls, store: OrderStore, dims: Iterable[str] = INDEX_DIMENSIONS) -> "BitmapIndex":
+        dims = [d for d in dims if d in store.codes]
+        return cls.from_codes({d: store.codes[d] for d in dims}, {d: store.labels[d] for d in dims}, store.day)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dims: Iterable[str] = INDEX_DIMENSIONS) -> "BitmapIndex":
+        codes, labels = {}, {}
+        for d in dims:
+            if d in df.columns:
+                cc, uniq = pd.factorize(df[d].astype("object").where(df[d].notna(), MISSING))
+                codes[d], labels[d] = cc.astype(np.int32), np.asarray(uniq, dtype=object)
+        day = pd.to_datetime(df["order_date"], errors="coerce").to_numpy().astype("datetime64[D]")
+        return cls.from_codes(codes, labels, (day - _EPOCH).astype(np.int32))
+
+    # -------------------------
+    # Filters
+    # -------------------------
+    def all(self) -> Selection:
+        return Selection.full(self.n_rows)
+
+    def values(self, dim: str) -> list:
+        """Sorted labels of `dim` (for filter widgets)."""
+        return sorted(self.labels[dim], key=str)
+
+    def counts(self, dim: str) -> np.ndarray:
+        """Rows per label of `dim` (aligned with `labels[dim]`), read off the bitmaps / posting offsets."""
+        if dim in self._bitmaps:
+            return _POPCOUNT[self._bitmaps[dim]].sum(axis=1, dtype=np.int64)
+        return np.diff(self._postings[dim][1])
+
+    def top_values(self, dim: str, k: int, text: Optional[str] = None) -> list:
+        """
+        Sorted labels of the `k` most frequent values of `dim`, optionally only those containing
+        `text` (case-insensitive): bounded options for widgets over high-cardinality dimensions.
+        """
+        labels = self.labels[dim]
+        idx = np.arange(len(labels))
+        if text:
+            idx = np.flatnonzero(pd.Index(labels).astype(str).str.contains(text, case=False, regex=False))
+        idx = idx[top_k_indices(self.counts(dim)[idx], k)]
+        return sorted(labels[idx], key=str)
+
+    def isin(self, dim: str, values: Iterable) -> Selection:
+        wanted = np.flatnonzero(np.isin(self.labels[dim], list(values)))
+        if len(wanted) == len(self.labels[dim]):
+            return self.all()
+        if len(wanted) == 0:
+            return Selection.empty(self.n_rows)
+        if dim in self._bitmaps:
+            return Selection(np.bitwise_or.reduce(self._bitmaps[dim][wanted], axis=0), self.n_rows)
+        order, offsets = self._postings[dim]
+        return Selection.from_rows(np.concatenate([order[offsets[v]:offsets[v + 1]] for v in wanted]), self.n_rows)
+
+    def between(self, start=None, end=None) -> Selection:
+        """Rows with start <= order_date <= end (whole days; None leaves that side open)."""
+        if start is None and end is None:
+            return self.all()
+        lo = 0 if start is None else np.searchsorted(self._day_sorted, _day_number(start), "left")
+        hi = len(self._day_sorted) if end is None else np.searchsorted(self._day_sorted, _day_number(end), "right")
+        return Selection.from_rows(self._day_order[lo:hi], self.n_rows)
+
+    def select(self, start=None, end=None, filters: Optional[Mapping[str, Iterable]] = None) -> Selection:
+        """AND of the date range and one `isin` per dimension in `filters` (None = no filter on that dimension)."""
+        sel = self.between(start, end)
+        for dim, values in (filters or {}).items():
+            if values is not None:
+                sel = sel & self.isin(dim, values)
+        return sel
+
+    def nbytes(self) -> int:
+        arrays = [self._day_order, self._day_sorted, *self._bitmaps.values()]
+        for order, offsets in self._postings.values():
+            arrays += [order, offsets]
+        return int(sum(a.nbytes for a in arrays))
+
+
+def _day_number(d) -> int:
+    return int((np.datetime64(pd.Timestamp(d).date(), "D") - _EPOCH).astype(np.int32))
+
@@ -1,5 +1,14 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Optional, List, Tuple
+
 import pandas as pd
 
+from .topk import HeavyHitters
+
 REQUIRED_COLUMNS = [
     "order_id", "order_date", "channel", "sku", "quantity", "unit_price"
 ]
@@ -7,8 +16,108 @@ REQUIRED_COLUMNS = [
 OPTIONAL_NUMERIC_COLUMNS = ["unit_cost", "pick_time_sec"]
 OPTIONAL_BOOL_COLUMNS = ["is_returned"]
 
-def load_orders_csv(file) -> pd.DataFrame:
-    df = pd.read_csv(file)
+# pd.read_csv's default missing-value tokens (its documented `na_values` list), given to the
+# pyarrow engine too; Arrow's own default misses e.g. "None" / "<NA>" / "n/a".
+CSV_NA_VALUES = (
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+)
+
+DEFAULT_CHUNKSIZE = 500_000
+# Below this size pandas' single-threaded parser is faster than spinning up Arrow's thread pool.
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+def load_orders_csv(
+    file,
+    chunksize: Optional[int] = None,
+    heavy_hitters: Optional[HeavyHitters] = None,
+    engine: str = "auto",
+) -> pd.DataFrame:
+    """
+    Read and validate an orders CSV. `heavy_hitters` are fed from the parsed frame, one
+    DEFAULT_CHUNKSIZE slice at a time, so they never change how the file is parsed. Only an
+    explicit `chunksize` reads the file in pandas chunks (each validated chunk is folded into the
+    summaries as it arrives); pandas then infers dtypes per chunk.
+
+    engine: 'pandas', 'pyarrow' (multithreaded parse) or 'auto' (pyarrow for large files
+    when available). Both engines produce the same validated frame.
+    """
+    if engine == "auto":
+        engine = "pyarrow" if chunksize is None and _parallel_available() and _file_size(file) >= PARALLEL_MIN_BYTES else "pandas"
+
+    if engine == "pyarrow":
+        df = _clean_orders(_read_csv_pyarrow(file))
+    elif engine != "pandas":
+        raise ValueError(f"Unsupported engine: {engine}")
+    elif chunksize is None:
+        df = _clean_orders(pd.read_csv(file))
+    else:
+        parts = []
+        for chunk in pd.read_csv(file, chunksize=chunksize):
+            chunk = _clean_orders(chunk)
+            if heavy_hitters is not None:
+                heavy_hitters.update(chunk)
+            parts.append(chunk)
+        return pd.concat(parts, ignore_index=True)
+
+    if heavy_hitters is not None:
+        for i in range(0, len(df), DEFAULT_CHUNKSIZE):
+            heavy_hitters.update(df.iloc[i:i + DEFAULT_CHUNKSIZE])
+    return df
+
+def _parallel_available() -> bool:
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _file_size(file) -> int:
+    if isinstance(file, (str, Path)):
+        return Path(file).stat().st_size
+    if getattr(file, "size", None) is not None:  # Streamlit UploadedFile
+        return int(file.size)
+    try:
+        pos = file.tell()
+        file.seek(0, 2)
+        size = file.tell()
+        file.seek(pos)
+        return size
+    except Exception:
+        return 0
+
+def _read_csv_pyarrow(file) -> pd.DataFrame:
+    """
+    Multithreaded parse with Arrow, configured to match `pd.read_csv` defaults: same null
+    tokens (CSV_NA_VALUES), empty strings as nulls, all-null columns as float NaN, and
+    dates/times left as text (pandas does not infer them; `_clean_orders` converts order_date
+    either way).
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    table = pacsv.read_csv(
+        file,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=16 * 1024 * 1024),
+        convert_options=pacsv.ConvertOptions(
+            null_values=list(CSV_NA_VALUES), strings_can_be_null=True, timestamp_parsers=[],
+        ),
+    )
+    for i, f in enumerate(table.schema):
+        if pa.types.is_temporal(f.type):
+            table = table.set_column(i, f.name, table.column(i).cast(pa.string()))
+        elif pa.types.is_null(f.type):
+            # Arrow's null type converts to object None; pandas reads an all-null column as float64.
+            table = table.set_column(i, f.name, table.column(i).cast(pa.float64()))
+    df = table.to_pandas()
+    for f in table.schema:
+        if pa.types.is_string(f.type) or pa.types.is_large_string(f.type):
+            # Arrow yields None for nulls in object columns; pandas uses NaN.
+            df[f.name] = df[f.name].where(df[f.name].notna(), np.nan)
+    return df
+
+def _clean_orders(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = [c.strip() for c in df.columns]
 
     missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
@@ -34,3 +143,88 @@ def load_orders_csv(file) -> pd.DataFrame:
     df = df[df["unit_price"] >= 0]
 
     return df
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a loaded dataset; used as the cache key for per-dataset results."""
+    h = pd.util.hash_pandas_object(df, index=False).values
+    return f"{len(df)}-{hashlib.sha1(h.tobytes()).hexdigest()[:16]}"
+
+
+# -------------------------
+# Date-partitioned datasets (one file per day)
+# -------------------------
+PARTITION_SUFFIXES = (".csv", ".parquet")
+# Matches 2024-06-01 / 2024_06_01 / 20240601 anywhere in the relative path (incl. order_date=2024-06-01/).
+PARTITION_DATE_RE = re.compile(r"(\d{4})[-_]?(\d{2})[-_]?(\d{2})")
+
+
+@dataclass
+class Partition:
+    path: Path
+    day: date
+
+
+@dataclass
+class PartitionScan:
+    read: int
+    skipped: int
+    files: List[str] = field(default_factory=list)
+
+
+class PartitionedOrders:
+    """
+    A directory of date-partitioned CSV/Parquet order files opened as one logical dataset.
+    The partition date comes from the file path, so date filters prune files before any parsing.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        if not self.root.is_dir():
+            raise ValueError(f"Not a directory: {self.root}")
+        self.partitions: List[Partition] = []
+        for p in sorted(self.root.rglob("*")):
+            if p.suffix.lower() not in PARTITION_SUFFIXES or not p.is_file():
+                continue
+            m = PARTITION_DATE_RE.findall(str(p.relative_to(self.root)))
+            if not m:
+                continue
+            try:
+                day = date(*(int(x) for x in m[-1]))
+            except ValueError:
+                continue
+            self.partitions.append(Partition(p, day))
+        if not self.partitions:
+            raise ValueError(f"No date-partitioned CSV/Parquet files found in {self.root}")
+
+    @property
+    def date_bounds(self) -> Tuple[date, date]:
+        days = [p.day for p in self.partitions]
+        return min(days), max(days)
+
+    @property
+    def fingerprint(self) -> str:
+        # File names, sizes and mtimes: cheap to compute and changes whenever a partition is rewritten.
+        h = hashlib.sha1(str(self.root.resolve()).encode())
+        for p in self.partitions:
+            stat = p.path.stat()
+            h.update(f"{p.path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return f"parts-{len(self.partitions)}-{h.hexdigest()[:16]}"
+
+    def read(self, start: Optional[date] = None, end: Optional[date] = None) -> Tuple[pd.DataFrame, PartitionScan]:
+        """Read only partitions overlapping [start, end], validate, and trim rows to the window."""
+        keep = [
+            p for p in self.partitions
+            if (start is None or p.day >= start) and (end is None or p.day <= end)
+        ]
+        scan = PartitionScan(read=len(keep), skipped=len(self.partitions) - len(keep), files=[str(p.path) for p in keep])
+        if not keep:
+            return _clean_orders(pd.DataFrame(columns=REQUIRED_COLUMNS)), scan
+
+        frames = [pd.read_parquet(p.path) if p.path.suffix.lower() == ".parquet" else pd.read_csv(p.path) for p in keep]
+        df = _clean_orders(pd.concat(frames, ignore_index=True))
+        # Files are named by day but rows are authoritative; drop any that fall outside the window.
+        if start is not None:
+            df = df[df["order_date"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["order_date"] < pd.Timestamp(end) + pd.Timedelta(days=1)]
+        return df, scan
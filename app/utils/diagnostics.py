@@ -1,5 +1,14 @@
+from typing import Optional, Union
+
+import numpy as np
 import pandas as pd
 
+from .forecasting import residual_by
+from .order_store import OrderStore
+from .returns import returns_kpis
+from .sharded import ShardedStore
+from .topk import top_k_indices
+
 def _add_sales_profit(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
     out["sales"] = out["quantity"] * out["unit_price"]
@@ -9,11 +18,15 @@ def _add_sales_profit(df: pd.DataFrame) -> pd.DataFrame:
         out["gross_profit"] = pd.NA
     return out
 
-def slice_by_date(df: pd.DataFrame, start_date, end_date) -> pd.DataFrame:
+def slice_by_date(df: Union[pd.DataFrame, OrderStore], start_date, end_date) -> pd.DataFrame:
+    if isinstance(df, OrderStore):
+        return df.slice_days(start_date, end_date)
     d = df.copy()
     return d[(d["order_date"].dt.date >= start_date) & (d["order_date"].dt.date <= end_date)]
 
-def compute_kpis(df: pd.DataFrame) -> dict:
+def compute_kpis(df: Union[pd.DataFrame, OrderStore]) -> dict:
+    if isinstance(df, OrderStore):
+        return _compute_kpis_store(df)
     d = _add_sales_profit(df)
     gmv = float(d["sales"].sum())
     orders = int(d["order_id"].nunique())
@@ -27,7 +40,24 @@ def compute_kpis(df: pd.DataFrame) -> dict:
     else:
         gp, gm = None, None
 
-    return {"gmv": gmv, "orders": orders, "units": units, "aov": aov, "asp": asp, "gross_profit": gp, "gross_margin": gm}
+    returned = d["is_returned"].to_numpy() if "is_returned" in d.columns else None
+    return {"gmv": gmv, "orders": orders, "units": units, "aov": aov, "asp": asp, "gross_profit": gp, "gross_margin": gm,
+            **returns_kpis(gmv, d["sales"].to_numpy(dtype="float64"), returned)}
+
+def _compute_kpis_store(s: OrderStore) -> dict:
+    sales = s.sales()
+    gmv = float(sales.sum())
+    orders = s.n_orders()
+    units = int(s.quantity.sum(dtype=np.float64))
+    aov = (gmv / orders) if orders else 0.0
+    asp = (gmv / units) if units else 0.0
+    if s.has_cost:
+        gp = float(s.gross_profit().sum())
+        gm = (gp / gmv) if gmv else 0.0
+    else:
+        gp, gm = None, None
+    return {"gmv": gmv, "orders": orders, "units": units, "aov": aov, "asp": asp, "gross_profit": gp, "gross_margin": gm,
+            **returns_kpis(gmv, sales, s.is_returned)}
 
 def kpi_delta(curr: dict, prev: dict) -> pd.DataFrame:
     rows = []
@@ -36,9 +66,18 @@ def kpi_delta(curr: dict, prev: dict) -> pd.DataFrame:
     if curr.get("gross_profit") is not None and prev.get("gross_profit") is not None:
         rows.append(["GROSS_PROFIT", prev["gross_profit"], curr["gross_profit"], curr["gross_profit"] - prev["gross_profit"]])
         rows.append(["GROSS_MARGIN", prev["gross_margin"], curr["gross_margin"], curr["gross_margin"] - prev["gross_margin"]])
+    for k in ["returned_gmv", "net_gmv"]:
+        if curr.get(k) is not None and prev.get(k) is not None:
+            rows.append([k.upper(), prev[k], curr[k], curr[k] - prev[k]])
     return pd.DataFrame(rows, columns=["metric", "prev", "curr", "delta"])
 
-def drivers(df_curr: pd.DataFrame, df_prev: pd.DataFrame, by: str, metric: str, top_n: int = 10) -> pd.DataFrame:
+def _driver_aggs(df_curr: pd.DataFrame, df_prev: pd.DataFrame, by: str, metric: str):
+    if isinstance(df_curr, (OrderStore, ShardedStore)):
+        c_s, p_s = df_curr.group(by, metric), df_prev.group(by, metric)
+        if c_s is None or p_s is None:
+            return None, None
+        return c_s.reset_index(name="curr"), p_s.reset_index(name="prev")
+
     c = _add_sales_profit(df_curr)
     p = _add_sales_profit(df_prev)
 
@@ -53,42 +92,182 @@ def drivers(df_curr: pd.DataFrame, df_prev: pd.DataFrame, by: str, metric: str,
         p_agg = p.groupby(by)["order_id"].nunique().reset_index(name="prev")
     elif metric == "gross_profit":
         if c["gross_profit"].isna().all() or p["gross_profit"].isna().all():
-            return pd.DataFrame({by: [], "prev": [], "curr": [], "delta": []})
+            return None, None
         c_agg = c.groupby(by)["gross_profit"].sum().reset_index(name="curr")
         p_agg = p.groupby(by)["gross_profit"].sum().reset_index(name="prev")
     else:
         raise ValueError("Unsupported metric")
+    return c_agg, p_agg
+
+def drivers(
+    df_curr: Union[pd.DataFrame, OrderStore, ShardedStore],
+    df_prev: Union[pd.DataFrame, OrderStore, ShardedStore],
+    by: str,
+    metric: str,
+    top_n: int = 10,
+    baseline: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    baseline: optional `forecasting.expected_vs_actual` result for the same metric and current
+    window; adds `expected` and `residual` (curr - expected) columns per `by` value.
+    """
+    c_agg, p_agg = _driver_aggs(df_curr, df_prev, by, metric)
+    if c_agg is None:
+        return pd.DataFrame({by: [], "prev": [], "curr": [], "delta": []})
 
     m = c_agg.merge(p_agg, on=by, how="outer").fillna(0)
     m["delta"] = m["curr"] - m["prev"]
-    return m.sort_values("delta", ascending=False).head(top_n)
+    if baseline is not None and by in baseline.columns:
+        exp = residual_by(baseline, by)[[by, "expected"]]
+        m = m.merge(exp, on=by, how="left").fillna({"expected": 0.0})
+        m["residual"] = m["curr"] - m["expected"]
+    # Partial selection of the top_n rows instead of sorting every key.
+    return m.iloc[top_k_indices(m["delta"].to_numpy(dtype="float64"), top_n)]
+
+def pvm_aggregates(
+    df_curr: Union[pd.DataFrame, OrderStore],
+    df_prev: Union[pd.DataFrame, OrderStore],
+    by: str = "sku",
+) -> pd.DataFrame:
+    """
+    Per-key aggregates for both windows, from one grouped pass over each:
+    - units, price (mean unit price), sales
+    - with unit_cost: cost (mean unit cost), cost_units / cost_sales / cogs over the rows that have a cost
+    Columns are suffixed _c / _p (`by`, units_c, price_c, sales_c, [cost_c, cost_units_c, ...], units_p, ...).
+    Shared by `decompose` and the what-if pricing simulator.
+    """
+    if isinstance(df_curr, OrderStore):
+        c, p = _pvm_store(df_curr, by), _pvm_store(df_prev, by)
+    else:
+        with_cost = "unit_cost" in df_curr.columns and "unit_cost" in df_prev.columns
+        c, p = _pvm_frame(df_curr, by, with_cost), _pvm_frame(df_prev, by, with_cost)
+    return c.merge(p, on=by, how="outer", suffixes=("_c", "_p")).fillna(0)
+
+def _pvm_frame(df: pd.DataFrame, by: str, with_cost: bool) -> pd.DataFrame:
+    qty = df["quantity"].astype("float64")
+    cols = {by: df[by], "quantity": qty, "unit_price": df["unit_price"], "sales": qty * df["unit_price"]}
+    spec = {"units": ("quantity", "sum"), "price": ("unit_price", "mean"), "sales": ("sales", "sum")}
+    if with_cost:
+        has = df["unit_cost"].notna()
+        cols.update(
+            unit_cost=df["unit_cost"],
+            cost_units=qty.where(has, 0.0),
+            cost_sales=cols["sales"].where(has, 0.0),
+            cogs=(qty * df["unit_cost"]).fillna(0.0),
+        )
+        spec.update(
+            cost=("unit_cost", "mean"),
+            cost_units=("cost_units", "sum"),
+            cost_sales=("cost_sales", "sum"),
+            cogs=("cogs", "sum"),
+        )
+    return pd.DataFrame(cols).groupby(by).agg(**spec).reset_index()
+
+def _pvm_store(s: OrderStore, by: str) -> pd.DataFrame:
+    n = s.count_by(by)
+    present = n > 0
+    qty, sales = s.quantity.astype(np.float64), s.sales()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = {
+            by: s.labels[by][present],
+            "units": s.sum_by(by, qty)[present],
+            "price": (s.sum_by(by, s.unit_price.astype(np.float64)) / n)[present],
+            "sales": s.sum_by(by, sales)[present],
+        }
+        if "unit_cost" in s.measures:
+            cost = s.measures["unit_cost"].astype(np.float64)
+            has = np.isfinite(cost)
+            # Mean over rows with a cost, as pandas' mean skips NaN.
+            out["cost"] = (s.sum_by(by, np.where(has, cost, 0.0)) / s.sum_by(by, has.astype(np.float64)))[present]
+            out["cost_units"] = s.sum_by(by, np.where(has, qty, 0.0))[present]
+            out["cost_sales"] = s.sum_by(by, np.where(has, sales, 0.0))[present]
+            out["cogs"] = s.sum_by(by, np.where(has, qty * cost, 0.0))[present]
+    return pd.DataFrame(out)
+
+# -------------------------
+# Price / volume / mix / cost decomposition
+# -------------------------
+DECOMP_MEASURES = {"GMV": "GMV", "GROSS_PROFIT": "GP"}
+
+def _effects(q_c, q_p, v_c, v_p, price_c, price_p, cost_c=None, cost_p=None) -> dict:
+    """
+    Effects on sum(q * v) between windows, per-key arrays (v = unit value: price or price - cost).
+    - Volume: total-quantity change at the previous average unit value
+    - Mix: shift in the key shares of quantity, at previous unit values
+    - Price: q_c * (price_c - price_p);  Unit cost: -q_c * (cost_c - cost_p)
+    Keys new in the current window are valued at their current values (their impact is mix).
+    The effects add up to curr - prev exactly.
+    """
+    new = q_p == 0
+    v_p = np.where(new, v_c, v_p)
+    price_p = np.where(new, price_c, price_p)
+    total_c, total_p = float(q_c @ v_c), float(q_p @ v_p)
+    u_c, u_p = float(q_c.sum()), float(q_p.sum())
+    avg_p = total_p / u_p if u_p else 0.0
+    out = {
+        "prev": total_p,
+        "curr": total_c,
+        "Delta": total_c - total_p,
+        "Volume_effect": (u_c - u_p) * avg_p,
+        "Price_effect": float(q_c @ (price_c - price_p)),
+    }
+    if cost_c is not None:
+        cost_p = np.where(new, cost_c, cost_p)
+        out["Cost_effect"] = -float(q_c @ (cost_c - cost_p))
+    out["Mix_effect"] = float(q_c @ v_p) - u_c * avg_p
+    return out
+
+def decompose(
+    df_curr: Union[pd.DataFrame, OrderStore],
+    df_prev: Union[pd.DataFrame, OrderStore],
+    by: str = "sku",
+    agg: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Volume / price / mix effects on GMV and volume / price / unit-cost / mix effects on gross
+    profit, all from the per-key arrays of one `pvm_aggregates` result (pass `agg` to reuse it).
+    Unit prices/costs are quantity-weighted (sales / units, cogs / units), so the prev/curr
+    totals match the window KPIs; gross profit uses the rows that have a unit_cost.
+    Long format: measure ('GMV' | 'GROSS_PROFIT'), component, value.
+    """
+    m = pvm_aggregates(df_curr, df_prev, by) if agg is None else agg
+    arr = {c: m[c].to_numpy(dtype="float64") for c in m.columns if c != by}
+
+    def unit(num: str, den: str, w: str) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.nan_to_num(arr[f"{num}_{w}"] / arr[f"{den}_{w}"])
+
+    results = {}
+    p_c, p_p = unit("sales", "units", "c"), unit("sales", "units", "p")
+    results["GMV"] = _effects(arr["units_c"], arr["units_p"], p_c, p_p, p_c, p_p)
+    if "cogs_c" in arr and (arr["cost_units_c"].any() or arr["cost_units_p"].any()):
+        q_c, q_p = arr["cost_units_c"], arr["cost_units_p"]
+        p_c, p_p = unit("cost_sales", "cost_units", "c"), unit("cost_sales", "cost_units", "p")
+        c_c, c_p = unit("cogs", "cost_units", "c"), unit("cogs", "cost_units", "p")
+        results["GROSS_PROFIT"] = _effects(q_c, q_p, p_c - c_c, p_p - c_p, p_c, p_p, c_c, c_p)
+
+    rows = []
+    for measure, effects in results.items():
+        prefix = DECOMP_MEASURES[measure]
+        for component, value in effects.items():
+            name = f"{prefix}_{component}" if component in ("prev", "curr") else component
+            rows.append([measure, name, value])
+    return pd.DataFrame(rows, columns=["measure", "component", "value"])
+
+def decomp_table(decomposition: pd.DataFrame, measure: str = "GMV") -> Optional[pd.DataFrame]:
+    """One measure of a `decompose` result as component/value rows (None if the measure is absent)."""
+    d = decomposition[decomposition["measure"] == measure]
+    return d[["component", "value"]].reset_index(drop=True) if len(d) else None
 
-def price_volume_mix(df_curr: pd.DataFrame, df_prev: pd.DataFrame, by: str = "sku") -> pd.DataFrame:
+def price_volume_mix(
+    df_curr: pd.DataFrame,
+    df_prev: pd.DataFrame,
+    by: str = "sku",
+    agg: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
     """
-    Decompose GMV delta into:
-    - Volume effect: (units_c - units_p) * price_p
-    - Price effect: units_c * (price_c - price_p)
-    - Mix effect: residual
+    GMV part of `decompose`: GMV_prev, GMV_curr, Delta, Volume_effect, Price_effect, Mix_effect.
+    agg: precomputed `pvm_aggregates(df_curr, df_prev, by)` to skip the groupbys.
     """
-    c = df_curr.groupby(by).agg(units=("quantity", "sum"), price=("unit_price", "mean")).reset_index()
-    p = df_prev.groupby(by).agg(units=("quantity", "sum"), price=("unit_price", "mean")).reset_index()
-    m = c.merge(p, on=by, how="outer", suffixes=("_c", "_p")).fillna(0)
-
-    gmv_c = float((m["units_c"] * m["price_c"]).sum())
-    gmv_p = float((m["units_p"] * m["price_p"]).sum())
-
-    volume = float(((m["units_c"] - m["units_p"]) * m["price_p"]).sum())
-    price = float((m["units_c"] * (m["price_c"] - m["price_p"])).sum())
-    mix_effect = float((gmv_c - gmv_p) - volume - price)
-    return pd.DataFrame(
-        [
-            ["GMV_prev", gmv_p],
-            ["GMV_curr", gmv_c],
-            ["Delta", gmv_c - gmv_p],
-            ["Volume_effect", volume],
-            ["Price_effect", price],
-            ["Mix_effect", mix_effect],
-        ],
-        columns=["component", "value"],
-    )
+    return decomp_table(decompose(df_curr, df_prev, by, agg=agg), "GMV")
 
@@ -0,0 +1,163 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+
+# Floor on job threads: shared warm-up / profile jobs must not queue ahead of every session's jobs.
+MIN_JOB_WORKERS = 2
+
+
+def usable_cpus() -> int:
+    """CPUs this process may run on (a container's limit), not the host's core count."""
+    n = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    return n or 1
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been superseded or cancelled."""
+
+
+class JobContext:
+    """Handed to every job function: progress reporting doubles as the cancellation check."""
+
+    def __init__(self):
+        self._cancel = threading.Event()
+        self.progress = 0.0
+        self.message = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report(self, fraction: float, message: Optional[str] = None) -> None:
+        self.check()
+        self.progress = max(0.0, min(1.0, float(fraction)))
+        if message is not None:
+            self.message = message
+
+
+@dataclass
+class Job:
+    key: Hashable
+    future: Future
+    ctx: JobContext
+    submitted_at: float = field(default_factory=time.perf_counter)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        if self.future.cancelled() or self.ctx.cancelled:
+            return "cancelled"
+        if not self.future.done():
+            return "running" if self.started_at is not None else "queued"
+        return "failed" if self.future.exception() is not None else "done"
+
+    @property
+    def progress(self) -> float:
+        return 1.0 if self.future.done() else self.ctx.progress
+
+    @property
+    def message(self) -> str:
+        return self.ctx.message
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+    def cancel(self) -> None:
+        self.ctx._cancel.set()
+        self.future.cancel()
+
+
+class JobExecutor:
+    """
+    Thread pool with one "slot" per logical computation (e.g. a session's diagnostics tables).
+
+    Submitting to a slot with the same inputs key returns the existing job, so reruns reuse a
+    running or finished computation. A failed or cancelled job is replaced instead, so one
+    transient error is retried on the next rerun rather than sticking to the slot. A different
+    key cancels the previous job first, so only the latest inputs consume CPU. Queued jobs are
+    dropped immediately; running ones stop at their next `ctx.report` / `ctx.check`.
+    Numpy/pandas kernels release the GIL for most of their work, so jobs overlap with the
+    Streamlit script threads. Finished slots are kept (most recent `max_slots`) so a rerun with
+    unchanged inputs is free.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_slots: int = 256):
+        workers = max_workers or max(MIN_JOB_WORKERS, usable_cpus())
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._slots: "OrderedDict[Hashable, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_slots = max_slots
+
+    def submit(self, slot: Hashable, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """Run `fn(ctx, *args, **kwargs)` in `slot` unless a live or finished job with this key is there."""
+        with self._lock:
+            old = self._slots.get(slot)
+            if old is not None and old.key == key and old.status not in ("cancelled", "failed"):
+                self._slots.move_to_end(slot)
+                return old
+            if old is not None:
+                old.cancel()
+
+            ctx = JobContext()
+            job = Job(key=key, future=Future(), ctx=ctx)
+
+            def _run():
+                job.started_at = time.perf_counter()
+                try:
+                    ctx.check()
+                    return fn(ctx, *args, **kwargs)
+                finally:
+                    job.finished_at = time.perf_counter()
+
+            job.future = self._pool.submit(_run)
+            self._slots[slot] = job
+            self._slots.move_to_end(slot)
+            self._evict()
+            return job
+
+    def get(self, slot: Hashable) -> Optional[Job]:
+        with self._lock:
+            return self._slots.get(slot)
+
+    def cancel(self, slot: Hashable) -> None:
+        with self._lock:
+            job = self._slots.pop(slot, None)
+        if job is not None:
+            job.cancel()
+
+    def active(self) -> int:
+        with self._lock:
+            return sum(1 for j in self._slots.values() if not j.done())
+
+    def _evict(self) -> None:
+        # Oldest finished slots go first; running jobs are never evicted.
+        for slot in list(self._slots):
+            if len(self._slots) <= self.max_slots:
+                break
+            if self._slots[slot].done():
+                del self._slots[slot]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for job in self._slots.values():
+                job.cancel()
+            self._slots.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def is_cancellation(exc: BaseException) -> bool:
+    return isinstance(exc, (JobCancelled, CancelledError))
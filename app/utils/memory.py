@@ -0,0 +1,255 @@
+from __future__ import annotations
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MB = 1024 * 1024
+DEFAULT_SESSION_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512"))
+DEFAULT_GLOBAL_BUDGET_MB = float(os.getenv("GLOBAL_MEMORY_BUDGET_MB", "2048"))
+# Owner of objects shared by every session (Streamlit resource caches, the demo frame).
+SHARED = "shared"
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+@dataclass(frozen=True)
+class FrameRef:
+    """What a session keeps instead of the frame itself; resolved through `MemoryGovernor.get`."""
+    owner: str
+    name: str
+
+
+class _Lease:
+    """Held in a session's state; when the session is garbage collected its entries are discarded."""
+
+
+@dataclass
+class _Entry:
+    nbytes: int
+    last_used: float
+    obj: Any = None                 # resident DataFrame (owned entries)
+    ref: Optional[weakref.ref] = None  # tracked entries: counted while the object is alive
+    path: Optional[Path] = None     # Arrow IPC file once spilled
+    spillable: bool = True
+    recomputable: bool = False      # dropped instead of spilled (e.g. a window of the session's data)
+
+    @property
+    def tracked(self) -> bool:
+        return self.ref is not None
+
+    @property
+    def resident(self) -> bool:
+        return self.ref() is not None if self.tracked else self.obj is not None
+
+
+class MemoryGovernor:
+    """
+    Byte accounting for the DataFrames each session holds, with a per-session and a global budget.
+
+    - `put` registers a frame the governor owns: when a budget is exceeded, the least recently
+      used frames are spilled to Arrow IPC files in `spill_dir` (or simply dropped when they are
+      recomputable) and reloaded by `get` on demand.
+    - `track` counts objects owned elsewhere (Streamlit caches, OrderStores) through a weak
+      reference, so they count for as long as they are alive and are never spilled.
+    Spilling removes the governor's reference; memory is freed once no page still holds the frame.
+    """
+
+    def __init__(
+        self,
+        session_budget: float = DEFAULT_SESSION_BUDGET_MB * MB,
+        global_budget: float = DEFAULT_GLOBAL_BUDGET_MB * MB,
+        spill_dir: Optional[str] = None,
+        max_derived: int = 8,
+    ):
+        self.session_budget = int(session_budget)
+        self.global_budget = int(global_budget)
+        self.max_derived = max_derived
+        self.spill_dir = Path(spill_dir or tempfile.mkdtemp(prefix="ecom-spill-"))
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._lock = threading.RLock()
+        self.spills = 0
+        self.reloads = 0
+
+    # -------------------------
+    # Registration
+    # -------------------------
+    def put(
+        self,
+        owner: str,
+        name: str,
+        df: pd.DataFrame,
+        spillable: bool = True,
+        recomputable: bool = False,
+    ) -> None:
+        with self._lock:
+            self._discard((owner, name))
+            self._entries[(owner, name)] = _Entry(
+                nbytes=frame_nbytes(df), last_used=time.monotonic(), obj=df,
+                spillable=spillable, recomputable=recomputable,
+            )
+            if recomputable:
+                self._limit_derived(owner)
+            self._enforce(owner, keep=(owner, name))
+
+    def track(self, owner: str, name: str, obj: Any, nbytes: Optional[int] = None) -> None:
+        """Count `obj` (a frame unless `nbytes` is given) while it is alive; re-tracking refreshes it."""
+        with self._lock:
+            key = (owner, name)
+            e = self._entries.get(key)
+            if e is not None and e.tracked and e.ref() is obj:
+                e.last_used = time.monotonic()
+                if nbytes is not None:
+                    e.nbytes = int(nbytes)
+                return
+            self._discard(key)
+            size = frame_nbytes(obj) if nbytes is None else int(nbytes)
+            self._entries[key] = _Entry(nbytes=size, last_used=time.monotonic(), ref=weakref.ref(obj), spillable=False)
+            self._enforce(owner, keep=key)
+
+    def lease(self, owner: str) -> _Lease:
+        lease = _Lease()
+        weakref.finalize(lease, self.discard, owner)
+        return lease
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, owner: str, name: str) -> Optional[pd.DataFrame]:
+        """The frame (reloaded from its spill file if needed), or None when unknown/dropped."""
+        with self._lock:
+            key = (owner, name)
+            e = self._entries.get(key)
+            if e is None:
+                return None
+            e.last_used = time.monotonic()
+            if e.tracked:
+                return e.ref()
+            if e.obj is None:
+                if e.path is None:
+                    return None
+                e.obj = _read_arrow(e.path)
+                e.path.unlink(missing_ok=True)
+                e.path = None
+                self.reloads += 1
+                self._enforce(owner, keep=key)
+            return e.obj
+
+    def discard(self, owner: str, prefix: str = "") -> None:
+        """Forget `owner`'s entries (those whose name starts with `prefix`), deleting spill files."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == owner and k[1].startswith(prefix)]:
+                self._discard(key)
+
+    # -------------------------
+    # Usage
+    # -------------------------
+    def usage(self, owner: str) -> int:
+        with self._lock:
+            return sum(e.nbytes for (o, _), e in self._entries.items() if o == owner and e.resident)
+
+    def total(self) -> int:
+        with self._lock:
+            return sum(e.nbytes for e in self._entries.values() if e.resident)
+
+    def spilled_bytes(self) -> int:
+        with self._lock:
+            return sum(e.nbytes for e in self._entries.values() if e.path is not None)
+
+    def report(self, owners: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+        with self._lock:
+            self._prune_dead()
+            rows = []
+            for (o, n), e in self._entries.items():
+                if owners is not None and o not in owners:
+                    continue
+                state = "tracked" if e.tracked else ("in memory" if e.obj is not None else "spilled")
+                rows.append([o if o == SHARED else "this session", n, e.nbytes / MB, state])
+        return pd.DataFrame(rows, columns=["owner", "object", "MB", "state"]).sort_values("MB", ascending=False)
+
+    # -------------------------
+    # Budget enforcement
+    # -------------------------
+    def _enforce(self, owner: str, keep: Tuple[str, str]) -> None:
+        self._prune_dead()
+        if owner != SHARED:
+            while self.usage(owner) > self.session_budget and self._evict_one(owner, keep):
+                pass
+        while self.total() > self.global_budget and self._evict_one(None, keep):
+            pass
+
+    def _evict_one(self, owner: Optional[str], keep: Tuple[str, str]) -> bool:
+        victims = [
+            (e.last_used, k) for k, e in self._entries.items()
+            if k != keep and e.obj is not None and (e.spillable or e.recomputable) and (owner is None or k[0] == owner)
+        ]
+        if not victims:
+            return False
+        _, key = min(victims)
+        e = self._entries[key]
+        if e.recomputable:
+            del self._entries[key]
+            return True
+        path = self.spill_dir / f"{uuid.uuid4().hex}.arrow"
+        try:
+            _write_arrow(e.obj, path)
+        except Exception:
+            # Not representable in Arrow (e.g. mixed-type object column): keep it in memory.
+            path.unlink(missing_ok=True)
+            e.spillable = False
+            return True
+        e.obj, e.path = None, path
+        self.spills += 1
+        return True
+
+    def _limit_derived(self, owner: str) -> None:
+        derived = sorted((e.last_used, k) for k, e in self._entries.items() if k[0] == owner and e.recomputable)
+        for _, key in derived[: max(0, len(derived) - self.max_derived)]:
+            self._discard(key)
+
+    def _prune_dead(self) -> None:
+        for key in [k for k, e in self._entries.items() if e.tracked and e.ref() is None]:
+            del self._entries[key]
+
+    def _discard(self, key: Tuple[str, str]) -> None:
+        e = self._entries.pop(key, None)
+        if e is not None and e.path is not None:
+            e.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def _write_arrow(df: pd.DataFrame, path: Path) -> None:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_arrow(path: Path) -> pd.DataFrame:
+    import pyarrow as pa
+
+    with pa.memory_map(str(path), "r") as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    # Arrow nulls come back as None in object columns; the loaders produce NaN.
+    for c in df.columns[df.dtypes == object]:
+        if df[c].hasnans:
+            df[c] = df[c].fillna(np.nan)
+    return df
@@ -1,7 +1,21 @@
+from typing import Optional, Union
+
+import numpy as np
 import pandas as pd
 
-def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
-    out = df.copy()
+from .bitmap_index import Selection, apply_selection
+from .order_store import OrderStore
+from .returns import returns_kpis
+from .rollups import TimeRollups
+from .sampling import StratifiedSample
+from .sharded import ShardedStore
+from .topk import top_k_series
+
+# Every function takes an optional `selection` (from `BitmapIndex.select`) over the rows of `df`.
+# A `StratifiedSample` (approximate mode) returns estimates with 95% confidence intervals instead;
+# it is filtered with its own `select`, not with a Selection.
+def add_derived_columns(df: pd.DataFrame, selection: Optional[Selection] = None) -> pd.DataFrame:
+    out = apply_selection(df, selection).copy()
     out["sales"] = out["quantity"] * out["unit_price"]
 
     if "unit_cost" in out.columns and out["unit_cost"].notna().any():
@@ -14,7 +28,12 @@ def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def kpi_summary(df: pd.DataFrame) -> dict:
+def kpi_summary(df: Union[pd.DataFrame, OrderStore, StratifiedSample], selection: Optional[Selection] = None) -> dict:
+    df = apply_selection(df, selection)
+    if isinstance(df, StratifiedSample):
+        return df.kpi_summary()
+    if isinstance(df, OrderStore):
+        return _kpi_summary_store(df)
     df2 = add_derived_columns(df)
 
     gmv = float(df2["sales"].sum())
@@ -25,10 +44,8 @@ def kpi_summary(df: pd.DataFrame) -> dict:
     gross_profit = float(df2["gross_profit"].sum()) if has_profit else None
     gross_margin = (gross_profit / gmv) if (has_profit and gmv != 0) else None
 
-    if "is_returned" in df2.columns:
-        return_rate = float(df2["is_returned"].mean())
-    else:
-        return_rate = None
+    returned = df2["is_returned"].to_numpy() if "is_returned" in df2.columns else None
+    return_rate = float(df2["is_returned"].mean()) if returned is not None else None
 
     return {
         "gmv": gmv,
@@ -37,59 +54,75 @@ def kpi_summary(df: pd.DataFrame) -> dict:
         "gross_profit": gross_profit,
         "gross_margin": gross_margin,
         "return_rate": return_rate,
+        **returns_kpis(gmv, df2["sales"].to_numpy(dtype="float64"), returned),
     }
 
 
-def time_series(df: pd.DataFrame, freq: str = "D") -> pd.DataFrame:
-    """
-    freq: 'D' (daily) or 'W' (weekly)
-    """
-    df2 = add_derived_columns(df).copy()
-    df2["order_date"] = pd.to_datetime(df2["order_date"])
-    df2 = df2.set_index("order_date")
-
-    agg = {
-        "sales": "sum",
-        "order_id": pd.Series.nunique,
-        "quantity": "sum",
+def _kpi_summary_store(s: OrderStore) -> dict:
+    sales = s.sales()
+    gmv = float(sales.sum())
+    gross_profit = float(s.gross_profit().sum()) if s.has_cost else None
+    ret = s.is_returned
+    return {
+        "gmv": gmv,
+        "orders": s.n_orders(),
+        "units": int(s.quantity.sum(dtype=np.float64)),
+        "gross_profit": gross_profit,
+        "gross_margin": (gross_profit / gmv) if (gross_profit is not None and gmv != 0) else None,
+        "return_rate": (float(ret.mean()) if len(ret) else float("nan")) if ret is not None else None,
+        **returns_kpis(gmv, sales, ret),
     }
-    if "gross_profit" in df2.columns and df2["gross_profit"].notna().any():
-        agg["gross_profit"] = "sum"
-
-    ts = df2.resample(freq).agg(agg).rename(columns={"order_id": "orders", "quantity": "units"})
-    ts = ts.reset_index()
-
-    # Return rate by time bucket (if exists)
-    if "is_returned" in df2.columns:
-        rr = df2["is_returned"].resample(freq).mean().reset_index(name="return_rate")
-        ts = ts.merge(rr, on="order_date", how="left")
-
-    return ts
 
 
-def top_breakdown(df: pd.DataFrame, by: str, metric: str, n: int = 10) -> pd.DataFrame:
+def time_series(
+    df: Union[pd.DataFrame, ShardedStore, StratifiedSample], freq: str = "D", selection: Optional[Selection] = None
+) -> pd.DataFrame:
+    """
+    freq: 'H' (hourly), 'D' (daily), 'W' (weekly), 'M' (monthly) or 'Q' (quarterly)
+    For repeated calls on the same data, keep a `TimeRollups` around instead.
+    A `ShardedStore` aggregates across its process pool (daily and coarser buckets).
+    A `StratifiedSample` adds `<col>_low` / `<col>_high` interval columns (daily and coarser buckets).
+    """
+    if isinstance(df, (ShardedStore, StratifiedSample)):
+        return df.time_series(freq)
+    return TimeRollups(apply_selection(df, selection)).series(freq)
+
+
+def top_breakdown(
+    df: Union[pd.DataFrame, OrderStore, ShardedStore, StratifiedSample],
+    by: str,
+    metric: str,
+    n: int = 10,
+    with_other: bool = False,
+    selection: Optional[Selection] = None,
+) -> pd.DataFrame:
     """
     by: 'sku' or 'channel'
     metric: 'sales' or 'gross_profit' or 'units' or 'orders'
+    with_other: append an "All others" remainder row and a share column
     """
-    df2 = add_derived_columns(df)
+    df = apply_selection(df, selection)
+    if isinstance(df, StratifiedSample):
+        return df.top_breakdown(by, metric, n, with_other=with_other)
+    if isinstance(df, (OrderStore, ShardedStore)):
+        agg = df.group(by, metric)
+        if agg is None:
+            return pd.DataFrame({by: [], "gross_profit": []})
+        return top_k_series(agg, n, metric, by, with_other=with_other)
 
     if metric == "orders":
-        out = df2.groupby(by)["order_id"].nunique().reset_index(name="orders")
-        return out.sort_values("orders", ascending=False).head(n)
-
-    if metric == "units":
-        out = df2.groupby(by)["quantity"].sum().reset_index(name="units")
-        return out.sort_values("units", ascending=False).head(n)
-
-    if metric == "sales":
-        out = df2.groupby(by)["sales"].sum().reset_index(name="sales")
-        return out.sort_values("sales", ascending=False).head(n)
-
-    if metric == "gross_profit":
-        if "gross_profit" not in df2.columns or df2["gross_profit"].isna().all():
+        agg = df.groupby(by)["order_id"].nunique()
+    elif metric == "units":
+        agg = df.groupby(by)["quantity"].sum()
+    elif metric == "sales":
+        agg = (df["quantity"] * df["unit_price"]).groupby(df[by]).sum()
+    elif metric == "gross_profit":
+        if "unit_cost" not in df.columns or df["unit_cost"].isna().all():
             return pd.DataFrame({by: [], "gross_profit": []})
-        out = df2.groupby(by)["gross_profit"].sum().reset_index(name="gross_profit")
-        return out.sort_values("gross_profit", ascending=False).head(n)
+        agg = (df["quantity"] * (df["unit_price"] - df["unit_cost"])).groupby(df[by]).sum()
+    else:
+        raise ValueError("Unsupported metric")
+
+    # Partial selection: only the displayed top n is ordered.
+    return top_k_series(agg, n, metric, by, with_other=with_other)
 
-    raise ValueError("Unsupported metric")
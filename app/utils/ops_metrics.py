@@ -0,0 +1,118 @@
+from __future__ import annotations
+import math
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+OPS_DIMENSIONS = ["warehouse_zone", "fulfillment_type", "channel"]
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class PickTimeSketches:
+    """
+    Mergeable quantile sketches of `pick_time_sec`, one per (day, zone, fulfillment_type, channel) cell.
+
+    Each cell is a DDSketch-style log-bucket histogram: bucket i covers (gamma^(i-1), gamma^i] with
+    gamma = (1+alpha)/(1-alpha), so any quantile is returned within `alpha` relative error. Sketches
+    merge by adding bucket counts, which is how a query over any date range / zone / filter
+    combination is answered from the stored cells without touching the raw rows again.
+    Only non-empty (cell, bucket) pairs are stored.
+    """
+
+    def __init__(self, df: pd.DataFrame, alpha: float = 0.01):
+        if "pick_time_sec" not in df.columns:
+            raise ValueError("pick_time_sec column not found")
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+
+        d = df[df["pick_time_sec"].notna()]
+        x = d["pick_time_sec"].to_numpy(dtype="float64")
+
+        self.labels: Dict[str, np.ndarray] = {}
+        cols: Dict[str, np.ndarray] = {}
+        self.dims = [c for c in OPS_DIMENSIONS if c in d.columns]
+        for c in self.dims:
+            codes, uniques = pd.factorize(d[c].astype("object").where(d[c].notna(), "(missing)"))
+            cols[c] = codes.astype(np.int32)
+            self.labels[c] = np.asarray(uniques, dtype=object)
+        cols["day"] = pd.to_datetime(d["order_date"]).dt.normalize().to_numpy().astype("datetime64[D]").astype(np.int32)
+        cols["bucket"] = self._bucket(x)
+
+        # One row per non-empty (cell, bucket): the whole sketch table.
+        cells = pd.DataFrame(cols).groupby(list(cols), sort=False).size().reset_index(name="count")
+        self.cells = {c: cells[c].to_numpy() for c in cols}
+        self.counts = cells["count"].to_numpy(dtype=np.int64)
+
+    def _bucket(self, x: np.ndarray) -> np.ndarray:
+        # Non-positive values share the sentinel bucket below every real bucket.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            b = np.ceil(np.log(x) / self._log_gamma)
+        return np.where(x > 0, b, -(2 ** 20)).astype(np.int32)
+
+    def _value(self, bucket: np.ndarray) -> np.ndarray:
+        v = 2 * np.power(self.gamma, bucket.astype("float64")) / (self.gamma + 1)
+        return np.where(bucket <= -(2 ** 20), 0.0, v)
+
+    def _mask(self, start=None, end=None, filters: Optional[Dict[str, Iterable]] = None) -> np.ndarray:
+        m = np.ones(len(self.counts), dtype=bool)
+        day = self.cells["day"]
+        if start is not None:
+            m &= day >= np.datetime64(pd.Timestamp(start).date(), "D").astype(np.int32)
+        if end is not None:
+            m &= day <= np.datetime64(pd.Timestamp(end).date(), "D").astype(np.int32)
+        for c, values in (filters or {}).items():
+            if c not in self.dims:
+                continue
+            wanted = np.flatnonzero(np.isin(self.labels[c], list(values)))
+            m &= np.isin(self.cells[c], wanted)
+        return m
+
+    def quantiles(
+        self,
+        by: Optional[str] = None,
+        qs: Sequence[float] = DEFAULT_QUANTILES,
+        start=None,
+        end=None,
+        filters: Optional[Dict[str, Iterable]] = None,
+    ) -> pd.DataFrame:
+        """
+        Pick-time quantiles per group of `by` ('warehouse_zone', 'fulfillment_type', 'channel',
+        'order_date' or None for one overall row), over merged cells matching the date range/filters.
+        """
+        m = self._mask(start, end, filters)
+        bucket, count = self.cells["bucket"][m], self.counts[m]
+        if not m.any():
+            return pd.DataFrame(columns=[by or "group", "count"] + [f"p{round(q * 100):d}" for q in qs])
+        if by is None:
+            group, labels = np.zeros(len(count), dtype=np.int64), np.array(["All"], dtype=object)
+            by = "group"
+        elif by == "order_date":
+            days = self.cells["day"][m]
+            uniq, group = np.unique(days, return_inverse=True)
+            labels = uniq.astype("datetime64[D]").astype("datetime64[ns]")
+        elif by in self.dims:
+            group, labels = self.cells[by][m].astype(np.int64), self.labels[by]
+        else:
+            raise ValueError(f"Unsupported dimension: {by}")
+
+        # Merge: sum counts per (group, bucket), then walk the sorted buckets of each group.
+        merged = pd.DataFrame({"g": group, "b": bucket, "n": count}).groupby(["g", "b"], sort=True)["n"].sum()
+        g = merged.index.get_level_values(0).to_numpy()
+        b = merged.index.get_level_values(1).to_numpy()
+        n = merged.to_numpy()
+        cum = np.cumsum(n)
+        starts = np.r_[0, np.flatnonzero(np.diff(g)) + 1]
+        totals = np.add.reduceat(n, starts)
+        offset = np.r_[0, cum[starts[1:] - 1]]
+
+        out = pd.DataFrame({by: labels[g[starts]], "count": totals})
+        ends = np.r_[starts[1:], len(n)]
+        for q in qs:
+            # Rank within each group, located in the group's slice of the global cumsum.
+            rank = offset + np.floor(q * (totals - 1)).astype(np.int64) + 1
+            pos = np.searchsorted(cum, rank, side="left")
+            pos = np.minimum(np.maximum(pos, starts), ends - 1)
+            out[f"p{round(q * 100):d}"] = self._value(b[pos])
+        return out
@@ -0,0 +1,178 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# String dimensions stored as int32 dictionary codes; labels are kept once per dictionary.
+DIMENSIONS = ["order_id", "sku", "channel", "fulfillment_type", "warehouse_zone"]
+OPTIONAL_MEASURES = ["unit_cost", "pick_time_sec"]
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+@dataclass
+class OrderStore:
+    """
+    Compact columnar copy of an orders frame for aggregation kernels.
+
+    - dimensions: int32 codes + code->label arrays (`labels`), missing values get their own label
+    - order_date: int32 day numbers since 1970-01-01
+    - quantity: int32 (float32 if fractional), prices/costs/pick times: float32
+    - is_returned: bit-packed (1 bit per row)
+
+    Aggregations are `np.bincount` over codes, so group-bys never hash strings.
+    Dictionaries are shared by every slice taken from the same store.
+    """
+
+    n_rows: int
+    codes: Dict[str, np.ndarray]
+    labels: Dict[str, np.ndarray]
+    day: np.ndarray
+    quantity: np.ndarray
+    unit_price: np.ndarray
+    measures: Dict[str, np.ndarray] = field(default_factory=dict)
+    returned_bits: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "OrderStore":
+        codes, labels = {}, {}
+        for c in DIMENSIONS:
+            if c in df.columns:
+                col = df[c].astype("object").where(df[c].notna(), "(missing)")
+                cc, uniq = pd.factorize(col)
+                codes[c] = cc.astype(np.int32)
+                labels[c] = np.asarray(uniq, dtype=object)
+
+        day = pd.to_datetime(df["order_date"]).to_numpy().astype("datetime64[D]")
+        qty = df["quantity"].to_numpy(dtype="float64")
+        quantity = qty.astype(np.int32) if np.array_equal(qty, np.floor(qty)) else qty.astype(np.float32)
+
+        measures = {c: df[c].to_numpy(dtype="float64").astype(np.float32) for c in OPTIONAL_MEASURES if c in df.columns}
+        bits = None
+        if "is_returned" in df.columns:
+            bits = np.packbits(df["is_returned"].to_numpy() > 0)
+
+        return cls(
+            n_rows=len(df),
+            codes=codes,
+            labels=labels,
+            day=(day - _EPOCH).astype(np.int32),
+            quantity=quantity,
+            unit_price=df["unit_price"].to_numpy(dtype="float64").astype(np.float32),
+            measures=measures,
+            returned_bits=bits,
+        )
+
+    # -------------------------
+    # Row selection
+    # -------------------------
+    @property
+    def is_returned(self) -> Optional[np.ndarray]:
+        if self.returned_bits is None:
+            return None
+        return np.unpackbits(self.returned_bits, count=self.n_rows).astype(bool)
+
+    def take(self, rows: np.ndarray) -> "OrderStore":
+        """Subset by boolean mask or row indices; dictionaries are shared, not copied."""
+        rows = np.flatnonzero(rows) if rows.dtype == bool else rows
+        ret = self.is_returned
+        return OrderStore(
+            n_rows=len(rows),
+            codes={c: v[rows] for c, v in self.codes.items()},
+            labels=self.labels,
+            day=self.day[rows],
+            quantity=self.quantity[rows],
+            unit_price=self.unit_price[rows],
+            measures={c: v[rows] for c, v in self.measures.items()},
+            returned_bits=None if ret is None else np.packbits(ret[rows]),
+        )
+
+    def day_number(self, d) -> int:
+        return int((np.datetime64(pd.Timestamp(d).date(), "D") - _EPOCH).astype(np.int32))
+
+    def slice_days(self, start, end) -> "OrderStore":
+        return self.take((self.day >= self.day_number(start)) & (self.day <= self.day_number(end)))
+
+    def filter_in(self, dim: str, values) -> "OrderStore":
+        wanted = np.flatnonzero(np.isin(self.labels[dim], list(values)))
+        return self.take(np.isin(self.codes[dim], wanted))
+
+    # -------------------------
+    # Measures and kernels
+    # -------------------------
+    @property
+    def has_cost(self) -> bool:
+        return "unit_cost" in self.measures and bool(np.isfinite(self.measures["unit_cost"]).any())
+
+    def sales(self) -> np.ndarray:
+        return self.quantity.astype(np.float64) * self.unit_price
+
+    def gross_profit(self) -> np.ndarray:
+        """Per-row gross profit; rows without unit_cost contribute 0 (pandas sum skips NaN)."""
+        gp = self.quantity.astype(np.float64) * (self.unit_price.astype(np.float64) - self.measures["unit_cost"])
+        return np.nan_to_num(gp)
+
+    def sum_by(self, dim: str, values: np.ndarray) -> np.ndarray:
+        return np.bincount(self.codes[dim], weights=values, minlength=len(self.labels[dim]))
+
+    def count_by(self, dim: str) -> np.ndarray:
+        return np.bincount(self.codes[dim], minlength=len(self.labels[dim]))
+
+    def nunique_orders_by(self, dim: str) -> np.ndarray:
+        """Distinct order_id count per `dim` code: unique (dim, order) pairs, then count per dim."""
+        n_orders = len(self.labels["order_id"])
+        pairs = np.unique(self.codes[dim].astype(np.int64) * n_orders + self.codes["order_id"])
+        return np.bincount(pairs // n_orders, minlength=len(self.labels[dim]))
+
+    def n_orders(self) -> int:
+        return int(np.count_nonzero(np.bincount(self.codes["order_id"], minlength=len(self.labels["order_id"]))))
+
+    def grouped(self, dim: str, values: np.ndarray) -> pd.Series:
+        """Per-label Series of `values` for labels present in this store (like a pandas groupby)."""
+        present = self.count_by(dim) > 0
+        return pd.Series(values[present], index=pd.Index(self.labels[dim][present], name=dim))
+
+    def group(self, by: str, metric: str) -> Optional[pd.Series]:
+        """
+        Per-`by` totals of 'sales' | 'units' | 'orders' | 'gross_profit' (None when there is no cost data);
+        the bincount equivalent of `df.groupby(by)[...]` used by metrics/diagnostics.
+        """
+        if metric == "orders":
+            return self.grouped(by, self.nunique_orders_by(by))
+        if metric == "units":
+            units = self.sum_by(by, self.quantity.astype(np.float64))
+            return self.grouped(by, units.astype(np.int64) if np.issubdtype(self.quantity.dtype, np.integer) else units)
+        if metric == "sales":
+            return self.grouped(by, self.sum_by(by, self.sales()))
+        if metric == "gross_profit":
+            if not self.has_cost:
+                return None
+            return self.grouped(by, self.sum_by(by, self.gross_profit()))
+        raise ValueError("Unsupported metric")
+
+    # -------------------------
+    # Memory report
+    # -------------------------
+    def nbytes(self) -> int:
+        arrays = [self.day, self.quantity, self.unit_price, *self.codes.values(), *self.measures.values()]
+        if self.returned_bits is not None:
+            arrays.append(self.returned_bits)
+        return int(sum(a.nbytes for a in arrays))
+
+    def dictionary_nbytes(self) -> int:
+        return int(sum(pd.Series(v).memory_usage(deep=True, index=False) for v in self.labels.values()))
+
+
+def memory_report(df: pd.DataFrame, store: OrderStore) -> pd.DataFrame:
+    """Bytes per row of the pandas frame vs. the store (columns, then including dictionaries)."""
+    n = max(1, len(df))
+    frame = int(df.memory_usage(deep=True, index=True).sum())
+    return pd.DataFrame(
+        [
+            ["DataFrame", frame, frame / n],
+            ["OrderStore (columns)", store.nbytes(), store.nbytes() / n],
+            ["OrderStore (+ dictionaries)", store.nbytes() + store.dictionary_nbytes(), (store.nbytes() + store.dictionary_nbytes()) / n],
+        ],
+        columns=["representation", "bytes", "bytes_per_row"],
+    )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Columns whose values must fall into a known range; checked alongside the other profile stats.
+RANGE_CHECKS = {
+    "quantity": (1, None),
+    "unit_price": (0, None),
+    "unit_cost": (0, None),
+    "pick_time_sec": (0, None),
+    "is_returned": (0, 1),
+}
+
+
+@dataclass
+class DataProfile:
+    n_rows: int
+    n_orders: int
+    n_skus: int
+    n_channels: int
+    date_min: Optional[pd.Timestamp]
+    date_max: Optional[pd.Timestamp]
+    missing: pd.Series
+    duplicate_order_sku_rows: int
+    missing_days: List[pd.Timestamp] = field(default_factory=list)  # over the whole date_min..date_max span
+    sku_collisions: Dict[str, List[str]] = field(default_factory=dict)
+    unit_cost_coverage: Optional[float] = None
+    out_of_range: Dict[str, int] = field(default_factory=dict)
+    cost_above_price_rows: int = 0
+
+    def findings(self) -> List[str]:
+        """Human-readable list of data quality issues (empty when the data looks clean)."""
+        out: List[str] = []
+        n_missing = int(self.missing.sum())
+        if n_missing:
+            cols = ", ".join(f"{c} ({int(v):,})" for c, v in self.missing[self.missing > 0].items())
+            out.append(f"{n_missing:,} missing values: {cols}.")
+        if self.duplicate_order_sku_rows:
+            out.append(f"{self.duplicate_order_sku_rows:,} duplicate order_id/sku rows.")
+        if self.missing_days:
+            shown = ", ".join(str(d.date()) for d in self.missing_days[:5])
+            more = f" (+{len(self.missing_days) - 5} more)" if len(self.missing_days) > 5 else ""
+            span = f"{self.date_min.date()} → {self.date_max.date()}"
+            out.append(f"{len(self.missing_days)} calendar day(s) without orders in {span}: {shown}{more}.")
+        if self.sku_collisions:
+            shown = "; ".join(" / ".join(v) for v in list(self.sku_collisions.values())[:3])
+            out.append(f"{len(self.sku_collisions)} SKU naming collision(s): {shown}.")
+        if self.unit_cost_coverage is None:
+            out.append("unit_cost column not present; Gross Profit is unavailable.")
+        elif self.unit_cost_coverage < 1.0:
+            out.append(f"unit_cost covers {self.unit_cost_coverage*100:.1f}% of rows; Gross Profit is understated.")
+        for c, v in self.out_of_range.items():
+            if v:
+                out.append(f"{v:,} out-of-range value(s) in {c}.")
+        if self.cost_above_price_rows:
+            out.append(f"{self.cost_above_price_rows:,} row(s) sold below unit_cost.")
+        return out
+
+    def checks_table(self) -> pd.DataFrame:
+        rows = [
+            ["Missing values", int(self.missing.sum())],
+            ["Duplicate order_id/sku rows", self.duplicate_order_sku_rows],
+            ["Missing calendar days", len(self.missing_days)],
+            ["SKU naming collisions", len(self.sku_collisions)],
+            ["unit_cost coverage", "N/A" if self.unit_cost_coverage is None else f"{self.unit_cost_coverage*100:.1f}%"],
+        ]
+        rows += [[f"Out-of-range {c}", v] for c, v in self.out_of_range.items()]
+        rows.append(["Rows sold below unit_cost", self.cost_above_price_rows])
+        # Mixed int/str values; keep one dtype so the table renders cleanly.
+        return pd.DataFrame([[c, v if isinstance(v, str) else f"{v:,}"] for c, v in rows], columns=["check", "value"])
+
+
+def normalize_sku(s: pd.Series) -> pd.Series:
+    """Canonical SKU key used to detect renamed/duplicated SKUs (case, spaces, separators)."""
+    return s.astype(str).str.upper().str.replace(r"[^0-9A-Z]", "", regex=True)
+
+
+def profile_orders(df: pd.DataFrame) -> DataProfile:
+    """
+    Compute every Home/Data Checks statistic from a single visit of each column,
+    so callers never re-scan the frame for counts, missing values or range checks.
+    """
+    missing = df.isna().sum().sort_values(ascending=False)
+
+    # Factorize once: gives nunique and the code arrays reused by the duplicate check.
+    order_codes, order_uniques = pd.factorize(df["order_id"]) if "order_id" in df.columns else (None, [])
+    sku_codes, sku_uniques = pd.factorize(df["sku"]) if "sku" in df.columns else (None, [])
+    n_channels = int(df["channel"].nunique()) if "channel" in df.columns else 0
+
+    dup_rows = 0
+    if order_codes is not None and sku_codes is not None and len(df):
+        key = order_codes.astype(np.int64) * (len(sku_uniques) + 1) + sku_codes
+        dup_rows = int(len(key) - len(np.unique(key)))
+
+    date_min = date_max = None
+    missing_days: List[pd.Timestamp] = []
+    if "order_date" in df.columns:
+        dates = pd.to_datetime(df["order_date"], errors="coerce")
+        days = dates.dt.normalize().dropna().unique()
+        if len(days):
+            date_min, date_max = dates.min(), dates.max()
+            full = pd.date_range(date_min.normalize(), date_max.normalize(), freq="D")
+            missing_days = list(full.difference(pd.DatetimeIndex(days)))
+
+    collisions: Dict[str, List[str]] = {}
+    if len(sku_uniques):
+        raw = pd.Series(sku_uniques)
+        norm = normalize_sku(raw)
+        dup = norm.duplicated(keep=False)
+        for k, g in raw[dup].groupby(norm[dup]):
+            collisions[k] = sorted(g.astype(str).tolist())
+
+    coverage = None
+    if "unit_cost" in df.columns:
+        coverage = float(1.0 - missing.get("unit_cost", 0) / len(df)) if len(df) else 0.0
+
+    out_of_range: Dict[str, int] = {}
+    for c, (lo, hi) in RANGE_CHECKS.items():
+        if c not in df.columns:
+            continue
+        v = pd.to_numeric(df[c], errors="coerce")
+        bad = pd.Series(False, index=df.index)
+        if lo is not None:
+            bad |= v < lo
+        if hi is not None:
+            bad |= v > hi
+        out_of_range[c] = int(bad.sum())
+
+    below_cost = 0
+    if "unit_cost" in df.columns and "unit_price" in df.columns:
+        below_cost = int((df["unit_price"] < df["unit_cost"]).sum())
+
+    return DataProfile(
+        n_rows=int(len(df)),
+        n_orders=int(len(order_uniques)),
+        n_skus=int(len(sku_uniques)),
+        n_channels=n_channels,
+        date_min=date_min,
+        date_max=date_max,
+        missing=missing,
+        duplicate_order_sku_rows=dup_rows,
+        missing_days=missing_days,
+        sku_collisions=collisions,
+        unit_cost_coverage=coverage,
+        out_of_range=out_of_range,
+        cost_above_price_rows=below_cost,
+    )
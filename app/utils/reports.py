@@ -0,0 +1,131 @@
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from .ai_narrative import NarrativeInputs, generate_rule_based_summary
+from .diagnostics import compute_kpis, decomp_table, decompose, drivers, kpi_delta, pvm_aggregates
+from .forecasting import DEFAULT_HISTORY_DAYS, expected_vs_actual
+from .profiler import DataProfile
+from .returns import returns_report
+from .snapshots import SnapshotStore
+
+# The Diagnostics page's computations, shared with the snapshot warm-up so both produce (and key)
+# the same results. Job functions take the job context first (see `jobs.JobExecutor`).
+DEFAULT_METHOD = "holt_seasonal"
+# (by, metric, compared against the baseline) of the driver tables.
+DRIVER_SPECS = [("sku", "sales", True), ("sku", "units", False), ("channel", "sales", True), ("channel", "orders", False)]
+
+
+def default_windows(min_d: date, max_d: date) -> Tuple[date, date, date, date]:
+    """Last (up to) 7 days vs the same number of days before them, clamped to the data: (curr_start, curr_end, prev_start, prev_end)."""
+    total_days = (max_d - min_d).days + 1
+    win = min(7, max(1, total_days // 2))
+    curr_end = max_d
+    curr_start = max_d - timedelta(days=win - 1)
+    prev_end = curr_start - timedelta(days=1)
+    prev_start = max(min_d, prev_end - timedelta(days=win - 1))
+    return curr_start, curr_end, prev_start, prev_end
+
+
+def snapshot_keys(fp: str, windows: Tuple[date, date, date, date], method: str) -> Dict[str, Hashable]:
+    """Job / snapshot key of each report for a dataset, window pair and baseline method."""
+    curr_start, curr_end = windows[0], windows[1]
+    w = (fp, *windows)
+    return {
+        "window": w, "returns": w, "baseline": (fp, curr_start, curr_end, method), "drivers": (w, method), "narrative": (w, method),
+    }
+
+
+def window_job(ctx, agg_curr, agg_prev):
+    ctx.report(0.0, "KPIs")
+    curr, prev = compute_kpis(agg_curr), compute_kpis(agg_prev)
+    ctx.report(0.4, "price / volume / mix / cost")
+    # One per-SKU aggregate per window feeds the GMV and gross-profit decompositions and the simulator.
+    pvm_agg = pvm_aggregates(agg_curr, agg_prev, by="sku")
+    return curr, prev, pvm_agg, decompose(agg_curr, agg_prev, by="sku", agg=pvm_agg)
+
+
+def returns_job(ctx, agg_curr, agg_prev):
+    ctx.report(0.0, "returns by segment")
+    # {} rather than None (no is_returned data), which the job / snapshot stores read as a miss.
+    return returns_report(agg_curr, agg_prev) or {}
+
+
+def baseline_job(ctx, df_hist, curr_start, curr_end, method):
+    ctx.report(0.0, "fitting baselines")
+    return expected_vs_actual(df_hist, curr_start, curr_end, keys=("sku", "channel"), measure="sales", method=method)
+
+
+def drivers_job(ctx, agg_curr, agg_prev, baseline):
+    out = {}
+    for i, (by, metric, vs_baseline) in enumerate(DRIVER_SPECS):
+        ctx.report(i / len(DRIVER_SPECS), f"{by} / {metric}")
+        out[(by, metric)] = drivers(agg_curr, agg_prev, by=by, metric=metric, top_n=10, baseline=baseline if vs_baseline else None)
+    return out
+
+
+def narrative_inputs(window, driver_tables, baseline, profile: Optional[DataProfile] = None, returns=None) -> NarrativeInputs:
+    curr, prev, _, decomposition = window
+    return NarrativeInputs(
+        kpi_delta=kpi_delta(curr, prev),
+        decomp=decomp_table(decomposition, "GMV"),
+        profit_decomp=decomp_table(decomposition, "GROSS_PROFIT"),
+        top_sku_sales=driver_tables[("sku", "sales")],
+        top_channel_sales=driver_tables[("channel", "sales")],
+        data_profile=profile,
+        baseline=baseline,
+        returns=returns,
+    )
+
+
+def narrative_job(ctx, inp: NarrativeInputs) -> str:
+    return generate_rule_based_summary(inp)
+
+
+# -------------------------
+# Snapshot warm-up
+# -------------------------
+def warm_diagnostics(
+    ctx,
+    snapshots: SnapshotStore,
+    fp: str,
+    bounds: Tuple[date, date],
+    window: Callable,
+    history: Callable,
+    profile: Optional[DataProfile] = None,
+    method: str = DEFAULT_METHOD,
+) -> int:
+    """
+    Store the Diagnostics page's default-window results (KPIs, decompositions, returns, baselines,
+    drivers, rule-based narrative) for dataset `fp`; reports already in `snapshots` are reused, not recomputed.
+    `window(start, end)` returns the data the KPI / decomposition / driver jobs aggregate (an
+    OrderStore slice or a frame, as on the page), `history(start, end)` the frame baselines are
+    fitted on. Returns the number of snapshots written.
+    """
+    windows = default_windows(*bounds)
+    curr_start, curr_end, prev_start, prev_end = windows
+    keys = snapshot_keys(fp, windows, method)
+    written = 0
+    aggs = {}
+
+    def _aggs():
+        if not aggs:
+            aggs["curr"], aggs["prev"] = window(curr_start, curr_end), window(prev_start, prev_end)
+        return aggs["curr"], aggs["prev"]
+
+    def _cached(kind: str, compute: Callable):
+        nonlocal written
+        value = snapshots.get(fp, kind, keys[kind])
+        if value is None:
+            value = compute()
+            written += snapshots.put(fp, kind, keys[kind], value)
+        return value
+
+    win = _cached("window", lambda: window_job(ctx, *_aggs()))
+    returns = _cached("returns", lambda: returns_job(ctx, *_aggs()))
+    hist_start = curr_start - timedelta(days=DEFAULT_HISTORY_DAYS)
+    baseline = _cached("baseline", lambda: baseline_job(ctx, history(hist_start, curr_end), curr_start, curr_end, method))
+    driver_tables = _cached("drivers", lambda: drivers_job(ctx, *_aggs(), baseline))
+    _cached("narrative", lambda: narrative_job(ctx, narrative_inputs(win, driver_tables, baseline, profile, returns)))
+    ctx.report(1.0, "done")
+    return written
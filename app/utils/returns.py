@@ -0,0 +1,147 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .order_store import OrderStore
+from .topk import top_k_indices
+
+RETURN_DIMENSIONS = ["sku", "channel", "fulfillment_type"]
+_FRAME_COLUMNS = ["order_date", "quantity", "unit_price", "is_returned", *RETURN_DIMENSIONS]
+
+
+def _as_store(data: Union[pd.DataFrame, OrderStore]) -> OrderStore:
+    if isinstance(data, OrderStore):
+        return data
+    # Only the columns the returns tables need are encoded (no order_id dictionary).
+    return OrderStore.from_frame(data[[c for c in _FRAME_COLUMNS if c in data.columns]])
+
+
+def returns_kpis(gmv: float, sales: np.ndarray, is_returned: Optional[np.ndarray]) -> Dict[str, Optional[float]]:
+    """
+    returned_gmv / net_gmv KPIs from the row sales the caller already summed into `gmv` (no
+    second pass over the data); both None without is_returned data.
+    """
+    if is_returned is None:
+        return {"returned_gmv": None, "net_gmv": None}
+    returned_gmv = float(sales[np.asarray(is_returned) > 0].sum())
+    return {"returned_gmv": returned_gmv, "net_gmv": gmv - returned_gmv}
+
+
+def return_aggregates(
+    data: Union[pd.DataFrame, OrderStore], dims: Iterable[str] = RETURN_DIMENSIONS
+) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Returns tables for every dimension in `dims` plus the overall totals (key "total", one row).
+
+    Row sales and the returned rows are computed once and shared by all dimensions; each dimension
+    is then a bincount over the store's codes for lines / GMV and one over the (few) returned rows.
+    Columns: <dim>, lines, returned_lines, return_rate, gmv, returned_gmv, net_gmv, returned_gmv_share.
+    None when the data has no is_returned column.
+    """
+    s = _as_store(data)
+    if s.returned_bits is None:
+        return None
+    sales = s.sales()
+    returned = np.flatnonzero(s.is_returned)
+    returned_sales = sales[returned]
+
+    out = {"total": _table({}, np.array([s.n_rows]), np.array([len(returned)]), np.array([sales.sum()]), np.array([returned_sales.sum()]))}
+    for dim in dims:
+        if dim not in s.codes:
+            continue
+        codes, k = s.codes[dim], len(s.labels[dim])
+        lines = np.bincount(codes, minlength=k)
+        present = lines > 0
+        out[dim] = _table(
+            {dim: s.labels[dim][present]},
+            lines[present],
+            np.bincount(codes[returned], minlength=k)[present],
+            s.sum_by(dim, sales)[present],
+            np.bincount(codes[returned], weights=returned_sales, minlength=k)[present],
+        )
+    return out
+
+
+def _table(keys: dict, lines, returned_lines, gmv, returned_gmv) -> pd.DataFrame:
+    lines, returned_lines = lines.astype(np.int64), returned_lines.astype(np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            **keys,
+            "lines": lines,
+            "returned_lines": returned_lines,
+            "return_rate": np.where(lines > 0, returned_lines / np.maximum(lines, 1), np.nan),
+            "gmv": gmv,
+            "returned_gmv": returned_gmv,
+            "net_gmv": gmv - returned_gmv,
+            "returned_gmv_share": np.where(gmv != 0, returned_gmv / np.where(gmv != 0, gmv, 1), np.nan),
+        })
+
+
+def returns_delta(curr: pd.DataFrame, prev: pd.DataFrame, by: str, top_n: Optional[int] = None) -> pd.DataFrame:
+    """
+    Window-over-window returns per `by` value (tables from `return_aggregates`), attributing the
+    change of the overall return rate R = sum(w_s * r_s) (w_s: the segment's share of lines):
+    - contribution: w_c * r_c - w_p * r_p, which sums to the overall rate delta
+    - rate_effect: w_p * (r_c - r_p), the segment's own return rate moving
+    - mix_effect: contribution - rate_effect, lines shifting toward / away from the segment
+    Sorted by contribution (segments that drove a rise first); `top_n` keeps only the largest.
+    """
+    cols = ["lines", "returned_lines", "gmv", "returned_gmv"]
+    m = curr[[by, *cols]].merge(prev[[by, *cols]], on=by, how="outer", suffixes=("_c", "_p")).fillna(0)
+    lc, lp = m["lines_c"].to_numpy(np.float64), m["lines_p"].to_numpy(np.float64)
+    rc_lines, rp_lines = m["returned_lines_c"].to_numpy(np.float64), m["returned_lines_p"].to_numpy(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r_c = np.where(lc > 0, rc_lines / lc, np.nan)
+        r_p = np.where(lp > 0, rp_lines / lp, np.nan)
+        w_c = lc / lc.sum() if lc.sum() else np.zeros(len(m))
+        w_p = lp / lp.sum() if lp.sum() else np.zeros(len(m))
+    contribution = w_c * np.nan_to_num(r_c) - w_p * np.nan_to_num(r_p)
+    # A segment missing from one window has no rate change: all of its contribution is mix.
+    rate_effect = w_p * (np.where(lc > 0, r_c, r_p) - np.where(lp > 0, r_p, r_c))
+    rate_effect = np.nan_to_num(rate_effect)
+
+    out = pd.DataFrame({
+        by: m[by].to_numpy(),
+        "return_rate_prev": r_p,
+        "return_rate_curr": r_c,
+        "return_rate_delta": r_c - r_p,
+        "rate_effect": rate_effect,
+        "mix_effect": contribution - rate_effect,
+        "contribution": contribution,
+        "returned_gmv_prev": m["returned_gmv_p"].to_numpy(),
+        "returned_gmv_curr": m["returned_gmv_c"].to_numpy(),
+        "returned_gmv_delta": (m["returned_gmv_c"] - m["returned_gmv_p"]).to_numpy(),
+        "net_gmv_delta": ((m["gmv_c"] - m["returned_gmv_c"]) - (m["gmv_p"] - m["returned_gmv_p"])).to_numpy(),
+    })
+    idx = top_k_indices(contribution, len(out) if top_n is None else top_n)
+    return out.iloc[idx].reset_index(drop=True)
+
+
+def returns_summary(curr: pd.DataFrame, prev: pd.DataFrame) -> pd.DataFrame:
+    """The "total" tables of two windows in the `kpi_delta` layout (metric, prev, curr, delta)."""
+    rows = [[m.upper(), float(prev[m].iloc[0]), float(curr[m].iloc[0])] for m in ("return_rate", "returned_gmv", "net_gmv")]
+    out = pd.DataFrame(rows, columns=["metric", "prev", "curr"])
+    out["delta"] = out["curr"] - out["prev"]
+    return out
+
+
+def returns_report(
+    df_curr: Union[pd.DataFrame, OrderStore],
+    df_prev: Union[pd.DataFrame, OrderStore],
+    dims: Iterable[str] = RETURN_DIMENSIONS,
+    top_n: Optional[int] = None,
+) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    `returns_summary` ("total") and a `returns_delta` table per dimension, from one
+    `return_aggregates` pass per window. None when either window has no is_returned data.
+    """
+    curr, prev = return_aggregates(df_curr, dims), return_aggregates(df_prev, dims)
+    if curr is None or prev is None:
+        return None
+    out = {"total": returns_summary(curr["total"], prev["total"])}
+    for dim in curr:
+        if dim != "total" and dim in prev:
+            out[dim] = returns_delta(curr[dim], prev[dim], dim, top_n=top_n)
+    return out
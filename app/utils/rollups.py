@@ -0,0 +1,102 @@
+from __future__ import annotations
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Public bucket codes -> pandas resample rule.
+FREQ_RULES = {"H": "h", "D": "D", "W": "W", "M": "ME", "Q": "QE"}
+FREQ_LABELS = {"Hourly": "H", "Daily": "D", "Weekly": "W", "Monthly": "M", "Quarterly": "Q"}
+
+# Each level is derived from the level below it (weeks don't nest in months, so both come from days).
+PARENT = {"D": "H", "W": "D", "M": "D", "Q": "M"}
+
+
+class TimeRollups:
+    """
+    Lazily materialized hour/day/week/month/quarter aggregates for one (filtered) dataset.
+
+    Only the hourly level touches raw rows; every coarser level is a resample of the
+    level below, so switching the bucket never rescans orders. Orders are counted once,
+    in the bucket of the order's first line, which keeps the count additive across levels.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df: Optional[pd.DataFrame] = df
+        self.has_profit = "unit_cost" in df.columns and df["unit_cost"].notna().any()
+        self.has_returns = "is_returned" in df.columns
+        self._levels: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_daily(cls, daily: pd.DataFrame) -> "TimeRollups":
+        """Rollups seeded with a precomputed daily level (same columns as the hourly base); no hourly buckets."""
+        r = cls.__new__(cls)
+        r._df = None
+        r.has_profit = "gross_profit" in daily.columns
+        r.has_returns = "returns" in daily.columns
+        r._levels = {"D": daily}
+        r._lock = threading.RLock()
+        return r
+
+    def _base(self) -> pd.DataFrame:
+        df = self._df
+        ts = pd.to_datetime(df["order_date"]).dt.floor("h").to_numpy()
+        # Stable time order so each order's first line (and its count) lands in the earliest bucket.
+        order = np.argsort(ts, kind="stable")
+        d = df.iloc[order]
+        qty = d["quantity"].to_numpy(dtype="float64")
+        price = d["unit_price"].to_numpy(dtype="float64")
+
+        cols = {
+            "sales": qty * price,
+            "units": qty,
+            "lines": np.ones(len(d)),
+            "orders": (~d["order_id"].duplicated()).to_numpy(dtype="float64"),
+        }
+        if self.has_returns:
+            cols["returns"] = d["is_returned"].to_numpy(dtype="float64")
+        if self.has_profit:
+            cols["gross_profit"] = np.nan_to_num(qty * (price - d["unit_cost"].to_numpy(dtype="float64")))
+
+        rows = pd.DataFrame(cols, index=pd.DatetimeIndex(ts[order]))
+        return rows.resample(FREQ_RULES["H"]).sum()
+
+    def level(self, freq: str) -> pd.DataFrame:
+        """Additive aggregates for `freq`, building (and caching) any missing lower levels."""
+        if freq not in FREQ_RULES:
+            raise ValueError(f"Unsupported freq: {freq}")
+        with self._lock:
+            if freq not in self._levels:
+                if freq == "H":
+                    if self._df is None:
+                        raise ValueError("Hourly buckets need the raw rows")
+                    self._levels["H"] = self._base()
+                    self._df = None  # raw rows are no longer needed
+                else:
+                    self._levels[freq] = self.level(PARENT[freq]).resample(FREQ_RULES[freq]).sum()
+            return self._levels[freq]
+
+    def series(self, freq: str = "D") -> pd.DataFrame:
+        """Same shape as `metrics.time_series`: order_date, sales, orders, units, [gross_profit], [return_rate]."""
+        lvl = self.level(freq)
+        out = pd.DataFrame({
+            "order_date": lvl.index,
+            "sales": lvl["sales"].to_numpy(),
+            "orders": lvl["orders"].to_numpy().astype("int64"),
+            "units": lvl["units"].to_numpy(),
+        })
+        if np.array_equal(out["units"], np.floor(out["units"])):
+            out["units"] = out["units"].astype("int64")
+        if self.has_profit:
+            out["gross_profit"] = lvl["gross_profit"].to_numpy()
+        if self.has_returns:
+            lines = lvl["lines"].to_numpy()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out["return_rate"] = np.where(lines > 0, lvl["returns"].to_numpy() / lines, np.nan)
+        return out
+
+    @property
+    def materialized(self) -> list:
+        return [f for f in FREQ_RULES if f in self._levels]
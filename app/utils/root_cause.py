@@ -0,0 +1,267 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .order_store import OrderStore
+
+ROOT_CAUSE_DIMENSIONS = ["channel", "sku", "fulfillment_type", "warehouse_zone"]
+ROOT_CAUSE_METRICS = ("sales", "units", "gross_profit")
+# Above this many (dense) cells per dimension subset, cells are counted with np.unique instead of bincount.
+MAX_DENSE_CELLS = 5_000_000
+
+
+@dataclass
+class RootCauseResult:
+    segments: pd.DataFrame     # selected root-cause segments, best first
+    candidates: pd.DataFrame   # every segment that survived pruning
+    prev_total: float
+    curr_total: float
+    cells_evaluated: int       # cells aggregated across all levels
+    cells_possible: int        # cells a brute-force search over every combination would aggregate
+
+    @property
+    def delta(self) -> float:
+        return self.curr_total - self.prev_total
+
+
+def _row_values(d: Union[pd.DataFrame, OrderStore], metric: str) -> np.ndarray:
+    if isinstance(d, OrderStore):
+        if metric == "sales":
+            return d.sales()
+        if metric == "units":
+            return d.quantity.astype(np.float64)
+        return d.gross_profit() if d.has_cost else np.zeros(d.n_rows)
+    q = d["quantity"].to_numpy(dtype="float64")
+    if metric == "sales":
+        return q * d["unit_price"].to_numpy(dtype="float64")
+    if metric == "units":
+        return q
+    if "unit_cost" not in d.columns:
+        return np.zeros(len(d))
+    return np.nan_to_num(q * (d["unit_price"].to_numpy(dtype="float64") - d["unit_cost"].to_numpy(dtype="float64")))
+
+
+def _rows(curr, prev, dims: Sequence[str], metric: str):
+    """Codes per dimension (shared across both windows), labels, row values and a current-window flag."""
+    codes: Dict[str, np.ndarray] = {}
+    labels: Dict[str, np.ndarray] = {}
+    for c in dims:
+        if isinstance(curr, OrderStore):
+            codes[c] = np.concatenate([prev.codes[c], curr.codes[c]]).astype(np.int64)
+            labels[c] = curr.labels[c]
+        else:
+            col = pd.concat([prev[c], curr[c]], ignore_index=True).astype("object")
+            cc, uniq = pd.factorize(col.where(col.notna(), "(missing)"))
+            codes[c] = cc.astype(np.int64)
+            labels[c] = np.asarray(uniq, dtype=object)
+    n_prev = prev.n_rows if isinstance(prev, OrderStore) else len(prev)
+    v = np.concatenate([_row_values(prev, metric), _row_values(curr, metric)])
+    is_curr = np.arange(len(v)) >= n_prev
+    return codes, labels, v, is_curr
+
+
+def _surprise(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Jensen-Shannon divergence between a segment's share of the previous (p) and current (q) totals."""
+    p, q = np.clip(p, 0, None), np.clip(q, 0, None)
+    m = (p + q) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = np.where(p > 0, p * np.log(p / m), 0.0)
+        b = np.where(q > 0, q * np.log(q / m), 0.0)
+    return 0.5 * (a + b)
+
+
+def root_cause_search(
+    df_curr: Union[pd.DataFrame, OrderStore],
+    df_prev: Union[pd.DataFrame, OrderStore],
+    metric: str = "sales",
+    dims: Sequence[str] = ROOT_CAUSE_DIMENSIONS,
+    min_support: float = 0.005,
+    min_ep: float = 0.05,
+    specificity: float = 0.9,
+    direction: str = "auto",
+    max_depth: Optional[int] = None,
+    top_n: int = 10,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> RootCauseResult:
+    """
+    Segments (combinations of dimension values, e.g. channel=eBay x warehouse_zone=B) that explain
+    the most of the metric's change between two windows.
+
+    Apriori/iDice-style level-wise search; a cell at level k is only aggregated when
+    - every (k-1)-dimensional sub-segment survived (support and EP are inherited downward), and
+    - its volume, sum|value| over both windows, is at least `min_support` of the total, and
+      at least `min_ep` x |total delta|: no descendant can explain more than its volume.
+    Explanatory power EP = segment delta / total delta; surprise is the JS divergence of the
+    segment's previous vs current share (Adtributor). A segment is replaced by a child that keeps
+    `specificity` of its EP, so "eBay" gives way to "eBay x zone B" when that is where the change is.
+    direction: 'auto' explains the move of the total; 'down' / 'up' look for the segments that fell /
+    grew the most (e.g. a drop hidden under overall growth), scored as |delta| / |total delta|.
+    progress: called as progress(fraction, message) for each dimension subset (a background job's
+    `ctx.report`, which can raise to cancel the search).
+    """
+    if metric not in ROOT_CAUSE_METRICS:
+        raise ValueError("Unsupported metric")
+    if direction not in ("auto", "down", "up"):
+        raise ValueError(f"Unsupported direction: {direction}")
+    dims = [c for c in dims if _has_dim(df_curr, c) and _has_dim(df_prev, c)]
+    max_depth = len(dims) if max_depth is None else min(max_depth, len(dims))
+
+    codes, labels, v, is_curr = _rows(df_curr, df_prev, dims, metric)
+    curr_total, prev_total = float(v[is_curr].sum()), float(v[~is_curr].sum())
+    delta = curr_total - prev_total
+    vol_total = float(np.abs(v).sum())
+    # A cell must reach both bounds; children can only shrink the volume.
+    min_vol = max(min_support * vol_total, min_ep * abs(delta))
+    w_curr, w_prev, w_abs = np.where(is_curr, v, 0.0), np.where(is_curr, 0.0, v), np.abs(v)
+
+    def aggregate(key: np.ndarray, idx: np.ndarray, n_cells: int):
+        if n_cells <= MAX_DENSE_CELLS:
+            sums = [np.bincount(key, weights=w[idx], minlength=n_cells) for w in (w_curr, w_prev, w_abs)]
+            cell = np.flatnonzero(sums[2] > 0)
+            return cell, *(x[cell] for x in sums)
+        cell, inv = np.unique(key, return_inverse=True)
+        return cell, *(np.bincount(inv, weights=w[idx], minlength=len(cell)) for w in (w_curr, w_prev, w_abs))
+
+    rows: List[pd.DataFrame] = []
+    evaluated = 0
+    n_subsets = sum(len(list(combinations(dims, k))) for k in range(1, max_depth + 1))
+    done = 0
+
+    def step(subset) -> None:
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done / max(1, n_subsets), " × ".join(subset))
+
+    # Level 1: one bincount per dimension; surviving values are re-coded 0..k-1 (-1 elsewhere) so
+    # deeper levels count over (survivors x survivors x ...) cells instead of full cardinalities.
+    compact: Dict[str, np.ndarray] = {}
+    compact_labels: Dict[str, np.ndarray] = {}
+    for c in dims:
+        cell, c_sum, p_sum, vol = aggregate(codes[c], np.arange(len(v)), len(labels[c]))
+        evaluated += len(cell)
+        ok = vol >= min_vol
+        cell, c_sum, p_sum, vol = cell[ok], c_sum[ok], p_sum[ok], vol[ok]
+        remap = np.full(len(labels[c]), -1, dtype=np.int64)
+        remap[cell] = np.arange(len(cell))
+        compact[c], compact_labels[c] = remap[codes[c]], labels[c][cell]
+        rows.append(_segments(dims, (c,), [np.arange(len(cell))], compact_labels, 1, c_sum, p_sum, vol))
+        step((c,))
+
+    # survivors[subset] = surviving mixed-radix keys over the compact codes of `subset`
+    survivors: Dict[Tuple[str, ...], np.ndarray] = {(c,): np.arange(len(compact_labels[c])) for c in dims}
+    for depth in range(2, max_depth + 1):
+        for subset in combinations(dims, depth):
+            subs = list(combinations(subset, depth - 1))
+            step(subset)
+            if any(len(survivors.get(s, ())) == 0 for s in subs):
+                continue
+            card = [len(compact_labels[c]) for c in subset]
+            valid = np.ones(len(v), dtype=bool)
+            for c in subset:
+                valid &= compact[c] >= 0
+            idx = np.flatnonzero(valid)
+            key = np.zeros(len(idx), dtype=np.int64)
+            for c, n in zip(subset, card):
+                key = key * n + compact[c][idx]
+            # Only rows under a surviving parent (the subset minus its last dimension) are counted.
+            keep = np.isin(key // card[-1], survivors[subset[:-1]])
+            cell, c_sum, p_sum, vol = aggregate(key[keep], idx[keep], int(np.prod(card, dtype=np.int64)))
+            evaluated += len(cell)
+
+            ok = vol >= min_vol
+            parts = _decode(cell, card)
+            # Apriori: the other (depth-1)-sub-segments must have survived too (for depth 2 they
+            # are single values, already guaranteed by the compact codes).
+            for drop in range(depth - 1 if depth > 2 else 0):
+                sub_key = np.zeros(len(cell), dtype=np.int64)
+                for i, n in enumerate(card):
+                    if i != drop:
+                        sub_key = sub_key * n + parts[i]
+                ok &= np.isin(sub_key, survivors[tuple(c for i, c in enumerate(subset) if i != drop)])
+            survivors[subset] = cell[ok]
+            rows.append(_segments(
+                dims, subset, [p[ok] for p in parts], compact_labels, depth, c_sum[ok], p_sum[ok], vol[ok]
+            ))
+
+    cand = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=[*dims, "depth", "prev", "curr", "volume"])
+    cand["delta"] = cand["curr"] - cand["prev"]
+    cand["ep"] = cand["delta"] / delta if delta else 0.0
+    sign = {"up": 1.0, "down": -1.0}.get(direction, 1.0 if delta >= 0 else -1.0)
+    cand["score"] = sign * cand["delta"] / abs(delta) if delta else 0.0
+    cand["support"] = cand["volume"] / vol_total if vol_total else 0.0
+    cand["surprise"] = _surprise(
+        cand["prev"].to_numpy() / (prev_total or 1.0), cand["curr"].to_numpy() / (curr_total or 1.0)
+    )
+    cand.insert(0, "segment", [_label(r, dims) for r in cand[dims].itertuples(index=False)])
+
+    brute = 1
+    for c in dims:
+        brute *= len(labels[c]) + 1
+    return RootCauseResult(
+        segments=_select(cand, dims, min_ep, specificity, top_n),
+        candidates=cand.drop(columns=["volume", "score"]),
+        prev_total=prev_total,
+        curr_total=curr_total,
+        cells_evaluated=evaluated,
+        cells_possible=brute - 1,
+    )
+
+
+def _has_dim(d, c: str) -> bool:
+    return c in d.codes if isinstance(d, OrderStore) else c in d.columns
+
+
+def _segments(dims, subset, parts, compact_labels, depth, c_sum, p_sum, vol) -> pd.DataFrame:
+    """One row per surviving cell; dimensions outside `subset` are None (any value)."""
+    cols = {c: np.full(len(vol), None, dtype=object) for c in dims}
+    for c, p in zip(subset, parts):
+        cols[c] = compact_labels[c][p]
+    cols.update({"depth": depth, "prev": p_sum, "curr": c_sum, "volume": vol})
+    return pd.DataFrame(cols)
+
+
+def _decode(keys: np.ndarray, card: Sequence[int]) -> List[np.ndarray]:
+    parts, rem = [], keys
+    for n in reversed(card):
+        rem, r = np.divmod(rem, n)
+        parts.append(r)
+    return parts[::-1]
+
+
+def _label(values, dims: Sequence[str]) -> str:
+    return " × ".join(f"{c}={v}" for c, v in zip(dims, values) if v is not None)
+
+
+def _select(cand: pd.DataFrame, dims: Sequence[str], min_ep: float, specificity: float, top_n: int) -> pd.DataFrame:
+    """
+    Segments moving in the searched direction (score >= min_ep) that no more specific child
+    explains almost as well, minus those already covered by a selected ancestor.
+    """
+    c = cand[cand["score"] >= min_ep].sort_values("depth")
+    if c.empty:
+        return c.drop(columns=["volume", "score"])
+    keys = list(c[dims].itertuples(index=False, name=None))
+    score = c["score"].to_numpy()
+
+    def parents(key):
+        return [key[:k] + (None,) + key[k + 1:] for k, x in enumerate(key) if x is not None]
+
+    best_child: Dict[tuple, float] = {}
+    for key, sc in zip(keys, score):
+        for par in parents(key):
+            best_child[par] = max(best_child.get(par, -np.inf), sc)
+    kept = np.array([best_child.get(key, -np.inf) < specificity * sc for key, sc in zip(keys, score)])
+
+    # Rows are ordered by depth, so every parent's status is known before its children.
+    shadowed: Dict[tuple, bool] = {}
+    covered = np.zeros(len(keys), dtype=bool)
+    for i, key in enumerate(keys):
+        covered[i] = any(shadowed.get(par, False) for par in parents(key))
+        shadowed[key] = covered[i] or kept[i]
+    out = c[kept & ~covered].sort_values(["score", "surprise"], ascending=False).head(top_n)
+    return out.drop(columns=["volume", "score"]).reset_index(drop=True)
@@ -0,0 +1,350 @@
+from __future__ import annotations
+import os
+from dataclasses import dataclass, field, replace
+from typing import Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .order_store import OrderStore
+from .rollups import FREQ_RULES
+from .topk import OTHERS_LABEL, top_k_series
+
+# Target sample size; strata are sampled in proportion to their GMV, so the head of the
+# catalogue (where GMV concentrates) gets more rows per row of population than the tail.
+SAMPLE_ROWS = int(os.environ.get("SAMPLE_ROWS", 200_000))
+# SKU tiers by cumulative GMV share: head SKUs make up the first 50% of GMV, torso the next 40%.
+SKU_TIERS = ("head", "torso", "tail")
+SKU_TIER_BREAKS = (0.5, 0.9)
+MIN_STRATUM_ROWS = 30
+Z_95 = 1.96
+_EPOCH = np.datetime64("1970-01-01", "D")
+_CHUNK = 10_000_000
+
+
+def _interval(est, var, nonneg: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    se = np.sqrt(np.maximum(var, 0.0))
+    lo, hi = est - Z_95 * se, est + Z_95 * se
+    return (np.maximum(lo, 0.0) if nonneg else lo), hi
+
+
+@dataclass
+class StratifiedSample:
+    """
+    Stratified random sample of an OrderStore (strata: channel x SKU GMV tier) for approximate mode.
+
+    Totals are expansion estimates (each sampled line stands for N_h / n_h lines of its stratum)
+    with the usual stratified-sampling variance, reported as 95% confidence intervals; rates
+    (margin, return rate) are ratio estimates. `select` restricts the estimates to a date range
+    and dimension filters without dropping rows, so the variance still uses every sampled line.
+    Distinct orders: every line of each sampled order is kept (`order_lines`), so a sampled line
+    can count as 1 / (its order's lines in the domain / group / bucket), which sums to one per
+    order in expectation. Groups with no sampled line are missing from breakdowns.
+    """
+
+    store: OrderStore
+    rows: np.ndarray
+    stratum: np.ndarray
+    population: np.ndarray
+    sampled: np.ndarray
+    strata_labels: pd.DataFrame
+    order_lines: OrderStore
+    order_local: np.ndarray
+    line_pos: np.ndarray
+    n_population: int
+    has_cost: bool
+    has_returns: bool
+    mask: Optional[np.ndarray] = field(default=None)
+    order_mask: Optional[np.ndarray] = field(default=None)
+
+    @classmethod
+    def from_store(cls, store: OrderStore, n: int = SAMPLE_ROWS, seed: int = 0) -> "StratifiedSample":
+        sales = store.sales()
+        channel = store.codes["channel"] if "channel" in store.codes else np.zeros(store.n_rows, dtype=np.int32)
+        n_channels = len(store.labels["channel"]) if "channel" in store.codes else 1
+
+        # SKU tier by rank of SKU GMV.
+        sku_gmv = store.sum_by("sku", sales)
+        rank = np.argsort(-sku_gmv, kind="stable")
+        total = float(sku_gmv.sum())
+        before = (np.cumsum(sku_gmv[rank]) - sku_gmv[rank]) / total if total > 0 else np.zeros(len(rank))
+        tier = np.empty(len(rank), dtype=np.int32)
+        tier[rank] = np.searchsorted(SKU_TIER_BREAKS, before, side="right")
+
+        k = len(SKU_TIERS)
+        stratum = channel * k + tier[store.codes["sku"]]
+        population = np.bincount(stratum, minlength=n_channels * k).astype(np.float64)
+        gmv = np.bincount(stratum, weights=sales, minlength=n_channels * k)
+
+        # GMV-proportional allocation, at least MIN_STRATUM_ROWS per stratum (or all of it).
+        share = gmv / gmv.sum() if gmv.sum() > 0 else population / max(1.0, population.sum())
+        want = np.clip(np.round(n * share), np.minimum(population, MIN_STRATUM_ROWS), population)
+        if n >= store.n_rows:
+            want = population
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p = np.where(population > 0, want / population, 0.0)
+
+        # Bernoulli draw per row; estimates condition on the realized per-stratum counts.
+        rng = np.random.default_rng(seed)
+        keep = np.empty(store.n_rows, dtype=bool)
+        for lo in range(0, store.n_rows, _CHUNK):
+            hi = min(lo + _CHUNK, store.n_rows)
+            keep[lo:hi] = rng.random(hi - lo, dtype=np.float32) < p[stratum[lo:hi]]
+        rows = np.flatnonzero(keep)
+        sample = store.take(rows)
+
+        # All lines of the sampled orders, with order codes renumbered 0..m-1.
+        oc = store.codes["order_id"]
+        sampled_orders = np.zeros(len(store.labels["order_id"]), dtype=bool)
+        sampled_orders[oc[rows]] = True
+        lines = np.flatnonzero(sampled_orders[oc])
+        _, order_local = np.unique(oc[lines], return_inverse=True)
+
+        labels = pd.DataFrame({
+            "channel": np.repeat(store.labels["channel"] if "channel" in store.codes else ["(all)"], k),
+            "sku_tier": np.tile(SKU_TIERS, n_channels),
+        })
+        return cls(
+            store=sample,
+            rows=rows,
+            stratum=stratum[rows],
+            population=population,
+            sampled=np.bincount(stratum[rows], minlength=n_channels * k).astype(np.float64),
+            strata_labels=labels,
+            order_lines=store.take(lines),
+            order_local=order_local.astype(np.int32),
+            line_pos=np.searchsorted(lines, rows),
+            n_population=store.n_rows,
+            has_cost=store.has_cost,
+            has_returns=store.returned_bits is not None,
+        )
+
+    # -------------------------
+    # Domain (date range + filters)
+    # -------------------------
+    def select(self, start=None, end=None, filters: Optional[Mapping[str, Iterable]] = None) -> "StratifiedSample":
+        """Estimates restricted to start <= order_date <= end and one `isin` per dimension (None = no filter)."""
+        return replace(
+            self,
+            mask=_domain(self.store, self.mask, start, end, filters),
+            order_mask=_domain(self.order_lines, self.order_mask, start, end, filters),
+        )
+
+    def slice_days(self, start, end) -> "StratifiedSample":
+        return self.select(start, end)
+
+    @property
+    def n_rows(self) -> int:
+        """Sampled lines inside the current domain."""
+        return self.store.n_rows if self.mask is None else int(self.mask.sum())
+
+    @property
+    def fraction(self) -> float:
+        return self.store.n_rows / self.n_population if self.n_population else 1.0
+
+    def strata(self) -> pd.DataFrame:
+        """Per-stratum population and sample sizes with the expansion weight of a sampled line."""
+        out = self.strata_labels.assign(rows=self.population.astype(np.int64), sampled=self.sampled.astype(np.int64))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["weight"] = np.where(self.sampled > 0, self.population / self.sampled, np.nan)
+        return out[out["rows"] > 0].reset_index(drop=True)
+
+    # -------------------------
+    # Estimators
+    # -------------------------
+    def _values(self, metric: str, by: str = "") -> Optional[np.ndarray]:
+        s = self.store
+        if metric == "sales":
+            return s.sales()
+        if metric == "units":
+            return s.quantity.astype(np.float64)
+        if metric == "orders":
+            return self._order_share(by)
+        if metric == "gross_profit":
+            return s.gross_profit() if self.has_cost else None
+        if metric == "lines":
+            return np.ones(s.n_rows)
+        if metric == "returns":
+            return s.is_returned.astype(np.float64)
+        raise ValueError("Unsupported metric")
+
+    def _order_share(self, by: str = "", first_day: bool = False) -> np.ndarray:
+        """
+        Per sampled line, 1 / (lines of its order in the domain with the same `by` value). With
+        `first_day`, only lines on the order's first day in the domain count (others get 0), so
+        each order lands in one time bucket, as in `TimeRollups`.
+        """
+        o = self.order_lines
+        m = int(self.order_local.max()) + 1 if len(self.order_local) else 0
+        inside = np.ones(o.n_rows, dtype=bool) if self.order_mask is None else self.order_mask
+        key = self.order_local.astype(np.int64)
+        if by:
+            key = o.codes[by].astype(np.int64) * m + key
+        if first_day:
+            first = np.full(m, np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(first, self.order_local[inside], o.day[inside])
+            inside = inside & (o.day == first[self.order_local])
+        keys, counts = np.unique(key[inside], return_counts=True)
+        mine = key[self.line_pos]
+        at = np.minimum(np.searchsorted(keys, mine), max(0, len(keys) - 1))
+        hit = inside[self.line_pos] & (keys[at] == mine) if len(keys) else np.zeros(len(mine), dtype=bool)
+        return np.where(hit, 1.0 / np.where(hit, counts[at], 1), 0.0)
+
+    def _estimate(self, y: np.ndarray, group: Optional[np.ndarray] = None, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-group expansion totals and their variances (stratified SRS within each stratum)."""
+        if self.mask is not None:
+            y = np.where(self.mask, y, 0.0)
+        h = len(self.population)
+        key = self.stratum if group is None else self.stratum.astype(np.int64) * k + group
+        s1 = np.bincount(key, weights=y, minlength=h * k).reshape(h, k)
+        s2 = np.bincount(key, weights=y * y, minlength=h * k).reshape(h, k)
+        n, N = self.sampled[:, None], self.population[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, s1 / n, 0.0)
+            s_sq = np.where(n > 1, (s2 - n * mean ** 2) / (n - 1), 0.0)
+            var = np.where(n > 0, N ** 2 * (1 - n / N) * s_sq / n, 0.0)
+        return (N * mean).sum(axis=0), np.maximum(var.sum(axis=0), 0.0)
+
+    def _ratio(self, y: np.ndarray, x: np.ndarray, group: Optional[np.ndarray] = None, k: int = 1):
+        """Ratio estimate Y/X per group with its linearized variance."""
+        ty, _ = self._estimate(y, group, k)
+        tx, _ = self._estimate(x, group, k)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = np.where(tx != 0, ty / tx, np.nan)
+            rr = np.nan_to_num(r) if group is None else np.nan_to_num(r)[group]
+            _, vz = self._estimate(y - rr * x, group, k)
+            return r, np.where(tx != 0, vz / tx ** 2, np.nan)
+
+    # -------------------------
+    # metrics.* equivalents
+    # -------------------------
+    def kpi_summary(self) -> dict:
+        """`metrics.kpi_summary` keys as estimates, plus `ci` (95% intervals) and sample details."""
+        ci = {}
+        gmv, v = self._estimate(self._values("sales"))
+        ci["gmv"] = _interval(gmv[0], v[0])
+        orders, v = self._estimate(self._values("orders"))
+        ci["orders"] = _interval(orders[0], v[0])
+        units, v = self._estimate(self._values("units"))
+        ci["units"] = _interval(units[0], v[0])
+
+        gross_profit = gross_margin = return_rate = returned_gmv = net_gmv = None
+        if self.has_cost:
+            gp, v = self._estimate(self._values("gross_profit"))
+            gross_profit = float(gp[0])
+            ci["gross_profit"] = _interval(gp[0], v[0], nonneg=False)
+            if gmv[0] != 0:
+                r, v = self._ratio(self._values("gross_profit"), self._values("sales"))
+                gross_margin = float(r[0])
+                ci["gross_margin"] = _interval(r[0], v[0], nonneg=False)
+        if self.has_returns:
+            r, v = self._ratio(self._values("returns"), self._values("lines"))
+            return_rate = float(r[0])
+            ci["return_rate"] = _interval(r[0], v[0])
+            returned_sales = self._values("sales") * self._values("returns")
+            est, v = self._estimate(returned_sales)
+            returned_gmv = float(est[0])
+            ci["returned_gmv"] = _interval(est[0], v[0])
+            est, v = self._estimate(self._values("sales") - returned_sales)
+            net_gmv = float(est[0])
+            ci["net_gmv"] = _interval(est[0], v[0])
+
+        return {
+            "gmv": float(gmv[0]),
+            "orders": int(round(orders[0])),
+            "units": int(round(units[0])),
+            "gross_profit": gross_profit,
+            "gross_margin": gross_margin,
+            "return_rate": return_rate,
+            "returned_gmv": returned_gmv,
+            "net_gmv": net_gmv,
+            "ci": {key: (float(lo), float(hi)) for key, (lo, hi) in ci.items()},
+            "approximate": True,
+            "sample_rows": self.n_rows,
+        }
+
+    def time_series(self, freq: str = "D") -> pd.DataFrame:
+        """
+        `metrics.time_series` columns as estimates, each followed by `<col>_low` / `<col>_high`
+        (95% interval); buckets span the first to the last sampled day of the domain.
+        """
+        if freq not in FREQ_RULES:
+            raise ValueError(f"Unsupported freq: {freq}")
+        if freq == "H":
+            raise ValueError("Hourly buckets need the raw rows")
+        day = self.store.day
+        used = day if self.mask is None else day[self.mask]
+        if len(used) == 0:
+            return pd.DataFrame({"order_date": pd.DatetimeIndex([]), "sales": [], "orders": [], "units": []})
+        lo, hi = int(used.min()), int(used.max())
+        days = pd.DatetimeIndex(_EPOCH + np.arange(lo, hi + 1))
+        labels = days if freq == "D" else pd.Series(0, index=days).resample(FREQ_RULES[freq]).sum().index
+        # Resample labels are the right edge of each bucket (Sunday / month end / quarter end).
+        bucket_of_day = np.searchsorted(labels.to_numpy(), days.to_numpy(), side="left")
+        group = bucket_of_day[np.clip(day - lo, 0, hi - lo)]
+        k = len(labels)
+
+        out = {"order_date": labels}
+        metrics = ["sales", "orders", "units"] + (["gross_profit"] if self.has_cost else [])
+        for m in metrics:
+            y = self._order_share(first_day=True) if m == "orders" else self._values(m)
+            est, var = self._estimate(y, group, k)
+            out[m] = est
+            out[f"{m}_low"], out[f"{m}_high"] = _interval(est, var, nonneg=m != "gross_profit")
+        if self.has_returns:
+            r, var = self._ratio(self._values("returns"), self._values("lines"), group, k)
+            out["return_rate"] = r
+            out["return_rate_low"], out["return_rate_high"] = _interval(r, var)
+        return pd.DataFrame(out).reset_index(drop=True)
+
+    def group(self, by: str, metric: str) -> Optional[pd.Series]:
+        """Per-`by` estimates for labels with sampled lines in the domain (like `OrderStore.group`)."""
+        est = self._group(by, metric)
+        return None if est is None else est[0]
+
+    def _group(self, by: str, metric: str) -> Optional[Tuple[pd.Series, pd.Series]]:
+        y = self._values(metric, by)
+        if y is None:
+            return None
+        codes, labels = self.store.codes[by], self.store.labels[by]
+        est, var = self._estimate(y, codes, len(labels))
+        hit = codes if self.mask is None else codes[self.mask]
+        present = np.bincount(hit, minlength=len(labels)) > 0
+        index = pd.Index(labels[present], name=by)
+        return pd.Series(est[present], index=index), pd.Series(var[present], index=index)
+
+    def top_breakdown(self, by: str, metric: str, n: int = 10, with_other: bool = False) -> pd.DataFrame:
+        """`metrics.top_breakdown` with `ci_low` / `ci_high` (95%) after the estimate column."""
+        est = self._group(by, metric)
+        if est is None:
+            return pd.DataFrame({by: [], "gross_profit": []})
+        agg, var = est
+        out = top_k_series(agg, n, metric, by, with_other=with_other)
+        var = var.reindex(out[by]).to_numpy()
+        if with_other and len(out) and out[by].iloc[-1] == OTHERS_LABEL:
+            # The remainder is one estimate over every line outside the listed labels.
+            top_codes = np.flatnonzero(np.isin(self.store.labels[by], out[by].iloc[:-1].to_numpy()))
+            y = self._values(metric, by)
+            var[-1] = self._estimate(np.where(np.isin(self.store.codes[by], top_codes), 0.0, y))[1][0]
+        lo, hi = _interval(out[metric].to_numpy(dtype=np.float64), var, nonneg=metric != "gross_profit")
+        out.insert(2, "ci_low", lo)
+        out.insert(3, "ci_high", hi)
+        return out
+
+    def nbytes(self) -> int:
+        arrays = [self.rows, self.stratum, self.order_local, self.line_pos]
+        arrays += [a for a in (self.mask, self.order_mask) if a is not None]
+        return self.store.nbytes() + self.order_lines.nbytes() + int(sum(a.nbytes for a in arrays))
+
+
+def _domain(s: OrderStore, mask: Optional[np.ndarray], start, end, filters) -> np.ndarray:
+    mask = np.ones(s.n_rows, dtype=bool) if mask is None else mask.copy()
+    if start is not None:
+        mask &= s.day >= s.day_number(start)
+    if end is not None:
+        mask &= s.day <= s.day_number(end)
+    for dim, values in (filters or {}).items():
+        if values is not None:
+            wanted = np.flatnonzero(np.isin(s.labels[dim], list(values)))
+            mask &= np.isin(s.codes[dim], wanted)
+    return mask
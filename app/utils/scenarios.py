@@ -0,0 +1,103 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Upper bound on (draws x price levels) cells materialized at once; larger runs go in draw blocks.
+MAX_BLOCK_CELLS = 4_000_000
+# Price changes are bucketed on a log grid of this step for the volume response only
+# (revenue/cost weights stay exact); relative error is below |elasticity| * LOG_STEP / 2.
+LOG_STEP = 1e-4
+
+
+@dataclass
+class ScenarioResult:
+    gmv: np.ndarray            # (n_draws,) simulated GMV
+    gross_profit: Optional[np.ndarray]
+    base_gmv: float
+    base_gross_profit: Optional[float]
+
+    def summary(self) -> pd.DataFrame:
+        rows = [self._row("GMV", self.base_gmv, self.gmv)]
+        if self.gross_profit is not None:
+            rows.append(self._row("GROSS_PROFIT", self.base_gross_profit, self.gross_profit))
+        return pd.DataFrame(rows, columns=["metric", "baseline", "mean", "p5", "p50", "p95", "prob_above_baseline"])
+
+    @staticmethod
+    def _row(name, base, draws):
+        p5, p50, p95 = np.percentile(draws, [5, 50, 95])
+        return [name, base, float(draws.mean()), float(p5), float(p50), float(p95), float((draws > base).mean())]
+
+
+def rollback_price_change(agg: pd.DataFrame) -> np.ndarray:
+    """Per-key price change that restores the previous window's average price (0 where there was none)."""
+    pc, pp = agg["price_c"].to_numpy(dtype="float64"), agg["price_p"].to_numpy(dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where((pc > 0) & (pp > 0), pp / pc - 1.0, 0.0)
+    return out
+
+
+def simulate_price_change(
+    agg: pd.DataFrame,
+    price_change: np.ndarray,
+    elasticity: float = -1.5,
+    elasticity_sd: float = 0.3,
+    sku_elasticity_sd: float = 0.0,
+    n_draws: int = 2000,
+    seed: Optional[int] = 0,
+) -> ScenarioResult:
+    """
+    Monte Carlo what-if on the current window of `diagnostics.pvm_aggregates`:
+    units_i' = units_i * (1 + dp_i) ** e_i, price_i' = price_i * (1 + dp_i), where
+    e_i = market elasticity ~ N(elasticity, elasticity_sd) per draw + optional per-SKU noise
+    ~ N(0, sku_elasticity_sd). Each key's actual sales (not units x mean price) scale by
+    (units_i' / units_i) * (1 + dp_i), so the baseline equals `compute_kpis` GMV.
+
+    All draws are evaluated as one (draws x price-levels) array computation: SKUs are bucketed by
+    log price change, unchanged SKUs are a constant, and per-SKU noise is folded in through its
+    lognormal mean and variance per bucket, so cost does not grow with the number of SKUs.
+    """
+    rng = np.random.default_rng(seed)
+    units = agg["units_c"].to_numpy(dtype="float64")
+    sales = agg["sales_c"].to_numpy(dtype="float64")
+    # Gross profit covers only the rows that have a unit_cost (as `compute_kpis`): their sales and COGS.
+    has_cost = "cogs_c" in agg.columns
+    cost_sales = agg["cost_sales_c"].to_numpy(dtype="float64") if has_cost else np.zeros_like(sales)
+    cogs = agg["cogs_c"].to_numpy(dtype="float64") if has_cost else np.zeros_like(sales)
+    dp = np.clip(np.asarray(price_change, dtype="float64"), -0.95, None)  # keep (1 + dp) positive
+
+    base_gmv = float(sales.sum())
+    base_gp = float((cost_sales - cogs).sum()) if has_cost else None
+
+    changed = (dp != 0) & (units > 0)
+    fixed_gmv = float(sales[~changed].sum())
+    fixed_gp = float((cost_sales - cogs)[~changed].sum())
+
+    d = dp[changed]
+    rev = sales[changed] * (1.0 + d)     # GMV at the new price before the volume response
+    prof = cost_sales[changed] * (1.0 + d) - cogs[changed]
+    q, inv = np.unique(np.round(np.log1p(d) / LOG_STEP).astype(np.int64), return_inverse=True)
+    lvl = q * LOG_STEP
+    rev_k, prof_k = np.bincount(inv, rev, len(q)), np.bincount(inv, prof, len(q))
+    rev2_k, prof2_k = np.bincount(inv, rev ** 2, len(q)), np.bincount(inv, prof ** 2, len(q))
+
+    # Per-SKU noise: E[exp(n*l)] = exp(s^2 l^2 / 2), Var = exp(2 s^2 l^2) - exp(s^2 l^2).
+    s2l2 = (sku_elasticity_sd * lvl) ** 2
+    mean_adj = np.exp(s2l2 / 2)
+    var_adj = np.exp(2 * s2l2) - np.exp(s2l2)
+
+    e_market = rng.normal(elasticity, elasticity_sd, n_draws)
+    z = rng.standard_normal(n_draws)
+    gmv = np.empty(n_draws)
+    gp = np.empty(n_draws)
+    block = max(1, MAX_BLOCK_CELLS // max(1, len(q)))
+    for s in range(0, n_draws, block):
+        lift = np.exp(e_market[s:s + block, None] * lvl[None, :])      # (draws, levels)
+        sd_g = np.sqrt((lift ** 2) @ (rev2_k * var_adj))
+        sd_p = np.sqrt((lift ** 2) @ (prof2_k * var_adj))
+        gmv[s:s + block] = fixed_gmv + lift @ (rev_k * mean_adj) + z[s:s + block] * sd_g
+        gp[s:s + block] = fixed_gp + lift @ (prof_k * mean_adj) + z[s:s + block] * sd_p
+
+    return ScenarioResult(gmv=gmv, gross_profit=gp if has_cost else None, base_gmv=base_gmv, base_gross_profit=base_gp)
@@ -0,0 +1,416 @@
+import uuid
+from concurrent.futures import wait
+from datetime import date
+from functools import partial
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from .bitmap_index import BitmapIndex
+from .data_loader import PartitionedOrders, PartitionScan, dataset_fingerprint
+from .demo import DEMO_CSV, DemoArtifacts, load_demo_artifacts
+from .diagnostics import slice_by_date
+from .jobs import Job, JobExecutor, is_cancellation
+from .memory import MB, SHARED, FrameRef, MemoryGovernor
+from .order_store import OrderStore
+from .profiler import DataProfile, profile_orders
+from .reports import warm_diagnostics
+from .sampling import StratifiedSample
+from .sharded import SHARDED_MIN_ROWS, ShardedStore, default_workers
+from .snapshots import SnapshotStore
+from .topk import HeavyHitters
+
+
+def set_orders_df(
+    df: pd.DataFrame,
+    heavy_hitters: Optional[HeavyHitters] = None,
+    fingerprint: Optional[str] = None,
+    source: Optional[str] = None,
+) -> None:
+    """
+    Store the active dataset together with its fingerprint (the per-dataset cache key).
+
+    The frame is handed to the memory governor and the session keeps a `FrameRef`; the previous
+    dataset, its window copies and spill files are released here. `source` (a stable server-side
+    path) lets the snapshot store drop that source's snapshots once its content changes. Uploads
+    pass none: their file names are shared by every session, so different files would evict each
+    other's snapshots; theirs are left to the store's least-recently-used pruning.
+    """
+    gov, sid = memory_governor(), _memory_owner()
+    gov.discard(sid)
+    gov.put(sid, "orders", df)
+    fingerprint = fingerprint or dataset_fingerprint(df)
+    _set_frame_ref(FrameRef(sid, "orders"), fingerprint, heavy_hitters)
+    if source is not None:
+        snapshot_store().activate(fingerprint, source)
+
+
+def _set_frame_ref(ref: FrameRef, fingerprint: str, heavy_hitters: Optional[HeavyHitters] = None) -> None:
+    for k in ("orders_dataset", "orders_last_scan", "orders_precomputed"):
+        st.session_state.pop(k, None)
+    st.session_state["orders_df"] = ref
+    st.session_state["orders_fp"] = fingerprint
+    if heavy_hitters is not None:
+        st.session_state["orders_heavy_hitters"] = heavy_hitters
+    else:
+        st.session_state.pop("orders_heavy_hitters", None)
+
+
+def set_orders_dataset(ds: PartitionedOrders) -> None:
+    """Use a date-partitioned directory as the active dataset; pages read only the windows they need."""
+    for k in ("orders_df", "orders_heavy_hitters", "orders_last_scan", "orders_precomputed"):
+        st.session_state.pop(k, None)
+    memory_governor().discard(_memory_owner())
+    st.session_state["orders_dataset"] = ds
+    st.session_state["orders_fp"] = ds.fingerprint
+    snapshot_store().activate(ds.fingerprint, str(ds.root.resolve()))
+
+
+@st.cache_resource(show_spinner=False)
+def _demo_artifacts() -> DemoArtifacts:
+    # Loaded once per server process and shared by every session (read-only).
+    return load_demo_artifacts()
+
+
+def load_demo() -> None:
+    """Activate the synthetic demo dataset with its precomputed profile and OrderStore."""
+    art = _demo_artifacts()
+    # The frame lives in the process-wide cache: count it once as shared instead of per session.
+    gov = memory_governor()
+    gov.discard(_memory_owner())
+    name = f"demo:{art.fingerprint}"
+    if (SHARED, name) not in gov:
+        gov.track(SHARED, name, art.df)
+    gov.track(SHARED, f"demo store:{art.fingerprint}", art.store, art.store.nbytes() + art.store.dictionary_nbytes())
+    _set_frame_ref(FrameRef(SHARED, name), art.fingerprint)
+    st.session_state["orders_precomputed"] = art
+    snapshot_store().activate(art.fingerprint, str(DEMO_CSV.resolve()))
+
+
+def has_orders() -> bool:
+    return "orders_df" in st.session_state or "orders_dataset" in st.session_state
+
+
+def orders_in_memory() -> bool:
+    """True for an in-memory dataset (upload/demo), False for a partitioned one or no data."""
+    return "orders_df" in st.session_state
+
+
+def _orders_frame() -> pd.DataFrame:
+    ref = st.session_state["orders_df"]
+    if isinstance(ref, pd.DataFrame):
+        # Assigned directly (e.g. by a test harness): adopt it so it is accounted for.
+        set_orders_df(ref, fingerprint=st.session_state.get("orders_fp"))
+        ref = st.session_state["orders_df"]
+    df = memory_governor().get(ref.owner, ref.name)
+    if df is None:
+        st.session_state.pop("orders_df", None)
+        st.warning("The loaded dataset is no longer available. Reload it from Home.")
+        st.stop()
+    return df
+
+
+def orders_fingerprint() -> str:
+    if "orders_fp" not in st.session_state:
+        st.session_state["orders_fp"] = dataset_fingerprint(_orders_frame())
+    return st.session_state["orders_fp"]
+
+
+def orders_date_bounds() -> Tuple[date, date]:
+    if "orders_dataset" in st.session_state:
+        return st.session_state["orders_dataset"].date_bounds
+    df = _orders_frame()
+    return df["order_date"].min().date(), df["order_date"].max().date()
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _read_window(fp: str, start, end, _ds: PartitionedOrders) -> Tuple[pd.DataFrame, PartitionScan]:
+    # Shared across reruns/sessions: callers must treat the frame as read-only.
+    df, scan = _ds.read(start, end)
+    memory_governor().track(SHARED, f"partition window:{fp}:{start}:{end}", df)
+    return df, scan
+
+
+def orders_window(start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+    """
+    Orders within [start, end] (inclusive days). For a partitioned dataset the range is pushed
+    down to the file listing and the scan stats are kept in `orders_last_scan`.
+    In-memory windows are kept by the memory governor (recomputable, so dropped rather than
+    spilled under pressure) and reused across reruns; a window covering every row is the
+    dataset itself, not a copy. Treat the result as read-only.
+    """
+    if "orders_dataset" in st.session_state:
+        df, scan = _read_window(orders_fingerprint(), start, end, st.session_state["orders_dataset"])
+        st.session_state["orders_last_scan"] = scan
+        return df
+
+    gov, sid = memory_governor(), _memory_owner()
+    name = f"window:{start}:{end}"
+    window = gov.get(sid, name)
+    if window is not None:
+        return window
+
+    df = _orders_frame()
+    dates = pd.to_datetime(df["order_date"], errors="coerce")
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+    if mask.all():
+        return df
+    window = df[mask]
+    gov.put(sid, name, window, recomputable=True)
+    return window
+
+
+def orders_df() -> pd.DataFrame:
+    """The whole active dataset (reads every partition of a partitioned dataset)."""
+    if "orders_df" in st.session_state:
+        return _orders_frame()
+    return orders_window()
+
+
+def scan_caption(label: str = "Partitions") -> Optional[str]:
+    scan = st.session_state.get("orders_last_scan")
+    if scan is None:
+        return None
+    return f"{label}: {scan.read:,} partition(s) read · {scan.skipped:,} skipped by date pruning"
+
+
+def _profile_job(ctx, df: pd.DataFrame) -> DataProfile:
+    ctx.report(0.0, "profiling")
+    return profile_orders(df)
+
+
+def orders_profile() -> DataProfile:
+    if "orders_precomputed" in st.session_state:
+        return st.session_state["orders_precomputed"].profile
+    # Shared slot per dataset: sessions on the same data reuse one profiling run.
+    fp = orders_fingerprint()
+    return run_job("profile", fp, _profile_job, orders_df(), label="Profiling dataset…", scope=("profile", fp))
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _store_for(fp: str, _df: pd.DataFrame) -> OrderStore:
+    return OrderStore.from_frame(_df)
+
+
+def orders_store() -> Optional[OrderStore]:
+    """Compact array copy of an in-memory dataset (None for partitioned datasets, which stay on disk)."""
+    if "orders_df" not in st.session_state:
+        return None
+    if "orders_precomputed" in st.session_state:
+        return st.session_state["orders_precomputed"].store
+    fp = orders_fingerprint()
+    store = _store_for(fp, _orders_frame())
+    memory_governor().track(SHARED, f"store:{fp}", store, store.nbytes() + store.dictionary_nbytes())
+    return store
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _sharded_for(fp: str, _store: OrderStore) -> ShardedStore:
+    # Shared-memory blocks are unlinked when the cache drops the store.
+    return ShardedStore(_store)
+
+
+def orders_sharded() -> Optional[ShardedStore]:
+    """
+    Process-sharded, shared-memory copy of a large in-memory dataset for the heavy group-bys
+    (None for partitioned datasets, below SHARDED_MIN_ROWS rows, with fewer than 2 workers, or
+    when shared memory cannot hold the columns).
+    """
+    store = orders_store()
+    if store is None or default_workers() < 2 or store.n_rows < SHARDED_MIN_ROWS:
+        return None
+    fp = orders_fingerprint()
+    try:
+        sharded = _sharded_for(fp, store)
+    except OSError:
+        return None
+    memory_governor().track(SHARED, f"sharded:{fp}", sharded, sharded.nbytes())
+    return sharded
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _sample_for(fp: str, _store: OrderStore) -> StratifiedSample:
+    return StratifiedSample.from_store(_store)
+
+
+def orders_sample() -> Optional[StratifiedSample]:
+    """Stratified sample of an in-memory dataset for approximate mode (None for partitioned datasets)."""
+    store = orders_store()
+    if store is None:
+        return None
+    fp = orders_fingerprint()
+    sample = _sample_for(fp, store)
+    memory_governor().track(SHARED, f"sample:{fp}", sample, sample.nbytes())
+    return sample
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _index_for(fp: str, _store: OrderStore) -> BitmapIndex:
+    return BitmapIndex.from_store(_store)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _window_index_for(fp: str, start, end, _df: pd.DataFrame) -> BitmapIndex:
+    return BitmapIndex.from_frame(_df)
+
+
+def orders_index(start: Optional[date] = None, end: Optional[date] = None) -> BitmapIndex:
+    """
+    Filter index for the active dataset. Row positions match `orders_df()` / `orders_store()`
+    for an in-memory dataset (dates are filtered through the index, `start`/`end` are ignored)
+    and `orders_window(start, end)` for a partitioned one.
+    """
+    fp = orders_fingerprint()
+    if orders_in_memory():
+        store = orders_store()
+        index = _index_for(fp, store)
+        name = f"index:{fp}"
+    else:
+        index = _window_index_for(fp, start, end, orders_window(start, end))
+        name = f"index:{fp}:{start}:{end}"
+    memory_governor().track(SHARED, name, index, index.nbytes())
+    return index
+
+
+# -------------------------
+# Memory governor
+# -------------------------
+@st.cache_resource(show_spinner=False)
+def memory_governor() -> MemoryGovernor:
+    return MemoryGovernor()
+
+
+def _memory_owner() -> str:
+    sid = _session_id()
+    if "_memory_lease" not in st.session_state:
+        st.session_state["_memory_lease"] = memory_governor().lease(sid)
+    return sid
+
+
+def render_memory_usage() -> None:
+    """Sidebar summary of this session's and the process's tracked memory."""
+    gov, sid = memory_governor(), _memory_owner()
+    mine, total = gov.usage(sid), gov.total()
+    with st.sidebar.expander(f"Memory: {mine / MB:,.0f} MB session · {total / MB:,.0f} MB total"):
+        st.progress(min(1.0, mine / gov.session_budget), text=f"Session {mine / MB:,.1f} / {gov.session_budget / MB:,.0f} MB")
+        st.progress(min(1.0, total / gov.global_budget), text=f"All sessions {total / MB:,.1f} / {gov.global_budget / MB:,.0f} MB")
+        if gov.spilled_bytes():
+            st.caption(f"Spilled to disk: {gov.spilled_bytes() / MB:,.1f} MB · {gov.spills} spill(s), {gov.reloads} reload(s)")
+        report = gov.report(owners=(sid, SHARED))
+        if len(report):
+            st.dataframe(report.round({"MB": 2}), width="stretch", hide_index=True)
+
+
+# -------------------------
+# Background jobs
+# -------------------------
+@st.cache_resource(show_spinner=False)
+def job_executor() -> JobExecutor:
+    return JobExecutor()
+
+
+def _session_id() -> str:
+    if "_job_session" not in st.session_state:
+        st.session_state["_job_session"] = uuid.uuid4().hex
+    return st.session_state["_job_session"]
+
+
+def submit_job(
+    name: str,
+    key: Hashable,
+    fn: Callable[..., Any],
+    *args,
+    scope: Optional[Hashable] = None,
+    **kwargs,
+) -> Job:
+    """Like `run_job`, but returns the job without waiting; later reruns with the same key pick it up."""
+    slot = scope if scope is not None else (_session_id(), name)
+    return job_executor().submit(slot, key, fn, *args, **kwargs)
+
+
+def run_job(
+    name: str,
+    key: Hashable,
+    fn: Callable[..., Any],
+    *args,
+    label: str = "Working…",
+    scope: Optional[Hashable] = None,
+    **kwargs,
+) -> Any:
+    """
+    Run `fn(ctx, *args, **kwargs)` on the job executor and wait for it with a progress bar.
+
+    The slot is (session, name) unless `scope` is given. When a widget changes, Streamlit stops
+    this script run at the next progress update and the rerun submits new inputs to the same
+    slot, which cancels the superseded job; an unchanged key picks up the running/finished job.
+    Functions run off the script thread, so they must not call Streamlit.
+    """
+    job = submit_job(name, key, fn, *args, scope=scope, **kwargs)
+    # Quick jobs return before any progress bar is drawn.
+    wait([job.future], timeout=0.05)
+    if not job.done():
+        bar = st.progress(0.0, text=label)
+        while not job.done():
+            msg = f"{label} {job.message}" if job.message else label
+            # Each update is also where Streamlit interrupts this run when the inputs change.
+            bar.progress(job.progress, text=msg)
+            wait([job.future], timeout=0.1)
+        bar.empty()
+    try:
+        return job.result()
+    except BaseException as e:
+        if is_cancellation(e):
+            # Superseded by a newer run of this page; that run renders the result.
+            st.stop()
+        raise
+
+
+# -------------------------
+# Report snapshots
+# -------------------------
+@st.cache_resource(show_spinner=False)
+def snapshot_store() -> SnapshotStore:
+    return SnapshotStore()
+
+
+def run_snapshot_job(name: str, key: Hashable, fn: Callable[..., Any], *args, label: str = "Working…", **kwargs) -> Any:
+    """
+    `run_job` backed by the snapshot store: a result persisted for (active dataset, name, key) is
+    returned without computing (and seeds the job slot, so reruns skip the disk read); a computed
+    result is persisted for later sessions.
+    """
+    snaps, fp = snapshot_store(), orders_fingerprint()
+    job = job_executor().get((_session_id(), name))
+    if job is None or job.key != key or job.status != "done":
+        hit = snaps.get(fp, name, key)
+        if hit is not None:
+            submit_job(name, key, lambda ctx: hit)
+            return hit
+    out = run_job(name, key, fn, *args, label=label, **kwargs)
+    if (fp, name, key) not in snaps:
+        snaps.put(fp, name, key, out)
+    return out
+
+
+def warm_snapshots() -> Job:
+    """
+    Precompute the active dataset's default Diagnostics reports into the snapshot store in the
+    background (one shared job per dataset; reports already stored are not recomputed).
+    """
+    fp = orders_fingerprint()
+    if orders_in_memory():
+        store, df = orders_store(), orders_df()
+        window, history, profile = store.slice_days, partial(slice_by_date, df), orders_profile()
+    else:
+        ds = st.session_state["orders_dataset"]
+        window = history = lambda start, end: ds.read(start, end)[0]
+        profile = None
+    return submit_job(
+        "snapshots", fp, warm_diagnostics, snapshot_store(), fp, orders_date_bounds(), window, history, profile,
+        scope=("snapshots", fp),
+    )
@@ -0,0 +1,338 @@
+from __future__ import annotations
+import copy
+import errno
+import os
+import shutil
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, spawn
+from multiprocessing.context import SpawnContext, SpawnProcess
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .jobs import usable_cpus
+from .order_store import OrderStore
+from .rollups import TimeRollups
+
+SHARD_KEYS = ("sku", "order_date")
+# The app switches to sharded aggregation from this many rows (and only with 2+ workers).
+SHARDED_MIN_ROWS = int(os.getenv("SHARDED_MIN_ROWS", "2000000"))
+# Shards per worker: small shards even out skew (one huge SKU, a busy week) across the pool.
+SHARDS_PER_WORKER = 4
+# Column name -> (shared memory block, dtype, length)
+_Spec = Dict[str, Tuple[str, str, int]]
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+# -------------------------
+# Process pool (shared by every ShardedStore in this process)
+# -------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return int(os.getenv("SHARD_WORKERS", "0")) or usable_cpus()
+
+
+_spawn_lock = threading.Lock()
+
+
+class _ShardWorker(SpawnProcess):
+    """
+    Streamlit runs each page as `__main__`; a spawned child would re-run the page on start-up.
+    Shard workers only need `utils.sharded`, so while one of them starts, the spawn preparation
+    data leaves out the main module; the stdlib function is restored right after.
+    """
+
+    def start(self) -> None:
+        with _spawn_lock:
+            original = spawn.get_preparation_data
+
+            def _preparation_data(name: str) -> dict:
+                data = original(name)
+                data.pop("init_main_from_path", None)
+                data.pop("init_main_from_name", None)
+                return data
+
+            spawn.get_preparation_data = _preparation_data
+            try:
+                super().start()
+            finally:
+                spawn.get_preparation_data = original
+
+
+class _ShardContext(SpawnContext):
+    Process = _ShardWorker
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: never fork the (multi-threaded) Streamlit server.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_ShardContext())
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+# -------------------------
+# Shared column buffers
+# -------------------------
+class _SharedColumns:
+    """
+    Column arrays copied once into shared memory; unlinked on `close` or when garbage collected.
+    Raises OSError (nothing left allocated) when shared memory is too small for them.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.nbytes = int(sum(a.nbytes for a in arrays.values()))
+        _check_shm_space(self.nbytes)
+        blocks, self.spec = [], {}
+        try:
+            for name, a in arrays.items():
+                shm = shared_memory.SharedMemory(create=True, size=max(1, a.nbytes))
+                blocks.append(shm)
+                np.ndarray(a.shape, a.dtype, buffer=shm.buf)[:] = a
+                self.spec[name] = (shm.name, a.dtype.str, len(a))
+        except BaseException:
+            _release(blocks)
+            raise
+        self._finalizer = weakref.finalize(self, _release, blocks)
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+def _check_shm_space(nbytes: int) -> None:
+    # POSIX shared memory is sized lazily on tmpfs: an oversized block is created fine and the
+    # process gets SIGBUS when the copy runs out of pages (Docker's /dev/shm is 64 MB by default).
+    try:
+        free = shutil.disk_usage("/dev/shm").free
+    except OSError:
+        return
+    if nbytes > free:
+        raise OSError(errno.ENOSPC, f"/dev/shm has {free:,} bytes free, {nbytes:,} needed")
+
+
+def _release(blocks: List[shared_memory.SharedMemory]) -> None:
+    for shm in blocks:
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Worker side: attachments are kept across tasks so each block is mapped once per worker.
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+MAX_ATTACHED = 64
+
+
+def _column(spec: _Spec, name: str) -> np.ndarray:
+    block, dtype, n = spec[name]
+    shm = _attached.get(block)
+    if shm is None:
+        if len(_attached) >= MAX_ATTACHED:
+            live = {b for b, _, _ in spec.values()}
+            for old in [b for b in _attached if b not in live]:
+                _attached.pop(old).close()
+        # Spawned workers share the coordinator's resource tracker, so attaching here does not
+        # make anyone but the coordinator (close / GC) unlink the block.
+        _attached[block] = shared_memory.SharedMemory(name=block)
+        shm = _attached[block]
+    return np.ndarray((n,), np.dtype(dtype), buffer=shm.buf)
+
+
+# -------------------------
+# Partial aggregates (run in the workers over one shard)
+# -------------------------
+def _partial(spec: _Spec, lo: int, hi: int, days: Optional[Tuple[int, int]], op: str, args: dict):
+    def col(name: str) -> np.ndarray:
+        return _column(spec, name)[lo:hi]
+
+    day = col("day")
+    rows = slice(None) if days is None else np.flatnonzero((day >= days[0]) & (day <= days[1]))
+    qty = col("quantity")[rows].astype(np.float64)
+    price = col("unit_price")[rows].astype(np.float64)
+
+    if op == "group":
+        by, metric, k = args["by"], args["metric"], args["k"]
+        codes = col(f"code:{by}")[rows]
+        counts = np.bincount(codes, minlength=k)
+        if metric == "orders":
+            pairs = np.unique(codes.astype(np.int64) * args["n_orders"] + col("code:order_id")[rows])
+            if args["disjoint"]:
+                return counts, np.bincount(pairs // args["n_orders"], minlength=k)
+            return counts, pairs
+        if metric == "units":
+            return counts, np.bincount(codes, weights=qty, minlength=k)
+        if metric == "sales":
+            return counts, np.bincount(codes, weights=qty * price, minlength=k)
+        cost = col("unit_cost")[rows].astype(np.float64)
+        gp = np.nan_to_num(qty * (price - cost))
+        return counts, np.bincount(codes, weights=gp, minlength=k), bool(np.isfinite(cost).any())
+
+    if op == "daily":
+        d0, n_days = args["day_min"], args["n_days"]
+        d = day[rows] - d0
+        out = {
+            "sales": np.bincount(d, weights=qty * price, minlength=n_days),
+            "units": np.bincount(d, weights=qty, minlength=n_days),
+            "lines": np.bincount(d, minlength=n_days).astype(np.float64),
+        }
+        if "is_returned" in spec:
+            out["returns"] = np.bincount(d, weights=col("is_returned")[rows], minlength=n_days)
+        if "unit_cost" in spec:
+            cost = col("unit_cost")[rows].astype(np.float64)
+            out["gross_profit"] = np.bincount(d, weights=np.nan_to_num(qty * (price - cost)), minlength=n_days)
+            out["_has_cost"] = bool(np.isfinite(cost).any())
+        # First day of each order in this shard; orders can span shards, so the coordinator takes the min.
+        oc = col("code:order_id")[rows]
+        order = np.lexsort((d, oc))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = oc[order][1:] != oc[order][:-1]
+        out["_first"] = (oc[order][first], d[order][first])
+        return out
+
+    raise ValueError(f"Unsupported op: {op}")
+
+
+# -------------------------
+# Coordinator
+# -------------------------
+class ShardedStore:
+    """
+    An OrderStore's columns in shared memory, partitioned into shards by a hash of the sku code
+    (or by date range) and aggregated by a spawn process pool.
+
+    Workers map the buffers (no frame is pickled), compute per-shard partial aggregates
+    (`np.bincount` over the store's global dictionary codes) and the coordinator merges them:
+    sums add, distinct (key, order) pairs are unioned unless shards are disjoint in the key,
+    and an order's first day is the min over shards. `group` and `time_series` match
+    `OrderStore.group` and `metrics.time_series` (daily and coarser buckets).
+    """
+
+    def __init__(self, store: OrderStore, workers: Optional[int] = None, shard_by: str = "sku"):
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"Unsupported shard key: {shard_by}")
+        self.workers = workers or default_workers()
+        self.shard_by = shard_by
+        self.labels = store.labels
+        self.n_rows = store.n_rows
+        self.quantity_dtype = store.quantity.dtype
+        self._days: Optional[Tuple[int, int]] = None
+
+        n_shards = max(1, self.workers * SHARDS_PER_WORKER)
+        if shard_by == "sku":
+            shard = ((store.codes["sku"].astype(np.uint64) * _GOLDEN) >> np.uint64(40)) % np.uint64(n_shards)
+        else:
+            cuts = np.quantile(store.day, np.linspace(0, 1, n_shards + 1)[1:-1]) if store.n_rows else []
+            shard = np.searchsorted(np.unique(cuts), store.day, side="right")
+        order = np.argsort(shard, kind="stable")
+        bounds = np.searchsorted(shard[order], np.arange(n_shards + 1))
+        self._shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+        arrays = {f"code:{c}": v[order] for c, v in store.codes.items()}
+        arrays.update(day=store.day[order], quantity=store.quantity[order], unit_price=store.unit_price[order])
+        arrays.update({c: v[order] for c, v in store.measures.items()})
+        if store.returned_bits is not None:
+            arrays["is_returned"] = store.is_returned[order].astype(np.uint8)
+        self._cols = _SharedColumns(arrays)
+        self._day_range = (int(store.day.min()), int(store.day.max())) if store.n_rows else (0, -1)
+
+    def close(self) -> None:
+        self._cols.close()
+
+    def nbytes(self) -> int:
+        return self._cols.nbytes
+
+    # -------------------------
+    # Windows
+    # -------------------------
+    def day_number(self, d) -> int:
+        return int((np.datetime64(pd.Timestamp(d).date(), "D") - np.datetime64("1970-01-01", "D")).astype(np.int32))
+
+    def slice_days(self, start, end) -> "ShardedStore":
+        """A view restricted to [start, end]; shares the buffers and the pool."""
+        view = copy.copy(self)
+        view._days = (self.day_number(start), self.day_number(end))
+        return view
+
+    def _map(self, op: str, **args) -> list:
+        pool = _executor(self.workers)
+        futures = [pool.submit(_partial, self._cols.spec, lo, hi, self._days, op, args) for lo, hi in self._shards]
+        return [f.result() for f in futures]
+
+    # -------------------------
+    # Aggregations
+    # -------------------------
+    @property
+    def has_cost(self) -> bool:
+        return "unit_cost" in self._cols.spec
+
+    def group(self, by: str, metric: str) -> Optional[pd.Series]:
+        """Same result as `OrderStore.group` on the same rows."""
+        if metric not in ("sales", "units", "orders", "gross_profit"):
+            raise ValueError("Unsupported metric")
+        if metric == "gross_profit" and not self.has_cost:
+            return None
+        k = len(self.labels[by])
+        parts = self._map(
+            "group", by=by, metric=metric, k=k,
+            n_orders=len(self.labels["order_id"]), disjoint=(by == self.shard_by),
+        )
+        counts = _sum([p[0] for p in parts], k)
+        if metric == "orders" and by != self.shard_by:
+            pairs = np.unique(np.concatenate([p[1] for p in parts])) if parts else np.empty(0, np.int64)
+            values = np.bincount(pairs // len(self.labels["order_id"]), minlength=k)
+        else:
+            values = _sum([p[1] for p in parts], k)
+        if metric == "gross_profit" and not any(p[2] for p in parts):
+            return None
+        if metric == "units" and np.issubdtype(self.quantity_dtype, np.integer):
+            values = values.astype(np.int64)
+        present = counts > 0
+        return pd.Series(values[present], index=pd.Index(self.labels[by][present], name=by))
+
+    def daily(self) -> pd.DataFrame:
+        """Additive daily level in the layout of `TimeRollups` (one row per day of the window)."""
+        lo, hi = self._day_range if self._days is None else (max(self._days[0], self._day_range[0]), min(self._days[1], self._day_range[1]))
+        n_days = max(0, hi - lo + 1)
+        parts = self._map("daily", day_min=lo, n_days=n_days)
+        cols = {c: _sum([p[c] for p in parts], n_days) for c in ("sales", "units", "lines")}
+        first = np.full(len(self.labels["order_id"]), n_days, dtype=np.int64)
+        for p in parts:
+            oc, d = p["_first"]
+            np.minimum.at(first, oc, d)
+        cols["orders"] = np.bincount(first[first < n_days], minlength=n_days).astype(np.float64)
+        if "is_returned" in self._cols.spec:
+            cols["returns"] = _sum([p["returns"] for p in parts], n_days)
+        if self.has_cost and any(p["_has_cost"] for p in parts):
+            cols["gross_profit"] = _sum([p["gross_profit"] for p in parts], n_days)
+        # Like the resampled hourly base, the level spans the first to the last day with rows.
+        used = np.flatnonzero(cols["lines"])
+        keep = slice(used[0], used[-1] + 1) if len(used) else slice(0, 0)
+        index = pd.DatetimeIndex(np.datetime64("1970-01-01", "D") + np.arange(lo, lo + n_days)[keep], name="order_date")
+        return pd.DataFrame({c: np.asarray(v, dtype=np.float64)[keep] for c, v in cols.items()}, index=index)
+
+    def time_series(self, freq: str = "D") -> pd.DataFrame:
+        return TimeRollups.from_daily(self.daily()).series(freq)
+
+
+def _sum(arrays: List[np.ndarray], n: int) -> np.ndarray:
+    return np.sum(arrays, axis=0) if arrays else np.zeros(n)
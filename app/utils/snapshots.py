@@ -0,0 +1,135 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+import pandas as pd
+
+SNAPSHOT_DIR = Path(os.environ.get("SNAPSHOT_DIR", Path(__file__).resolve().parents[2] / "data" / "snapshots"))
+# Datasets (fingerprints) kept on disk; the least recently used ones are removed first.
+MAX_DATASETS = int(os.environ.get("SNAPSHOT_MAX_DATASETS", 8))
+# Bump when a snapshotted result changes shape, so older files read as misses.
+SNAPSHOT_VERSION = 2
+_SOURCES = "sources.json"
+
+
+class SnapshotStore:
+    """
+    Precomputed report results persisted as pickles: <root>/<dataset fingerprint>/<kind>-<key hash>.pkl.
+
+    Everything is keyed by the dataset fingerprint, so a changed dataset never reads another
+    dataset's results. `activate` records which fingerprint a stable source (the demo CSV path, a
+    partition directory) currently has and removes the snapshots of its previous one; at most
+    `max_datasets` fingerprints are kept, which is also what retires uploads' snapshots. Files
+    written by another SNAPSHOT_VERSION or pandas version, or that fail to unpickle, are misses.
+    Writes are atomic; a read-only disk just disables the store.
+    """
+
+    def __init__(self, root: Path = SNAPSHOT_DIR, max_datasets: int = MAX_DATASETS):
+        self.root = Path(root)
+        self.max_datasets = max_datasets
+        self._lock = threading.Lock()
+
+    def _dir(self, fingerprint: str) -> Path:
+        return self.root / fingerprint
+
+    def _path(self, fingerprint: str, kind: str, key: Hashable) -> Path:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+        return self._dir(fingerprint) / f"{kind}-{digest}.pkl"
+
+    # -------------------------
+    # Entries
+    # -------------------------
+    def __contains__(self, item) -> bool:
+        # A stale file (older version, other pandas, unreadable) is not "in" the store, so it gets rewritten.
+        return self.get(*item) is not None
+
+    def get(self, fingerprint: str, kind: str, key: Hashable) -> Optional[Any]:
+        """The stored result, or None when missing or stale."""
+        try:
+            with open(self._path(fingerprint, kind, key), "rb") as f:
+                payload = pickle.load(f)
+        except Exception:
+            return None
+        if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+            return None
+        if payload.get("pandas") != pd.__version__ or payload.get("key") != repr(key):
+            return None
+        self._touch(fingerprint)
+        return payload["value"]
+
+    def put(self, fingerprint: str, kind: str, key: Hashable, value: Any) -> bool:
+        path = self._path(fingerprint, kind, key)
+        payload = {"version": SNAPSHOT_VERSION, "pandas": pd.__version__, "key": repr(key), "value": value}
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return False
+        self._touch(fingerprint)
+        self._prune()
+        return True
+
+    def _touch(self, fingerprint: str) -> None:
+        try:
+            os.utime(self._dir(fingerprint))
+        except OSError:
+            pass
+
+    # -------------------------
+    # Invalidation
+    # -------------------------
+    def invalidate(self, fingerprint: str) -> None:
+        shutil.rmtree(self._dir(fingerprint), ignore_errors=True)
+
+    def activate(self, fingerprint: str, source: str) -> None:
+        """Record `source`'s current fingerprint; a different previous one (its data changed) is invalidated."""
+        with self._lock:
+            sources = self._sources()
+            old = sources.get(source)
+            sources[source] = fingerprint
+            self._write_sources(sources)
+        if old is not None and old != fingerprint and old not in sources.values():
+            self.invalidate(old)
+
+    def _sources(self) -> dict:
+        try:
+            return json.loads((self.root / _SOURCES).read_text())
+        except Exception:
+            return {}
+
+    def _write_sources(self, sources: dict) -> None:
+        path = self.root / _SOURCES
+        tmp = path.with_name(f".{_SOURCES}.{uuid.uuid4().hex}.tmp")
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(sources, indent=1, sort_keys=True))
+            tmp.replace(path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def _prune(self) -> None:
+        try:
+            dirs = sorted((d for d in self.root.iterdir() if d.is_dir()), key=lambda d: d.stat().st_mtime, reverse=True)
+        except OSError:
+            return
+        for d in dirs[self.max_datasets:]:
+            shutil.rmtree(d, ignore_errors=True)
+
+    # -------------------------
+    # Report
+    # -------------------------
+    def usage(self, fingerprint: str) -> tuple:
+        """(snapshot files, bytes) stored for a dataset."""
+        files = list(self._dir(fingerprint).glob("*.pkl"))
+        return len(files), sum(f.stat().st_size for f in files)
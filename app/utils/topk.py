@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+OTHERS_LABEL = "All others"
+
+
+def top_k_indices(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values, sorted descending; O(n) partial selection instead of a full sort."""
+    values = np.asarray(values)
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        idx = np.argpartition(-values, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(-values[idx], kind="stable")]
+
+
+def top_k_series(s: pd.Series, k: int, name: str, by: str, with_other: bool = False) -> pd.DataFrame:
+    """
+    Top-k of an aggregated Series (index = group keys) as a `by`/`name` frame.
+    with_other=True appends an "All others" remainder row and a `share` column that sums to 1.
+    """
+    vals = s.to_numpy(dtype="float64")
+    idx = top_k_indices(vals, k)
+    out = pd.DataFrame({by: s.index.to_numpy()[idx], name: s.to_numpy()[idx]})
+    if with_other:
+        rest = float(np.nansum(vals) - np.nansum(vals[idx]))
+        if len(vals) > len(idx):
+            out = pd.concat([out, pd.DataFrame({by: [OTHERS_LABEL], name: [rest]})], ignore_index=True)
+        total = float(np.nansum(vals))
+        out["share"] = out[name].astype("float64") / total if total else 0.0
+    return out
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving heavy-hitter summary (Metwally et al.) with batched, mergeable updates.
+
+    Keeps at most `capacity` counters. Each counter's estimate overshoots the true weight by at
+    most its `error`, which is bounded by total_weight / capacity, so any key heavier than that
+    is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = int(capacity)
+        self.counts = pd.Series(dtype="float64")
+        self.errors = pd.Series(dtype="float64")
+        self.total = 0.0
+
+    def update(self, keys, weights=None) -> "SpaceSaving":
+        """Fold one chunk of (key, weight) observations into the summary."""
+        keys = pd.Series(keys)
+        w = pd.Series(1.0 if weights is None else np.asarray(weights, dtype="float64"), index=keys.index)
+        chunk = w.groupby(keys.to_numpy()).sum()
+        self.total += float(chunk.sum())
+        return self._merge(chunk, pd.Series(0.0, index=chunk.index))
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        self.total += other.total
+        return self._merge(other.counts, other.errors, other_min=other._min_count())
+
+    def _min_count(self) -> float:
+        return float(self.counts.min()) if len(self.counts) >= self.capacity else 0.0
+
+    def _merge(self, counts: pd.Series, errors: pd.Series, other_min: float = 0.0) -> "SpaceSaving":
+        # Keys absent from one side may have been evicted there with up to that side's min count.
+        own_min = self._min_count()
+        idx = self.counts.index.union(counts.index)
+        c = self.counts.reindex(idx).fillna(own_min) + counts.reindex(idx).fillna(other_min)
+        e = self.errors.reindex(idx).fillna(own_min) + errors.reindex(idx).fillna(other_min)
+        if len(c) > self.capacity:
+            keep = top_k_indices(c.to_numpy(), self.capacity)
+            c, e = c.iloc[keep], e.iloc[keep]
+        self.counts, self.errors = c, e
+        return self
+
+    def top(self, k: int = 10, name: str = "estimate", by: str = "key") -> pd.DataFrame:
+        """Top-k keys by estimated weight, with the guaranteed lower bound (`estimate - error`)."""
+        idx = top_k_indices(self.counts.to_numpy(), k)
+        c, e = self.counts.iloc[idx], self.errors.iloc[idx]
+        return pd.DataFrame({by: c.index.to_numpy(), name: c.to_numpy(), "lower_bound": (c - e).to_numpy()})
+
+
+class HeavyHitters:
+    """Space-Saving summaries of SKU sales and units, maintained while a CSV is ingested in chunks."""
+
+    def __init__(self, capacity: int = 1000, by: str = "sku"):
+        self.by = by
+        self.sales = SpaceSaving(capacity)
+        self.units = SpaceSaving(capacity)
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.sales.update(df[self.by], df["quantity"] * df["unit_price"])
+        self.units.update(df[self.by], df["quantity"])
+
+    def top(self, metric: str = "sales", k: int = 10) -> pd.DataFrame:
+        if metric not in ("sales", "units"):
+            raise ValueError("Unsupported metric")
+        return getattr(self, metric).top(k, name=metric, by=self.by)
@@ -0,0 +1,51 @@
+"""
+Benchmark orders CSV parsing: pandas vs the multithreaded pyarrow path at 1..N threads.
+
+    python scripts/bench_load_csv.py path/to/orders.csv --threads 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import pandas as pd  # noqa: E402
+import pyarrow as pa  # noqa: E402
+
+from utils.data_loader import load_orders_csv  # noqa: E402
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("csv")
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    size_mb = Path(args.csv).stat().st_size / 1e6
+    ref = load_orders_csv(args.csv, engine="pandas")
+    t_pd = _time(lambda: load_orders_csv(args.csv, engine="pandas"), args.repeat)
+    print(f"{args.csv}: {size_mb:,.1f} MB, {len(ref):,} rows")
+    print(f"pandas           {t_pd:7.2f}s")
+
+    for n in sorted(set(args.threads)):
+        pa.set_cpu_count(n)
+        out = load_orders_csv(args.csv, engine="pyarrow")
+        pd.testing.assert_frame_equal(ref, out)
+        t = _time(lambda: load_orders_csv(args.csv, engine="pyarrow"), args.repeat)
+        print(f"pyarrow x{n:<3}     {t:7.2f}s  speedup vs pandas {t_pd / t:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cold-start timing: a fresh interpreter renders Home, clicks "Load demo data", then renders each page once.
+
+    python scripts/bench_startup.py --runs 3 [--think 2]
+
+Every run is a new process, so imports and Streamlit caches start cold (like a container restart).
+--think pauses between "Load demo data" and the first page, like a user reading Home.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+PAGES = ["pages/1_Dashboard.py", "pages/2_Diagnostics.py", "pages/3_AI_Insights.py"]
+
+CHILD = r"""
+import json, sys, time
+sys.path.insert(0, ".")
+out = {}
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+out["import streamlit"] = time.perf_counter() - t
+
+t = time.perf_counter()
+home = AppTest.from_file("Home.py", default_timeout=120).run()
+out["Home (no data)"] = time.perf_counter() - t
+
+t = time.perf_counter()
+next(b for b in home.button if b.label.startswith("Load demo data")).click().run()
+out["Load demo data"] = time.perf_counter() - t
+state = {k: home.session_state[k] for k in home.session_state.filtered_state}
+time.sleep(THINK)
+
+for page in PAGES:
+    at = AppTest.from_file(page, default_timeout=120)
+    for k, v in state.items():
+        at.session_state[k] = v
+    t = time.perf_counter()
+    at.run()
+    out[page] = time.perf_counter() - t
+    if at.exception:
+        raise SystemExit(f"{page}: {at.exception[0].value}")
+print(json.dumps(out))
+"""
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--think", type=float, default=0.0)
+    args = ap.parse_args()
+
+    runs = []
+    for _ in range(args.runs):
+        code = f"PAGES = {PAGES!r}\nTHINK = {args.think!r}\n" + CHILD
+        res = subprocess.run(
+            [sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(res.stdout.strip().splitlines()[-1]))
+
+    print(f"{'step':<28}{'median s':>10}")
+    total = 0.0
+    for step in runs[0]:
+        vals = sorted(r[step] for r in runs)
+        med = vals[len(vals) // 2]
+        total += med
+        print(f"{step:<28}{med:>10.3f}")
+    print(f"{'total':<28}{total:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
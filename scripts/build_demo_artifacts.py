@@ -0,0 +1,33 @@
+"""
+Precompute the demo dataset (typed frame, fingerprint, profile, OrderStore) into data/demo_artifacts.pkl.
+
+    python scripts/build_demo_artifacts.py
+
+Run it as a build/deploy step; "Load demo data" then unpickles instead of parsing and profiling the CSV.
+The app ignores the file (and falls back to the CSV) when it is stale or built with another pandas.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from utils.demo import DEMO_ARTIFACTS, read_demo_artifacts, write_demo_artifacts  # noqa: E402
+
+
+def main() -> None:
+    t0 = time.perf_counter()
+    art = write_demo_artifacts()
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    assert read_demo_artifacts() is not None
+    load = time.perf_counter() - t0
+    print(
+        f"{DEMO_ARTIFACTS}: {len(art.df):,} rows, {DEMO_ARTIFACTS.stat().st_size / 1e3:,.1f} kB "
+        f"(build {build:.3f}s, load {load:.3f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
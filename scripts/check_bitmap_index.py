@@ -0,0 +1,113 @@
+"""
+Check bitmap-index filtering against plain pandas filters, and time both.
+
+    python scripts/check_bitmap_index.py [--csv data/synthetic_orders.csv] [--repeat 20] [--trials 50]
+
+Random combinations of date range, channel, fulfillment_type, warehouse_zone and sku are
+resolved through `BitmapIndex.select`; the selected rows, `kpi_summary` and `top_breakdown`
+(on the frame and on the OrderStore) must match the same filter written with `isin` and date
+comparisons. `counts` / `top_values` (the Dashboard's bounded SKU options) match `value_counts`.
+"""
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+
+def _pandas_filter(df: pd.DataFrame, start, end, filters) -> np.ndarray:
+    dates = pd.to_datetime(df["order_date"])
+    mask = (dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end) + pd.Timedelta(days=1))
+    for dim, values in filters.items():
+        mask &= df[dim].astype("object").where(df[dim].notna(), "(missing)").isin(values)
+    return mask.to_numpy()
+
+
+def _close(a, b) -> bool:
+    if a is None or b is None:
+        return a is b
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=1e-5, abs_tol=1e-3)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(ROOT / "data" / "synthetic_orders.csv"))
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--trials", type=int, default=50)
+    args = ap.parse_args()
+
+    from utils.bitmap_index import MISSING, BitmapIndex
+    from utils.data_loader import load_orders_csv
+    from utils.metrics import kpi_summary, top_breakdown
+    from utils.order_store import OrderStore
+
+    df = load_orders_csv(args.csv)
+    store = OrderStore.from_frame(df)
+    t = time.perf_counter()
+    index = BitmapIndex.from_store(store)
+    print(f"{len(df):,} rows · index built in {time.perf_counter() - t:.3f}s · {index.nbytes() / 1e6:.2f} MB")
+
+    rng = np.random.default_rng(0)
+    days = pd.to_datetime(df["order_date"]).dt.normalize()
+    lo, hi = days.min(), days.max()
+    span = (hi - lo).days
+    cases = []
+    for _ in range(args.trials):
+        a, b = sorted(rng.integers(0, span + 1, 2))
+        start, end = (lo + pd.Timedelta(days=int(a))).date(), (lo + pd.Timedelta(days=int(b))).date()
+        filters = {}
+        for dim in index.labels:
+            vals = index.values(dim)
+            if rng.random() < 0.6:
+                k = int(rng.integers(0, min(len(vals), 40) + 1))
+                filters[dim] = list(rng.choice(vals, size=k, replace=False))
+        cases.append((start, end, filters))
+
+    for start, end, filters in cases:
+        sel = index.select(start, end, filters)
+        expected = _pandas_filter(df, start, end, filters)
+        assert np.array_equal(sel.mask(), expected), (start, end, filters)
+        want = kpi_summary(df[expected])
+        for got in (kpi_summary(df, selection=sel), kpi_summary(store, selection=sel)):
+            assert all(_close(got[k], want[k]) for k in want), (got, want)
+        for metric in ("sales", "orders"):
+            a = top_breakdown(df[expected], "sku", metric, n=5)
+            b = top_breakdown(store, "sku", metric, n=5, selection=sel)
+            assert np.allclose(a[metric].to_numpy(float), b[metric].to_numpy(float), rtol=1e-5), (a, b)
+    print(f"{len(cases)} random filter combinations match pandas")
+
+    # Widget options: per-value row counts and the bounded most-frequent lists.
+    for dim in index.labels:
+        counts = pd.Series(index.counts(dim), index=index.labels[dim])
+        assert counts.to_dict() == df[dim].fillna(MISSING).value_counts().to_dict(), dim
+        top = index.top_values(dim, 3)
+        rest = counts.drop(top)
+        assert len(top) == min(3, len(counts)) and (rest.empty or counts[top].min() >= rest.max()), dim
+        text = str(index.labels[dim][0])[-2:].lower()
+        hits = index.top_values(dim, 3, text)
+        assert hits and all(text in str(v).lower() for v in hits), (dim, text, hits)
+    print("counts / top_values match pandas")
+
+    start, end, filters = cases[0]
+    t = time.perf_counter()
+    for _ in range(args.repeat):
+        _pandas_filter(df, start, end, filters)
+    pandas_s = (time.perf_counter() - t) / args.repeat
+    t = time.perf_counter()
+    for _ in range(args.repeat):
+        index.select(start, end, filters)
+    index_s = (time.perf_counter() - t) / args.repeat
+    print(f"filter resolve: pandas {pandas_s * 1e3:.2f} ms · bitmap index {index_s * 1e3:.2f} ms")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Check the GMV / gross-profit decomposition.
+
+    python scripts/check_decomposition.py [--csv data/synthetic_orders.csv]
+
+For pairs of windows, on both the pandas frame and the OrderStore:
+- the prev/curr totals of each measure match `compute_kpis`
+- volume + price (+ unit cost) + mix add up to the delta
+- frame and store results agree
+"""
+import argparse
+import math
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(ROOT / "data" / "synthetic_orders.csv"))
+    args = ap.parse_args()
+
+    from utils.data_loader import load_orders_csv
+    from utils.diagnostics import compute_kpis, decompose, slice_by_date
+    from utils.order_store import OrderStore
+
+    df = load_orders_csv(args.csv)
+    store = OrderStore.from_frame(df)
+    days = sorted(pd.to_datetime(df["order_date"]).dt.date.unique())
+    mid = len(days) // 2
+    pairs = [(days[mid], days[-1], days[0], days[mid - 1]), (days[-1], days[-1], days[0], days[-1])]
+
+    for cs, ce, ps, pe in pairs:
+        results = []
+        for data in (df, store):
+            curr, prev = slice_by_date(data, cs, ce), slice_by_date(data, ps, pe)
+            d = decompose(curr, prev, by="sku")
+            kc, kp = compute_kpis(curr), compute_kpis(prev)
+            for measure, kpi in (("GMV", "gmv"), ("GROSS_PROFIT", "gross_profit")):
+                part = d[d["measure"] == measure].set_index("component")["value"]
+                if kc[kpi] is None:
+                    assert part.empty
+                    continue
+                prefix = "GMV" if measure == "GMV" else "GP"
+                assert math.isclose(part[f"{prefix}_curr"], kc[kpi], rel_tol=1e-5), (measure, part, kc)
+                assert math.isclose(part[f"{prefix}_prev"], kp[kpi], rel_tol=1e-5), (measure, part, kp)
+                effects = part[part.index.str.endswith("_effect")].sum()
+                assert math.isclose(effects, part["Delta"], rel_tol=1e-6, abs_tol=1e-4), (measure, part)
+            results.append(d)
+        pd.testing.assert_frame_equal(results[0], results[1], rtol=1e-4)
+        print(f"curr {cs}..{ce} vs prev {ps}..{pe}")
+        print(results[0].pivot(index="component", columns="measure", values="value").round(2).to_string())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
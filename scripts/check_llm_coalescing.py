@@ -0,0 +1,92 @@
+"""
+Check LLM request coalescing against a local stub of the Responses API that counts hits.
+
+    python scripts/check_llm_coalescing.py --sessions 8 --delay 0.5
+
+N threads ("sessions") call generate_ai_summary_with_openai with the same summary at the same
+moment; the stub must see exactly one request and every caller must get its text. A second
+round with distinct summaries must not be coalesced.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+
+class _Stub(BaseHTTPRequestHandler):
+    hits = 0
+    delay = 0.5
+    lock = threading.Lock()
+
+    def do_POST(self):
+        with _Stub.lock:
+            _Stub.hits += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(_Stub.delay)  # keep the request in flight while the other sessions arrive
+        out = {"output": [{"content": [{"type": "output_text", "text": f"stub: {len(body['input'])} chars"}]}]}
+        raw = json.dumps(out).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+def _burst(fn, args_per_call):
+    results = [None] * len(args_per_call)
+    start = threading.Barrier(len(args_per_call))
+
+    def run(i):
+        start.wait()
+        results[i] = fn(*args_per_call[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(args_per_call))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--delay", type=float, default=0.5)
+    args = ap.parse_args()
+
+    _Stub.delay = args.delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub-key"
+
+    from utils.ai_narrative import generate_ai_summary_with_openai, llm_request_stats
+
+    n = args.sessions
+    same = _burst(generate_ai_summary_with_openai, [("## Executive Summary\n- GMV changed by $1.00", {})] * n)
+    assert all(r.startswith("stub:") for r in same), same
+    assert len(set(same)) == 1
+    stats = llm_request_stats()
+    print(f"identical x{n}: stub hits={_Stub.hits}, stats={stats}")
+    assert _Stub.hits == 1 and stats["coalesced"] == n - 1, "identical requests were not coalesced"
+
+    _Stub.hits = 0
+    _burst(generate_ai_summary_with_openai, [(f"## Executive Summary\n- case {i}", {}) for i in range(n)])
+    stats = llm_request_stats()
+    print(f"distinct  x{n}: stub hits={_Stub.hits}, stats={stats}")
+    assert _Stub.hits == n, "distinct requests must not be coalesced"
+    server.shutdown()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
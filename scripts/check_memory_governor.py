@@ -0,0 +1,90 @@
+"""
+Check the session memory governor: budgets, spill/reload round-trips and cleanup.
+
+    python scripts/check_memory_governor.py [--rows 200000]
+
+Three "sessions" each load a copy of a synthetic orders frame under a session budget that
+fits one frame and a global budget that fits two: older frames must be spilled to Arrow files
+and come back identical, window copies must be dropped rather than spilled, tracked objects
+must stop counting once collected, and a garbage-collected session must leave no spill files.
+"""
+import argparse
+import gc
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+
+def _frame(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "order_id": [f"O{i // 2:08d}" for i in range(n)],
+        "order_date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 90 * 86400, n), unit="s"),
+        "sku": pd.Series(rng.choice([f"SKU-{i}" for i in range(500)], n)).where(rng.random(n) > 0.01),
+        "channel": rng.choice(["eBay", "Amazon", "Walmart", "Website"], n),
+        "quantity": rng.integers(1, 5, n),
+        "unit_price": rng.uniform(5, 80, n).round(2),
+        "unit_cost": pd.Series(rng.uniform(2, 40, n)).where(rng.random(n) > 0.05),
+        "is_returned": rng.random(n) < 0.07,
+    })
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    args = ap.parse_args()
+
+    from utils.memory import SHARED, MemoryGovernor, frame_nbytes
+
+    frames = {f"s{i}": _frame(args.rows, i) for i in range(3)}
+    size = max(frame_nbytes(df) for df in frames.values())
+    gov = MemoryGovernor(session_budget=1.2 * size, global_budget=2.2 * size)
+    leases = {sid: gov.lease(sid) for sid in frames}
+
+    for sid, df in frames.items():
+        gov.put(sid, "orders", df.copy())
+    print(f"frame {size / 1e6:.1f} MB · resident {gov.total() / 1e6:.1f} MB · spilled {gov.spilled_bytes() / 1e6:.1f} MB")
+    assert gov.total() <= gov.global_budget and gov.spills == 1, "global budget not enforced"
+
+    for sid, df in frames.items():
+        back = gov.get(sid, "orders")
+        pd.testing.assert_frame_equal(back, df)
+    assert gov.reloads >= 1 and gov.total() <= gov.global_budget
+    print(f"round-trip ok: {gov.spills} spill(s), {gov.reloads} reload(s)")
+
+    # Windows push their session over budget (the base spills); reloading the base then evicts
+    # the now colder windows, which are recomputable and so dropped rather than spilled.
+    base = gov.get("s0", "orders")
+    gov.put("s0", "window:a", base[base["channel"] == "Amazon"], recomputable=True)
+    gov.put("s0", "window:b", base[base["channel"] != "Amazon"], recomputable=True)
+    spills = gov.spills
+    del base
+    pd.testing.assert_frame_equal(gov.get("s0", "orders"), frames["s0"])
+    assert ("s0", "window:a") not in gov and ("s0", "window:b") not in gov, "cold windows should be dropped"
+    assert gov.spills == spills and gov.usage("s0") <= gov.session_budget
+
+    # Tracked objects count only while alive.
+    shared = frames["s1"].copy()
+    gov.track(SHARED, "cache", shared)
+    assert gov.usage(SHARED) == frame_nbytes(shared)
+    del shared
+    gc.collect()
+    assert gov.usage(SHARED) == 0
+
+    # Dropping a session's state releases its entries and spill files.
+    del leases["s2"]
+    gc.collect()
+    assert ("s2", "orders") not in gov
+    del leases
+    gc.collect()
+    assert not list(gov.spill_dir.iterdir()), "spill files left behind"
+    gov.close()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
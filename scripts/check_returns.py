@@ -0,0 +1,84 @@
+"""
+Check the returns analytics.
+
+    python scripts/check_returns.py [--csv data/synthetic_orders.csv]
+
+For pairs of windows, on both the pandas frame and the OrderStore:
+- each dimension's lines / returned lines / GMV / returned GMV add up to the totals, which match
+  a plain pandas group-by, `kpi_summary` (return rate) and `compute_kpis` (returned GMV, net GMV = GMV - returned GMV)
+- per-segment contributions add up to the overall return-rate delta, each as rate + mix effect
+- frame and store results agree
+"""
+import argparse
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(ROOT / "data" / "synthetic_orders.csv"))
+    args = ap.parse_args()
+
+    from utils.data_loader import load_orders_csv
+    from utils.diagnostics import compute_kpis, slice_by_date
+    from utils.metrics import kpi_summary
+    from utils.order_store import OrderStore
+    from utils.returns import RETURN_DIMENSIONS, return_aggregates, returns_report
+
+    df = load_orders_csv(args.csv)
+    store = OrderStore.from_frame(df)
+    days = sorted(pd.to_datetime(df["order_date"]).dt.date.unique())
+    mid = len(days) // 2
+    pairs = [(days[mid], days[-1], days[0], days[mid - 1]), (days[-1], days[-1], days[0], days[-1])]
+
+    for data in (df, store):
+        k = kpi_summary(data)
+        assert math.isclose(k["net_gmv"], k["gmv"] - k["returned_gmv"], rel_tol=1e-9), k
+
+    for cs, ce, ps, pe in pairs:
+        reports = []
+        for data in (df, store):
+            curr, prev = slice_by_date(data, cs, ce), slice_by_date(data, ps, pe)
+            for window in (curr, prev):
+                agg = return_aggregates(window)
+                total = agg["total"].iloc[0]
+                kpis = compute_kpis(window)
+                rate = kpi_summary(window)["return_rate"]
+                assert math.isclose(total["return_rate"], rate, rel_tol=1e-9), (total, rate)
+                assert math.isclose(total["gmv"], kpis["gmv"], rel_tol=1e-6), (total, kpis)
+                assert math.isclose(total["net_gmv"], kpis["net_gmv"], rel_tol=1e-6), (total, kpis)
+                for dim in RETURN_DIMENSIONS:
+                    t = agg[dim]
+                    for col in ("lines", "returned_lines", "gmv", "returned_gmv"):
+                        assert math.isclose(t[col].sum(), total[col], rel_tol=1e-6), (dim, col)
+                    if data is df:
+                        w = window.assign(sales=window["quantity"] * window["unit_price"])
+                        ref = w[w["is_returned"] > 0].groupby(dim, observed=True)["sales"].sum()
+                        got = t.set_index(dim)["returned_gmv"]
+                        assert np.allclose(got.reindex(ref.index).to_numpy(), ref.to_numpy(), rtol=1e-6), dim
+
+            rep = returns_report(curr, prev)
+            rate_delta = rep["total"].set_index("metric").loc["RETURN_RATE", "delta"]
+            for dim in RETURN_DIMENSIONS:
+                t = rep[dim]
+                assert math.isclose(t["contribution"].sum(), rate_delta, abs_tol=1e-9), (dim, t["contribution"].sum(), rate_delta)
+                assert np.allclose(t["rate_effect"] + t["mix_effect"], t["contribution"], atol=1e-12), dim
+            reports.append(rep)
+
+        for key in reports[0]:
+            pd.testing.assert_frame_equal(reports[0][key], reports[1][key], rtol=1e-5, check_dtype=False, check_categorical=False)
+        print(f"curr {cs}..{ce} vs prev {ps}..{pe}")
+        print(reports[0]["total"].round(4).to_string(index=False))
+        print(reports[0]["channel"].round(4).to_string(index=False))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Check approximate mode (stratified sample estimates) against exact results.
+
+    python scripts/check_sampling.py [--csv data/synthetic_orders.csv] [--rows N] [--seeds 40]
+
+- a "sample" as large as the dataset reproduces `kpi_summary`, `time_series` and `top_breakdown` exactly
+- over `--seeds` independent samples of `--rows` lines (default: a tenth of the dataset; it must be
+  smaller than the dataset, and with fewer than MIN_COVERAGE_ROWS the coverage part is skipped, as
+  for the bundled 20-line demo file), the 95% intervals of the KPIs (whole range and a filtered
+  window) and of the weekly GMV buckets cover the exact value close to 95% of the time
+- prints the estimate vs exact time for the whole-range KPIs
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+# Smallest sample whose interval coverage means anything.
+MIN_COVERAGE_ROWS = 1_000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(ROOT / "data" / "synthetic_orders.csv"))
+    ap.add_argument("--rows", type=int, default=None, help="sample size (default: a tenth of the dataset)")
+    ap.add_argument("--seeds", type=int, default=40)
+    args = ap.parse_args()
+
+    from utils.bitmap_index import BitmapIndex
+    from utils.data_loader import load_orders_csv
+    from utils.metrics import kpi_summary, time_series, top_breakdown
+    from utils.order_store import OrderStore
+    from utils.sampling import StratifiedSample
+
+    df = load_orders_csv(args.csv)
+    store = OrderStore.from_frame(df)
+    index = BitmapIndex.from_store(store)
+    days = sorted(pd.to_datetime(df["order_date"]).dt.date.unique())
+    channels = index.values("channel")
+    windows = [
+        (None, None, {}),
+        (days[len(days) // 3], days[-1], {"channel": channels[: max(1, len(channels) // 2)]}),
+    ]
+
+    # Census: every line sampled, so estimates are exact and intervals have zero width.
+    census = StratifiedSample.from_store(store, n=store.n_rows)
+    assert census.store.n_rows == store.n_rows
+    for start, end, filters in windows:
+        view, exact = census.select(start, end, filters), index.select(start, end, filters).apply(store)
+        got, want = kpi_summary(view), kpi_summary(exact)
+        for k in ("gmv", "orders", "units", "gross_profit", "gross_margin", "return_rate", "returned_gmv", "net_gmv"):
+            assert (got[k] is None) == (want[k] is None), k
+            if want[k] is not None:
+                assert np.isclose(got[k], want[k], rtol=1e-6), (k, got[k], want[k])
+        for by in ("sku", "channel"):
+            for metric in ("sales", "orders"):
+                a, b = top_breakdown(view, by, metric, n=5), top_breakdown(exact, by, metric, n=5)
+                np.testing.assert_allclose(a[metric].to_numpy(float), b[metric].to_numpy(float), rtol=1e-6)
+                np.testing.assert_allclose(a["ci_low"], a["ci_high"])
+    frame = index.select(*windows[1][:2], windows[1][2]).apply(df)
+    ts_exact = time_series(frame, "W")
+    ts_est = time_series(census.select(*windows[1][:2], windows[1][2]), "W")
+    for col in ("sales", "orders"):
+        np.testing.assert_allclose(ts_est[col].to_numpy(), ts_exact[col].to_numpy(), rtol=1e-6)
+    print("census sample reproduces exact results")
+
+    rows = args.rows or store.n_rows // 10
+    if rows >= store.n_rows:
+        ap.error(f"--rows {rows:,} is not below the dataset's {store.n_rows:,} lines: every sample would be a census")
+    if rows < MIN_COVERAGE_ROWS:
+        print(f"coverage skipped: {rows:,}-line samples are too small; use a dataset of {MIN_COVERAGE_ROWS * 10:,}+ lines (--csv)")
+        print("OK (census only)")
+        return
+
+    # Coverage of the 95% intervals over independent samples.
+    keys = ["gmv", "orders", "units", "gross_profit", "return_rate", "net_gmv"]
+    hits = {(w, k): 0 for w in range(len(windows)) for k in keys}
+    bucket_hits = bucket_total = 0
+    for seed in range(args.seeds):
+        sample = StratifiedSample.from_store(store, n=rows, seed=seed)
+        for w, (start, end, filters) in enumerate(windows):
+            got = kpi_summary(sample.select(start, end, filters))
+            want = kpi_summary(index.select(start, end, filters).apply(store))
+            for k in keys:
+                if want[k] is None:
+                    continue
+                lo, hi = got["ci"][k]
+                hits[(w, k)] += lo <= want[k] <= hi
+        ts = time_series(sample.select(*windows[1][:2], windows[1][2]), "W").set_index("order_date")
+        exact = ts_exact.set_index("order_date")["sales"].reindex(ts.index)
+        slack = 1e-6 * exact.abs()
+        bucket_hits += int(((ts["sales_low"] - slack <= exact) & (exact <= ts["sales_high"] + slack)).sum())
+        bucket_total += len(ts)
+
+    print(f"{args.seeds} samples of ~{rows:,} / {store.n_rows:,} lines: 95% interval coverage")
+    for (w, k), h in hits.items():
+        print(f"  window {w} {k:<13} {h / args.seeds:.0%}")
+        assert h / args.seeds >= 0.8, (w, k, h)
+    print(f"  weekly GMV buckets    {bucket_hits / bucket_total:.0%}")
+    assert bucket_hits / bucket_total >= 0.85
+
+    t = time.perf_counter()
+    kpi_summary(store)
+    exact_s = time.perf_counter() - t
+    t = time.perf_counter()
+    kpi_summary(sample)
+    est_s = time.perf_counter() - t
+    print(f"kpi_summary: exact {exact_s * 1e3:.1f} ms · estimate {est_s * 1e3:.1f} ms")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Check the what-if pricing simulator's baseline.
+
+    python scripts/check_scenarios.py [--csv data/synthetic_orders.csv]
+
+With no price change, on both the pandas frame and the OrderStore:
+- the baseline GMV and gross profit equal `compute_kpis`, including for a SKU sold at different
+  prices (GMV is its sales, not units x mean price) and a catalogue where some SKUs have no
+  unit_cost (their sales are not gross profit)
+- every draw equals the baseline
+With a uniform +10% price and zero elasticity, every draw's GMV is 1.1x `compute_kpis` GMV.
+"""
+import argparse
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(ROOT / "data" / "synthetic_orders.csv"))
+    args = ap.parse_args()
+
+    from utils.data_loader import load_orders_csv
+    from utils.diagnostics import compute_kpis, pvm_aggregates
+    from utils.order_store import OrderStore
+    from utils.scenarios import simulate_price_change
+
+    partial = pd.DataFrame({
+        "order_id": ["o1", "o2", "o3"],
+        "order_date": pd.to_datetime(["2024-06-01"] * 3),
+        "sku": ["S1", "S2", "S2"],
+        "channel": ["Amazon"] * 3,
+        "quantity": [1, 1, 1],
+        "unit_price": [10.0, 100.0, 100.0],
+        "unit_cost": [5.0, np.nan, np.nan],
+    })
+    mixed = pd.DataFrame({
+        "order_id": ["o1", "o2"],
+        "order_date": pd.to_datetime(["2024-06-01"] * 2),
+        "sku": ["S1", "S1"],
+        "channel": ["Amazon"] * 2,
+        "quantity": [1, 9],
+        "unit_price": [100.0, 10.0],
+        "unit_cost": [40.0, 4.0],
+    })
+    df = load_orders_csv(args.csv)
+    # The bundled data with unit_cost dropped from every other row.
+    gaps = df.assign(unit_cost=df["unit_cost"].where(np.arange(len(df)) % 2 == 0))
+
+    cases = (("mixed prices", mixed), ("partial unit_cost", partial), (Path(args.csv).name, df), ("every other unit_cost", gaps))
+    for name, frame in cases:
+        for data in (frame, OrderStore.from_frame(frame)):
+            agg = pvm_aggregates(data, data, by="sku")
+            res = simulate_price_change(agg, np.zeros(len(agg)), n_draws=200)
+            kpis = compute_kpis(data)
+            gmv, gp = kpis["gmv"], kpis["gross_profit"]
+            assert math.isclose(res.base_gmv, gmv, rel_tol=1e-9), (name, res.base_gmv, gmv)
+            assert math.isclose(res.base_gross_profit, gp, rel_tol=1e-9, abs_tol=1e-6), (name, res.base_gross_profit, gp)
+            assert np.allclose(res.gross_profit, gp, rtol=1e-9), name
+            assert np.allclose(res.gmv, res.base_gmv, rtol=1e-9), name
+            up = simulate_price_change(agg, np.full(len(agg), 0.1), elasticity=0.0, elasticity_sd=0.0, n_draws=50)
+            assert np.allclose(up.gmv, 1.1 * gmv, rtol=1e-6), (name, up.gmv[:3], gmv)
+        print(f"{name}: baseline GMV {gmv:,.2f} · gross profit {gp:,.2f}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Equivalence and speed of sharded (multi-process, shared-memory) aggregation vs the single-process path.
+
+    python scripts/check_sharded.py [--csv data/synthetic_orders.csv] [--workers 8] [--repeat 3]
+
+For both shard keys (sku hash, date range), over the whole dataset and a date window:
+- `top_breakdown` / `drivers` inputs (`group`) for every dimension x metric match `OrderStore.group`
+- `time_series` (D/W/M/Q) matches `metrics.time_series` on the frame
+Then times `group` for sales/orders by sku against the single-process store.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(ROOT / "data" / "synthetic_orders.csv"))
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    from utils.data_loader import load_orders_csv
+    from utils.diagnostics import drivers
+    from utils.metrics import time_series
+    from utils.order_store import OrderStore
+    from utils.sharded import SHARD_KEYS, ShardedStore, default_workers, shutdown_pool
+
+    workers = args.workers or default_workers()
+    df = load_orders_csv(args.csv)
+    store = OrderStore.from_frame(df)
+    days = sorted(pd.to_datetime(df["order_date"]).dt.date.unique())
+    lo, hi = days[len(days) // 3], days[-1]
+    dims = [d for d in ("sku", "channel", "fulfillment_type", "warehouse_zone") if d in store.codes]
+
+    for key in SHARD_KEYS:
+        sharded = ShardedStore(store, workers=workers, shard_by=key)
+        for label, single, multi, frame in (
+            ("all days", store, sharded, df),
+            (f"{lo}..{hi}", store.slice_days(lo, hi), sharded.slice_days(lo, hi),
+             df[(df["order_date"].dt.date >= lo) & (df["order_date"].dt.date <= hi)]),
+        ):
+            for by in dims:
+                for metric in ("sales", "units", "orders", "gross_profit"):
+                    a, b = single.group(by, metric), multi.group(by, metric)
+                    if a is None:
+                        assert b is None, (by, metric)
+                        continue
+                    pd.testing.assert_series_equal(a.sort_index(), b.sort_index(), check_dtype=False, rtol=1e-6)
+            for freq in ("D", "W", "M", "Q"):
+                pd.testing.assert_frame_equal(time_series(frame, freq), time_series(multi, freq), check_dtype=False, rtol=1e-6)
+            print(f"shard_by={key:<10} {label:<24} group + time_series match")
+        d_single = drivers(store.slice_days(lo, hi), store.slice_days(days[0], lo), by="sku", metric="sales")
+        d_multi = drivers(sharded.slice_days(lo, hi), sharded.slice_days(days[0], lo), by="sku", metric="sales")
+        np.testing.assert_allclose(d_single["delta"].to_numpy(), d_multi["delta"].to_numpy(), rtol=1e-6)
+
+        if key == "sku":
+            sharded.group("sku", "sales")  # start the workers before timing
+            for metric in ("sales", "orders"):
+                t1 = _timed(lambda: store.group("sku", metric), args.repeat)
+                tn = _timed(lambda: sharded.group("sku", metric), args.repeat)
+                print(f"group(sku, {metric}): 1 process {t1 * 1e3:.1f} ms · {workers} workers {tn * 1e3:.1f} ms ({t1 / tn:.2f}x)")
+        sharded.close()
+    shutdown_pool()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Precompute the Diagnostics page's default-window reports into the snapshot store (data/snapshots,
+or $SNAPSHOT_DIR) so the first session on new data reads them instead of computing.
+
+    python scripts/warm_snapshots.py [--csv data/synthetic_orders.csv | --partitions DIR] [--method holt_seasonal]
+
+Run it after each data load. The dataset is keyed by the same fingerprint the app computes; the
+source (resolved CSV path / partition directory, as the app records the demo CSV and partitioned
+directories) is activated, which drops the snapshots of its previous content. Then checks that a
+second run finds everything stored.
+"""
+import argparse
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", default=str(ROOT / "data" / "synthetic_orders.csv"))
+    ap.add_argument("--partitions", default=None, help="date-partitioned dataset directory (instead of --csv)")
+    ap.add_argument("--method", default=None)
+    args = ap.parse_args()
+
+    from utils.data_loader import PartitionedOrders, dataset_fingerprint, load_orders_csv
+    from utils.diagnostics import slice_by_date
+    from utils.jobs import JobContext
+    from utils.order_store import OrderStore
+    from utils.profiler import profile_orders
+    from utils.reports import DEFAULT_METHOD, warm_diagnostics
+    from utils.snapshots import SnapshotStore
+
+    t = time.perf_counter()
+    if args.partitions:
+        ds = PartitionedOrders(args.partitions)
+        fp, source, bounds, profile = ds.fingerprint, str(ds.root.resolve()), ds.date_bounds, None
+        window = history = lambda start, end: ds.read(start, end)[0]
+    else:
+        # Same loading path and fingerprint as an upload (or the demo dataset) in the app.
+        df = load_orders_csv(args.csv)
+        fp, source = dataset_fingerprint(df), str(Path(args.csv).resolve())
+        bounds = (df["order_date"].min().date(), df["order_date"].max().date())
+        window, history, profile = OrderStore.from_frame(df).slice_days, partial(slice_by_date, df), profile_orders(df)
+    load_s = time.perf_counter() - t
+
+    snapshots = SnapshotStore()
+    snapshots.activate(fp, source)
+    method = args.method or DEFAULT_METHOD
+    t = time.perf_counter()
+    written = warm_diagnostics(JobContext(), snapshots, fp, bounds, window, history, profile, method=method)
+    warm_s = time.perf_counter() - t
+    t = time.perf_counter()
+    again = warm_diagnostics(JobContext(), snapshots, fp, bounds, window, history, profile, method=method)
+    read_s = time.perf_counter() - t
+    assert again == 0, again
+
+    files, size = snapshots.usage(fp)
+    print(f"{source} ({fp}): loaded in {load_s:.2f}s")
+    print(f"{written} snapshot(s) written in {warm_s:.2f}s · read back in {read_s * 1e3:.1f} ms")
+    print(f"{snapshots.root / fp}: {files} file(s), {size / 1e3:,.1f} kB")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()